@@ -1,10 +1,16 @@
 import os
 import sys
+import copy
+import math
+import hmac
+import contextlib
+import asyncio
+from collections import namedtuple
 import torch
 import pickle
 import pandas as pd
 import numpy as np
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
@@ -12,8 +18,63 @@ from typing import List, Dict, Any, Optional
 # Add current directory to path to import modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from model.models import NeuralCF
-from model.dataset import map_graph_nodes, edges_index
+from model.dataset import load_graph
+from model.topk import TopKRecommender, make_model_scorer, load_bad_pairs, load_hub_ingredients
+from model.score_matrix import load_score_matrix, checkpoint_hash, graph_digest
+from model.incremental import IncrementalEncoder
+from model.graph_store import HeteroGraph, cache_node_embeddings, missing_relations
+from model.quantize import QuantizedNeuralCF, is_quantized_export
+from model.export import load_scripted, is_scripted_export, check_scripted
+from serving import InferenceExecutor, ExecutorSaturated, MicroBatcher
+from response_cache import ResponseCache, SqliteCache, make_key
+from graph_delta_log import GraphDeltaLog
+
+# 학습 체크포인트, model/quantize.py의 양자화 export 또는 model/export.py의 TorchScript 모듈
+# (TorchScript 모듈이면 torch_geometric을 import하지 않는다)
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", "./model/checkpoint/best_model.pth")
+
+# 사전 계산된 점수 행렬(model/score_matrix.py)이 있으면 그걸로 응답, 0이면 항상 모델로 계산
+USE_SCORE_MATRIX = os.environ.get("USE_SCORE_MATRIX", "1") == "1"
+
+# /predict/batch 한 요청에 허용하는 최대 쌍 개수
+MAX_BATCH_PAIRS = int(os.environ.get("MAX_BATCH_PAIRS", "5000"))
+
+# 술별 top-N 추천 목록을 미리 계산해 둘 개수 (0이면 요청 시점에 술마다 계산)
+RECOMMEND_TOP_N = int(os.environ.get("RECOMMEND_TOP_N", "100"))
+RECOMMEND_PRECOMPUTE = os.environ.get("RECOMMEND_PRECOMPUTE", "1") == "1"
+
+# 추론 스레드 풀: 동시 실행 수, 대기열 상한(넘으면 503), 요청 제한 시간(초, 넘으면 504)
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_QUEUE = int(os.environ.get("INFERENCE_MAX_QUEUE", "64"))
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", "10"))
+# 워커당 torch 스레드 수 (비워 두면 CPU 코어 수 / INFERENCE_WORKERS)
+TORCH_NUM_THREADS = int(os.environ["TORCH_NUM_THREADS"]) if os.environ.get("TORCH_NUM_THREADS") else None
+
+# /predict 마이크로 배칭: 최대 PREDICT_MAX_WAIT_MS 동안 최대 PREDICT_MAX_BATCH개까지 모아 한 번에 평가 (1이면 끔)
+PREDICT_MAX_BATCH = int(os.environ.get("PREDICT_MAX_BATCH", "64"))
+PREDICT_MAX_WAIT_MS = float(os.environ.get("PREDICT_MAX_WAIT_MS", "2"))
+
+# predict 점수/추천 목록 응답 캐시 (크기 0이면 끔), RESPONSE_CACHE_DB를 주면 여러 워커가 sqlite 파일로 공유
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_DB = os.environ.get("RESPONSE_CACHE_DB", "")
+
+# /admin/graph/delta로 추가된 노드/edge를 남기는 로그 (재시작 시 다시 적용, 여러 워커가 공유)
+# 설정하지 않으면(기본) delta는 요청을 받은 프로세스 메모리에만 남으므로 워커 하나로만 실행해야 한다
+GRAPH_DELTA_LOG = os.environ.get("GRAPH_DELTA_LOG", "")
+# 다른 워커가 로그에 쓴 delta를 따라잡는 주기(초)
+GRAPH_DELTA_SYNC_SECONDS = float(os.environ.get("GRAPH_DELTA_SYNC_SECONDS", "2"))
+
+# /admin/* 요청에 필요한 X-Admin-Token 값 (설정하지 않으면 /admin/* 는 404)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+EDGE_TYPE_MAP = {
+    'liqr-ingr': 0,
+    'ingr-ingr': 1,
+    'liqr-liqr': 1,
+    'ingr-fcomp': 2,
+    'ingr-dcomp': 2
+}
 
 app = FastAPI(title="AI Pairing API", description="API for the AI Pairing system", version="1.0.0")
 
@@ -26,17 +87,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 요청이 읽는 모델 / 그래프 / 매핑 묶음
+#   model          :   서비스 중인 모델 (노드 임베딩 캐시 포함)
+#   checkpoint     :   체크포인트 파일 해시
+#   version        :   응답 캐시 키에 쓰는 버전 (체크포인트 해시 + 적용된 그래프 delta 수)
+#   encoder        :   delta를 이어서 적용할 IncrementalEncoder (없으면 다음 delta 때 새로 만든다)
+#   deltas         :   시작 그래프 이후 적용된 delta (노드 수, edge_index, edge_type, edge_weight) 튜플
+#   edges          :   (edge_index, edge_type, edge_weight), 모델 호출 인자 순서
+# reload / delta는 새 ServingState를 만들어 전역 참조 하나만 바꾸고,
+# 요청은 시작할 때 state를 지역 변수로 잡아 끝까지 같은 스냅샷을 쓴다 (추론 스레드와 섞이지 않도록)
+ServingState = namedtuple("ServingState", [
+    "model", "checkpoint", "version", "score_matrix", "recommender", "encoder", "deltas",
+    "node_to_idx", "lid_to_idx", "iid_to_idx", "liquor_lookup", "ingredient_lookup",
+    "liquor_names", "ingredient_names", "edges",
+])
+
 # Initialize model and data globals
-model = None
-lid_to_idx = None
-iid_to_idx = None
-idx_to_lid = None
-idx_to_iid = None
-edges_indexes = None
-edges_weights = None
-edge_type = None
-liquor_names = None
-ingredient_names = None
+state = None
+base_edges = None
+graph_store = None                      # compound 관계까지 학습한 체크포인트용 관계별 CSR 블록 (필요할 때 compound edge를 읽는다)
+delta_log = None
+delta_log_position = 0                  # 로그에서 처리한(적용했거나 건너뛴) 기록 수
+delta_sync_task = None
+executor = None
+predict_batcher = None
+response_cache = None
+reload_lock = asyncio.Lock()
 
 # Model request/response schemas
 class PairingRequest(BaseModel):
@@ -47,9 +123,52 @@ class PairingResponse(BaseModel):
     score: float
     explanation: Optional[str] = None
 
+class BatchPairingRequest(BaseModel):
+    pairs: List[PairingRequest]
+
+class BatchPairingResult(BaseModel):
+    liquor_id: int
+    ingredient_id: int
+    score: Optional[float] = None
+    error: Optional[str] = None
+
+class BatchPairingResponse(BaseModel):
+    results: List[BatchPairingResult]
+
 class RecommendationRequest(BaseModel):
     liquor_id: int
     limit: int = 10
+    exclude_bad: bool = False           # liquor_bad_ingredients.csv의 나쁜 조합 제외
+    hub_only: bool = False              # Hub_Nodes.csv의 허브 재료만
+    exclude_ids: List[int] = []         # 이미 본 재료 등 제외할 ingredient_id
+
+class ReloadResponse(BaseModel):
+    reloaded: bool
+    previous_checkpoint: str
+    checkpoint: str
+    score_matrix: bool
+
+class GraphDeltaNode(BaseModel):
+    node_id: int
+    node_type: str                      # "liquor" 또는 "ingredient"
+    name: Optional[str] = None
+
+class GraphDeltaEdge(BaseModel):
+    id_1: int                           # edges CSV와 같은 방향 (id_1 -> id_2)
+    id_2: int
+    edge_type: str                      # 'liqr-ingr', 'ingr-ingr', 'liqr-liqr'
+    score: Optional[float] = None       # 없으면 CSV와 같이 0.1
+
+class GraphDeltaRequest(BaseModel):
+    nodes: List[GraphDeltaNode] = []
+    edges: List[GraphDeltaEdge] = []
+
+class GraphDeltaResponse(BaseModel):
+    nodes_added: int
+    edges_added: int
+    affected_nodes: List[int]           # 레이어별로 다시 계산한 노드 수
+    seconds: float
+    checkpoint: str
 
 class RecommendationItem(BaseModel):
     ingredient_id: int
@@ -61,83 +180,552 @@ class RecommendationResponse(BaseModel):
     liquor_name: str
     recommendations: List[RecommendationItem]
 
+def build_id_lookup(id_to_idx):
+    table = np.full(max(id_to_idx.keys(), default=-1) + 1, -1, dtype=np.int64)
+    table[list(id_to_idx.keys())] = list(id_to_idx.values())
+    return table
+
+def lookup_indices(table, ids):
+    """ids -> 노드 인덱스 배열 (범위 밖이거나 없는 id는 -1)"""
+    ids = np.asarray(ids, dtype=np.int64)
+    out = np.full(len(ids), -1, dtype=np.int64)
+    valid = (ids >= 0) & (ids < len(table))
+    out[valid] = table[ids[valid]]
+    return out
+
+async def await_inference(awaitable):
+    """추론 스레드 풀 오류를 HTTP 상태로 (포화 시 503, 시간 초과 시 504)"""
+    try:
+        return await awaitable
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Inference timed out after {executor.timeout:g}s")
+
+async def run_inference(fn, *args, **kwargs):
+    """torch/numpy 작업을 추론 스레드 풀에서 실행"""
+    return await await_inference(executor.run(fn, *args, **kwargs))
+
+async def cache_lookup(version, *parts):
+    """
+    (키, 캐시된 값) - 키 앞에 요청이 잡은 state의 버전을 붙인다, 캐시를 끄면 (None, None)
+    프로세스 안 LRU는 루프에서 바로, 공유 sqlite 단계는 잠금 대기로 루프가 막히지 않도록 스레드에서 조회
+    """
+    if response_cache is None:
+        return None, None
+    key = make_key(version, *parts)
+    value = response_cache.get_local(key)
+    if value is None and response_cache.shared is not None:
+        value = await asyncio.get_running_loop().run_in_executor(None, response_cache.get_shared, key)
+    return key, value
+
+def cache_store(key, value):
+    if key is None:
+        return
+    response_cache.set_local(key, value)
+    if response_cache.shared is not None:
+        # 공유 단계 쓰기는 기다리지 않는다 (실패는 shared_errors로 집계)
+        asyncio.get_running_loop().run_in_executor(None, response_cache.set_shared, key, value)
+
+async def invalidate_cache(version):
+    if response_cache is not None:
+        await asyncio.get_running_loop().run_in_executor(None, response_cache.invalidate, version)
+
+def check_admin(token):
+    # 토큰을 설정하지 않으면 관리 엔드포인트 자체를 끈다
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def score_pair(current, liquor_id, ingredient_id):
+    # 점수 행렬이 있으면 O(1) 조회
+    if current.score_matrix is not None:
+        return current.score_matrix.score(liquor_id, ingredient_id)
+    with torch.no_grad():
+        return current.model(
+            torch.tensor([current.lid_to_idx[liquor_id]]), 
+            torch.tensor([current.iid_to_idx[ingredient_id]]), 
+            *current.edges
+        ).item()
+
+def score_pair_batch(items):
+    """
+    마이크로 배처가 모은 (state, liquor_id, ingredient_id)들을 한 번에 평가
+    state가 교체되는 순간에 들어온 요청들은 각자 잡은 state별로 나눠서 평가
+    """
+    groups = {}
+    for i, (current, _, _) in enumerate(items):
+        groups.setdefault(id(current), (current, []))[1].append(i)
+    
+    scores = [None] * len(items)
+    for current, positions in groups.values():
+        liquor_ids = np.array([items[i][1] for i in positions], dtype=np.int64)
+        ingredient_ids = np.array([items[i][2] for i in positions], dtype=np.int64)
+        group_scores = score_pairs(
+            current,
+            liquor_ids,
+            ingredient_ids,
+            lookup_indices(current.liquor_lookup, liquor_ids),
+            lookup_indices(current.ingredient_lookup, ingredient_ids),
+        )
+        for i, score in zip(positions, np.asarray(group_scores, dtype=np.float32).tolist()):
+            scores[i] = score
+    return scores
+
+def score_pairs(current, liquor_ids, ingredient_ids, liquor_idx, ingredient_idx):
+    if current.score_matrix is not None:
+        return current.score_matrix.score_pairs(liquor_ids.tolist(), ingredient_ids.tolist())
+    with torch.no_grad():
+        return current.model(
+            torch.from_numpy(liquor_idx), 
+            torch.from_numpy(ingredient_idx), 
+            *current.edges
+        ).reshape(-1).numpy()
+
+def graph_version(ckpt_hash, num_deltas=0):
+    """응답 캐시 키에 쓰는 버전 (체크포인트 해시 + 적용된 그래프 delta 수)"""
+    return ckpt_hash if num_deltas == 0 else f"{ckpt_hash}+g{num_deltas}"
+
+def build_recommender(new_model, new_matrix, graph_edges, liquor_map, ingredient_map):
+    """점수 행렬이 있으면 그걸로, 없으면 모델로 점수를 계산하는 추천 인덱스"""
+    if new_matrix is not None:
+        idx_to_liquor = {v: k for k, v in liquor_map.items()}
+        score_fn = lambda liquor_indices: new_matrix.rows([idx_to_liquor[idx] for idx in liquor_indices])
+        ingredient_ids = new_matrix.ingredient_ids
+    else:
+        score_fn = make_model_scorer(new_model, list(ingredient_map.values()), *graph_edges)
+        ingredient_ids = list(ingredient_map.keys())
+    return TopKRecommender(
+        score_fn,
+        liquor_map,
+        ingredient_ids,
+        bad_pairs=load_bad_pairs(),
+        hub_ingredients=load_hub_ingredients(),
+        top_n=RECOMMEND_TOP_N,
+    )
+
+def load_graph_state(graph):
+    """그래프 스냅샷에서 매핑 / id 조회 배열 / 이름 / edge를 채운 ServingState (모델은 load_checkpoint가 채운다)"""
+    print("Loading node mappings...")
+    mapping = graph.nodes_map()
+    lid_to_idx = mapping['liquor']
+    iid_to_idx = mapping['ingredient']
+    
+    print("Loading edge indices...")
+    edges_indexes, edges_weights, edge_type = graph.edges(EDGE_TYPE_MAP)
+    
+    # Load names for better responses
+    print("Loading names...")
+    return ServingState(
+        model=None,
+        checkpoint=None,
+        version=None,
+        score_matrix=None,
+        recommender=None,
+        encoder=None,
+        deltas=(),
+        node_to_idx={k: v for k, v in mapping.items() if not isinstance(k, str)},
+        lid_to_idx=lid_to_idx,
+        iid_to_idx=iid_to_idx,
+        # 배치 요청용 id -> 노드 인덱스 배열 (-1: 없음)
+        liquor_lookup=build_id_lookup(lid_to_idx),
+        ingredient_lookup=build_id_lookup(iid_to_idx),
+        liquor_names=graph.names('liquor'),
+        ingredient_names=graph.names('ingredient'),
+        edges=(edges_indexes, edge_type, edges_weights),
+    )
+
+def load_checkpoint(path, current):
+    """
+    체크포인트로 current의 모델/버전/점수 행렬/추천 인덱스를 바꾼 새 ServingState를 만든다
+    current는 읽기만 하므로 서비스 중에도 별도 스레드에서 호출할 수 있다
+    """
+    print(f"Loading model from {path}...")
+    ckpt_hash = checkpoint_hash(path)
+    if is_scripted_export(path):
+        new_model = load_scripted(path)
+        try:
+            check_scripted(path, new_model)
+        except ValueError as e:
+            # 직접 지정한 경로이므로 그대로 서비스하되 알린다
+            print(f"Warning: {str(e)}")
+    else:
+        loaded = torch.load(path, map_location=torch.device('cpu'))
+        if is_quantized_export(loaded):
+            new_model = QuantizedNeuralCF.from_export(loaded)
+        else:
+            from model.models import NeuralCF
+            new_model = NeuralCF.from_state_dict(loaded)
+            new_model.eval()
+    
+    if missing_relations(new_model, current.edges[1]) and current.deltas:
+        raise ValueError("Graph deltas cannot be applied to a checkpoint trained with compound edges")
+    
+    if not hasattr(new_model, "rgcn_layers"):
+        # 그래프 임베딩이 export 시점에 고정되어 있어 GNN 계산이 없다
+        if current.deltas:
+            raise ValueError("Exported models have frozen embeddings and cannot apply graph deltas")
+        print(f"Serving exported model ({new_model.variant})")
+        if new_model.graph_hash != graph_digest(*current.edges):
+            print("Warning: exported model was built from a different graph")
+    
+    # GNN 임베딩을 미리 계산해 두고 요청마다 GMF+MLP 헤드만 통과
+    print("Caching node embeddings...")
+    if current.deltas:
+        # 서비스 중에 추가된 노드/edge는 원래 그래프에서 같은 순서로 다시 적용 (새 노드 임베딩도 이 체크포인트 기준)
+        encoder = IncrementalEncoder(new_model, *base_edges)
+        for delta in current.deltas:
+            encoder.apply(*delta)
+        new_model.cache_embeddings(*current.edges, x=encoder.embeddings)
+    else:
+        # --with-compounds 체크포인트는 서빙 edge에 없는 compound 관계를 graph_store 블록으로 인코딩
+        cache_node_embeddings(new_model, current.edges, graph_store)
+    
+    new_matrix = None
+    if USE_SCORE_MATRIX:
+        new_matrix = load_score_matrix(
+            path,
+            graph_hash=graph_digest(*current.edges),
+            ckpt_hash=ckpt_hash,
+        )
+        print("Serving from precomputed score matrix" if new_matrix is not None
+              else "Score matrix missing or stale, using live model evaluation")
+    
+    print("Building recommendation index...")
+    new_recommender = build_recommender(new_model, new_matrix, current.edges, current.lid_to_idx, current.iid_to_idx)
+    if RECOMMEND_PRECOMPUTE and RECOMMEND_TOP_N > 0:
+        new_recommender.precompute()
+    
+    return current._replace(
+        model=new_model,
+        checkpoint=ckpt_hash,
+        version=graph_version(ckpt_hash, len(current.deltas)),
+        score_matrix=new_matrix,
+        recommender=new_recommender,
+        encoder=None,
+    )
+
+def apply_graph_delta(current, request):
+    """
+    요청의 노드/edge를 current 그래프에 더한 (새 ServingState, DeltaResult)를 만든다 (current는 읽기만 함)
+    모델은 복사본에서 영향을 받는 3-hop 이웃의 임베딩만 다시 계산하고,
+    점수 행렬은 더 이상 맞지 않으므로 버리고 추천 목록은 요청이 올 때 새로 계산한다
+    """
+    if not hasattr(current.model, "rgcn_layers"):
+        raise ValueError("Graph deltas need a float32 checkpoint (exported models have frozen embeddings)")
+    if missing_relations(current.model, current.edges[1]):
+        # IncrementalEncoder는 compound edge가 없는 edge 목록만 다시 계산한다
+        raise ValueError("Graph deltas need a checkpoint trained without compound edges")
+    
+    # 진행 중인 요청은 이전 모델/그래프를 계속 쓰도록 복사본에 적용
+    if current.encoder is None or current.encoder.model is not current.model:
+        encoder = IncrementalEncoder(copy.deepcopy(current.model), *current.edges)
+    else:
+        encoder = copy.deepcopy(current.encoder)
+    
+    new_nodes = {}
+    liquor_map, ingredient_map = dict(current.lid_to_idx), dict(current.iid_to_idx)
+    names = {'liquor': dict(current.liquor_names), 'ingredient': dict(current.ingredient_names)}
+    for i, node in enumerate(request.nodes):
+        if node.node_type not in ('liquor', 'ingredient'):
+            raise ValueError(f"Unsupported node type: {node.node_type}")
+        if node.node_id in current.node_to_idx or node.node_id in new_nodes:
+            raise ValueError(f"Node ID {node.node_id} already exists")
+        idx = encoder.num_nodes + i
+        new_nodes[node.node_id] = idx
+        (liquor_map if node.node_type == 'liquor' else ingredient_map)[node.node_id] = idx
+        if node.name is not None:
+            names[node.node_type][node.node_id] = node.name
+    
+    src, dst, types, weights = [], [], [], []
+    for edge in request.edges:
+        relation = EDGE_TYPE_MAP.get(edge.edge_type)
+        if relation is None or relation >= encoder.model.num_relations:
+            raise ValueError(f"Unsupported edge type: {edge.edge_type}")
+        for node_id in (edge.id_1, edge.id_2):
+            if node_id not in current.node_to_idx and node_id not in new_nodes:
+                raise ValueError(f"Node ID {node_id} not found")
+        src.append(new_nodes.get(edge.id_1, current.node_to_idx.get(edge.id_1)))
+        dst.append(new_nodes.get(edge.id_2, current.node_to_idx.get(edge.id_2)))
+        if edge.score is not None and not math.isfinite(edge.score):
+            raise ValueError(f"Invalid edge score: {edge.score}")
+        types.append(relation)
+        weights.append(0.1 if edge.score is None else edge.score)
+    
+    delta = (
+        len(new_nodes),
+        torch.tensor([src, dst], dtype=torch.long).reshape(2, -1),
+        torch.tensor(types, dtype=torch.long),
+        torch.tensor(weights, dtype=torch.float32),
+    )
+    result = encoder.apply(*delta)
+    
+    graph_edges = (encoder.edge_index, encoder.edge_type, encoder.edge_weight)
+    deltas = current.deltas + (delta,)
+    updated = current._replace(
+        model=encoder.model,
+        version=graph_version(current.checkpoint, len(deltas)),
+        score_matrix=None,
+        recommender=build_recommender(encoder.model, None, graph_edges, liquor_map, ingredient_map),
+        encoder=encoder,
+        deltas=deltas,
+        node_to_idx={**current.node_to_idx, **new_nodes},
+        lid_to_idx=liquor_map,
+        iid_to_idx=ingredient_map,
+        liquor_lookup=build_id_lookup(liquor_map),
+        ingredient_lookup=build_id_lookup(ingredient_map),
+        liquor_names=names['liquor'],
+        ingredient_names=names['ingredient'],
+        edges=graph_edges,
+    )
+    return updated, result
+
+def install_state(updated):
+    """새 ServingState로 교체 (reload_lock 안, 이벤트 루프에서 호출), 이전 버전은 돌려준다"""
+    global state
+    previous, state = state, updated
+    return previous
+
+def install_graph_delta(updated, result):
+    install_state(updated)
+    print(f"Applied graph delta: {result.new_nodes.numel()} nodes, {updated.deltas[-1][1].size(1)} edges, "
+          f"recomputed {result.affected} nodes in {result.seconds * 1000:.1f} ms")
+    return result
+
+async def sync_graph_deltas():
+    """
+    delta 로그에서 아직 처리하지 않은 delta를 순서대로 적용하고 적용한 수를 반환 (reload_lock 안에서 호출)
+    시작할 때는 재시작 전에 추가된 delta를, 서비스 중에는 다른 워커가 추가한 delta를 따라잡는다
+    적용할 수 없는 기록은 경고만 남기고 건너뛴다 (모든 워커가 같은 기록을 건너뛰므로 그래프는 같게 유지되고,
+    한 기록 때문에 시작이나 동기화가 계속 멈추지 않는다)
+    """
+    global delta_log_position
+    if delta_log is None:
+        return 0
+    loop = asyncio.get_running_loop()
+    records = await loop.run_in_executor(None, delta_log.read, delta_log_position)
+    if not records:
+        return 0
+    if not hasattr(state.model, "rgcn_layers"):
+        raise ValueError(f"{GRAPH_DELTA_LOG} has graph deltas but exported models have frozen embeddings")
+    if missing_relations(state.model, state.edges[1]):
+        raise ValueError(f"{GRAPH_DELTA_LOG} has graph deltas but the checkpoint was trained with compound edges")
+
+    previous = state.version
+    applied = 0
+    for record in records:
+        position = delta_log_position
+        delta_log_position += 1
+        try:
+            if record is None:
+                raise ValueError("malformed JSON")
+            updated, result = await loop.run_in_executor(None, apply_graph_delta, state, GraphDeltaRequest(**record))
+        except ValueError as e:
+            print(f"Warning: skipping graph delta #{position + 1} in {GRAPH_DELTA_LOG}: {str(e)}")
+            continue
+        install_graph_delta(updated, result)
+        applied += 1
+    if applied:
+        await invalidate_cache(previous)
+    return applied
+
+async def follow_graph_delta_log():
+    """다른 워커가 로그를 늘렸으면 따라잡는다 (크기만 보고 바뀌었을 때만 읽음)"""
+    last_size = delta_log.size()
+    while True:
+        await asyncio.sleep(GRAPH_DELTA_SYNC_SECONDS)
+        size = delta_log.size()
+        if size == last_size:
+            continue
+        try:
+            async with reload_lock:
+                await sync_graph_deltas()
+            last_size = size
+        except Exception as e:
+            print(f"Error syncing graph deltas: {str(e)}")
+
 @app.on_event("startup")
 async def startup_event():
-    global model, lid_to_idx, iid_to_idx, idx_to_lid, idx_to_iid, edges_indexes, edges_weights, edge_type, liquor_names, ingredient_names
+    global executor, predict_batcher, response_cache, delta_log, delta_sync_task, base_edges, graph_store
     
     try:
-        print("Loading node mappings...")
-        mapping = map_graph_nodes()
-        lid_to_idx = mapping['liquor']
-        iid_to_idx = mapping['ingredient']
-        
-        # Create reverse mappings
-        idx_to_lid = {v: k for k, v in lid_to_idx.items()}
-        idx_to_iid = {v: k for k, v in iid_to_idx.items()}
-        
-        print("Loading edge indices...")
-        edge_type_map = {
-            'liqr-ingr': 0,
-            'ingr-ingr': 1,
-            'liqr-liqr': 1,
-            'ingr-fcomp': 2,
-            'ingr-dcomp': 2
-        }
-        
-        edges_indexes, edges_weights, edge_type = edges_index(edge_type_map)
-        
-        print("Loading model...")
-        model = NeuralCF(num_users=155, num_items=6498, emb_size=128)
-        model.load_state_dict(torch.load("./model/checkpoint/best_model.pth", map_location=torch.device('cpu')))
-        model.eval()
-        
-        # Load names for better responses
-        print("Loading names...")
-        nodes_df = pd.read_csv("./dataset/nodes_191120_updated.csv")
-        liquor_names = {row['node_id']: row['name'] for _, row in nodes_df.iterrows() if row['node_type'] == 'liquor'}
-        ingredient_names = {row['node_id']: row['name'] for _, row in nodes_df.iterrows() if row['node_type'] == 'ingredient'}
+        print("Loading graph snapshot...")
+        graph = load_graph()
+
+        graph_state = load_graph_state(graph)
+        base_edges = graph_state.edges
+        graph_store = HeteroGraph(graph, EDGE_TYPE_MAP)
+        
+        install_state(load_checkpoint(CHECKPOINT_PATH, graph_state))
+        
+        if GRAPH_DELTA_LOG:
+            # 재시작 전에 추가된 노드/edge를 같은 순서로 다시 적용
+            base_hash = graph_digest(*base_edges, torch.tensor(list(graph_state.node_to_idx.keys())))
+            delta_log = GraphDeltaLog(GRAPH_DELTA_LOG, base_hash)
+            replayed = await sync_graph_deltas()
+            if replayed:
+                print(f"Replayed {replayed} graph deltas from {GRAPH_DELTA_LOG}")
+            delta_sync_task = asyncio.create_task(follow_graph_delta_log())
+        
+        response_cache = None
+        if RESPONSE_CACHE_SIZE > 0:
+            shared = SqliteCache(RESPONSE_CACHE_DB, RESPONSE_CACHE_TTL) if RESPONSE_CACHE_DB else None
+            response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, shared=shared)
+        
+        executor = InferenceExecutor(
+            max_workers=INFERENCE_WORKERS,
+            max_queue=INFERENCE_MAX_QUEUE,
+            timeout=INFERENCE_TIMEOUT,
+            torch_threads=TORCH_NUM_THREADS,
+        )
+        print(f"Inference executor: {executor.max_workers} workers x {executor.torch_threads} torch threads")
+        
+        predict_batcher = None
+        if PREDICT_MAX_BATCH > 1:
+            predict_batcher = MicroBatcher(
+                score_pair_batch,
+                executor.run,
+                max_batch=PREDICT_MAX_BATCH,
+                max_wait=PREDICT_MAX_WAIT_MS / 1000,
+            )
         
         print("Startup complete - API is ready")
     except Exception as e:
         print(f"Error during startup: {str(e)}")
         raise e
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if delta_sync_task is not None:
+        delta_sync_task.cancel()
+    if executor is not None:
+        executor.shutdown()
+
 @app.get("/")
 async def root():
     return {"message": "AI Pairing System API", "status": "active"}
 
 @app.get("/health")
 async def health_check():
-    if model is None:
+    if state is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
-    return {"status": "healthy"}
+    # 추론 스레드 풀을 거치지 않으므로 부하 중에도 바로 응답
+    return {"status": "healthy", "inference": executor.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    current = state
+    # 배치 크기/대기 시간 히스토그램으로 지연 시간과 처리량 사이를 조정
+    return {
+        "inference": executor.stats(),
+        "predict_batching": predict_batcher.stats() if predict_batcher is not None else None,
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "checkpoint": current.version,
+        "model": getattr(current.model, "variant", "float32"),
+        "graph": {
+            "nodes": current.model.num_nodes,
+            "edges": current.edges[0].size(1),
+            "deltas": len(current.deltas),
+        },
+    }
+
+@app.post("/admin/reload", response_model=ReloadResponse)
+async def reload_checkpoint(x_admin_token: Optional[str] = Header(None)):
+    """
+    CHECKPOINT_PATH를 다시 읽어 모델/점수 행렬/추천 인덱스를 교체하고
+    이전 체크포인트 해시로 저장된 캐시 항목을 모두 지운다
+    """
+    check_admin(x_admin_token)
+    
+    async with reload_lock:
+        current = state
+        previous = current.version
+        try:
+            # 체크포인트 전체의 sha256이므로 루프 밖에서
+            loop = asyncio.get_running_loop()
+            ckpt_hash = await loop.run_in_executor(None, checkpoint_hash, CHECKPOINT_PATH)
+            if graph_version(ckpt_hash, len(current.deltas)) == previous:
+                return ReloadResponse(reloaded=False, previous_checkpoint=previous, checkpoint=previous, score_matrix=current.score_matrix is not None)
+            
+            # 로딩은 무거우므로 루프 밖에서, 끝나면 한 번에 교체
+            loaded = await loop.run_in_executor(None, load_checkpoint, CHECKPOINT_PATH, current)
+        except Exception as e:
+            print(f"Error reloading checkpoint: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+        
+        install_state(loaded)
+        await invalidate_cache(previous)
+        print(f"Reloaded checkpoint {previous[:12]} -> {loaded.version[:12]}")
+    
+    return ReloadResponse(reloaded=True, previous_checkpoint=previous, checkpoint=loaded.version, score_matrix=loaded.score_matrix is not None)
+
+@app.post("/admin/graph/delta", response_model=GraphDeltaResponse)
+async def apply_graph_delta_endpoint(request: GraphDeltaRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    새 노드/edge를 재시작 없이 그래프에 추가 (영향을 받는 3-hop 이웃의 임베딩만 다시 계산)
+    점수 행렬과 미리 계산된 추천 목록은 버리고, 이전 버전으로 저장된 캐시 항목을 모두 지운다
+    GRAPH_DELTA_LOG가 있으면 다른 워커가 추가한 delta를 먼저 적용한 뒤 이 delta를 로그에 남긴다
+    """
+    global delta_log_position
+    check_admin(x_admin_token)
+    
+    if not request.nodes and not request.edges:
+        raise HTTPException(status_code=400, detail="Empty graph delta")
+    
+    loop = asyncio.get_running_loop()
+    async with reload_lock:
+        with contextlib.ExitStack() as stack:
+            try:
+                if delta_log is not None:
+                    # 파일 잠금은 다른 워커를 기다릴 수 있으므로 루프 밖에서 잡는다
+                    await loop.run_in_executor(None, stack.enter_context, delta_log.locked())
+                    await sync_graph_deltas()
+                previous = state.version
+                # 적용(검증)에 성공한 delta만 로그에 남긴다
+                updated, result = await loop.run_in_executor(None, apply_graph_delta, state, request)
+                if delta_log is not None:
+                    await loop.run_in_executor(None, delta_log.append, request.dict())
+                    delta_log_position += 1
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except Exception as e:
+                print(f"Error applying graph delta: {str(e)}")
+                raise HTTPException(status_code=500, detail=str(e))
+        
+        install_graph_delta(updated, result)
+        await invalidate_cache(previous)
+    
+    return GraphDeltaResponse(
+        nodes_added=result.new_nodes.numel(),
+        edges_added=updated.deltas[-1][1].size(1),
+        affected_nodes=result.affected,
+        seconds=result.seconds,
+        checkpoint=updated.version,
+    )
 
 @app.post("/predict", response_model=PairingResponse)
 async def predict_pairing(request: PairingRequest):
+    current = state
     try:
         # Check if IDs exist
-        if request.liquor_id not in lid_to_idx:
+        if request.liquor_id not in current.lid_to_idx:
             raise HTTPException(status_code=404, detail=f"Liquor ID {request.liquor_id} not found")
-        if request.ingredient_id not in iid_to_idx:
+        if request.ingredient_id not in current.iid_to_idx:
             raise HTTPException(status_code=404, detail=f"Ingredient ID {request.ingredient_id} not found")
         
-        # Map IDs to indices
-        liquor_idx = lid_to_idx[request.liquor_id]
-        ingredient_idx = iid_to_idx[request.ingredient_id]
-        
-        # Get prediction
-        with torch.no_grad():
-            score = model(
-                torch.tensor([liquor_idx]), 
-                torch.tensor([ingredient_idx]), 
-                edges_indexes, 
-                edge_type, 
-                edges_weights
-            ).item()
+        # Get prediction (캐시에 없으면 동시에 들어온 요청과 묶어서 한 번에 평가)
+        cache_key, score = await cache_lookup(current.version, "predict", request.liquor_id, request.ingredient_id)
+        if score is None:
+            if predict_batcher is not None:
+                score = await await_inference(predict_batcher.submit((current, request.liquor_id, request.ingredient_id)))
+            else:
+                score = await run_inference(score_pair, current, request.liquor_id, request.ingredient_id)
+            cache_store(cache_key, score)
         
         # Generate explanation (in a real system, this would be more sophisticated)
-        liquor_name = liquor_names.get(request.liquor_id, f"Liquor {request.liquor_id}")
-        ingredient_name = ingredient_names.get(request.ingredient_id, f"Ingredient {request.ingredient_id}")
+        liquor_name = current.liquor_names.get(request.liquor_id, f"Liquor {request.liquor_id}")
+        ingredient_name = current.ingredient_names.get(request.ingredient_id, f"Ingredient {request.ingredient_id}")
         
         explanation = f"{liquor_name} pairs with {ingredient_name} with a compatibility score of {score:.2f}."
         if score > 0.8:
@@ -151,55 +739,91 @@ async def predict_pairing(request: PairingRequest):
         
         return PairingResponse(score=score, explanation=explanation)
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in prediction: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/recommend", response_model=RecommendationResponse)
-async def recommend_ingredients(request: RecommendationRequest):
+@app.post("/predict/batch", response_model=BatchPairingResponse)
+async def predict_pairing_batch(request: BatchPairingRequest):
+    if len(request.pairs) > MAX_BATCH_PAIRS:
+        raise HTTPException(status_code=413, detail=f"Too many pairs ({len(request.pairs)} > {MAX_BATCH_PAIRS})")
+    
+    current = state
     try:
-        # Check if liquor ID exists
-        if request.liquor_id not in lid_to_idx:
-            raise HTTPException(status_code=404, detail=f"Liquor ID {request.liquor_id} not found")
+        liquor_ids = np.fromiter((p.liquor_id for p in request.pairs), dtype=np.int64, count=len(request.pairs))
+        ingredient_ids = np.fromiter((p.ingredient_id for p in request.pairs), dtype=np.int64, count=len(request.pairs))
         
-        # Map liquor ID to index
-        liquor_idx = lid_to_idx[request.liquor_id]
+        # Map IDs to indices (없는 id는 -1)
+        liquor_idx = lookup_indices(current.liquor_lookup, liquor_ids)
+        ingredient_idx = lookup_indices(current.ingredient_lookup, ingredient_ids)
+        valid = (liquor_idx >= 0) & (ingredient_idx >= 0)
         
-        # Get all ingredient indices
-        ingredient_indices = list(idx_to_iid.keys())
+        # 유효한 쌍만 한 번에 점수 계산
+        scores = np.full(len(request.pairs), np.nan, dtype=np.float32)
+        if valid.any():
+            scores[valid] = await run_inference(
+                score_pairs, current, liquor_ids[valid], ingredient_ids[valid], liquor_idx[valid], ingredient_idx[valid]
+            )
         
-        # Create tensors for batch prediction
-        liquor_tensor = torch.tensor([liquor_idx] * len(ingredient_indices))
-        ingredient_tensor = torch.tensor(ingredient_indices)
+        results = []
+        for i, pair in enumerate(request.pairs):
+            if liquor_idx[i] < 0:
+                results.append(BatchPairingResult(liquor_id=pair.liquor_id, ingredient_id=pair.ingredient_id, error=f"Liquor ID {pair.liquor_id} not found"))
+            elif ingredient_idx[i] < 0:
+                results.append(BatchPairingResult(liquor_id=pair.liquor_id, ingredient_id=pair.ingredient_id, error=f"Ingredient ID {pair.ingredient_id} not found"))
+            else:
+                results.append(BatchPairingResult(liquor_id=pair.liquor_id, ingredient_id=pair.ingredient_id, score=float(scores[i])))
         
-        # Get all predictions
-        with torch.no_grad():
-            scores = model(
-                liquor_tensor, 
-                ingredient_tensor, 
-                edges_indexes, 
-                edge_type, 
-                edges_weights
-            ).numpy()
+        return BatchPairingResponse(results=results)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in batch prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/recommend", response_model=RecommendationResponse)
+async def recommend_ingredients(request: RecommendationRequest):
+    current = state
+    try:
+        # Check if liquor ID exists
+        if request.liquor_id not in current.lid_to_idx:
+            raise HTTPException(status_code=404, detail=f"Liquor ID {request.liquor_id} not found")
         
-        # Get top N ingredients
-        top_indices = np.argsort(scores)[-request.limit:][::-1]
+        # 미리 계산된 top-N 조회 (필터로 부족할 때만 전체 재계산)
+        cache_key, top = await cache_lookup(
+            current.version,
+            "recommend",
+            request.liquor_id,
+            request.limit,
+            int(request.exclude_bad),
+            int(request.hub_only),
+            ",".join(map(str, sorted(set(request.exclude_ids)))),
+        )
+        if top is None:
+            top = await run_inference(
+                current.recommender.recommend,
+                request.liquor_id,
+                request.limit,
+                exclude_bad=request.exclude_bad,
+                hub_only=request.hub_only,
+                exclude_ids=request.exclude_ids,
+            )
+            cache_store(cache_key, [[ingredient_id, score] for ingredient_id, score in top])
         
         # Prepare response
-        recommendations = []
-        for idx in top_indices:
-            ingredient_idx = ingredient_indices[idx]
-            ingredient_id = idx_to_iid[ingredient_idx]
-            ingredient_name = ingredient_names.get(ingredient_id, f"Ingredient {ingredient_id}")
-            recommendations.append(
-                RecommendationItem(
-                    ingredient_id=ingredient_id,
-                    ingredient_name=ingredient_name,
-                    score=float(scores[idx])
-                )
+        recommendations = [
+            RecommendationItem(
+                ingredient_id=ingredient_id,
+                ingredient_name=current.ingredient_names.get(ingredient_id, f"Ingredient {ingredient_id}"),
+                score=score
             )
+            for ingredient_id, score in top
+        ]
         
-        liquor_name = liquor_names.get(request.liquor_id, f"Liquor {request.liquor_id}")
+        liquor_name = current.liquor_names.get(request.liquor_id, f"Liquor {request.liquor_id}")
         
         return RecommendationResponse(
             liquor_id=request.liquor_id,
@@ -207,16 +831,19 @@ async def recommend_ingredients(request: RecommendationRequest):
             recommendations=recommendations
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in recommendation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/liquors", response_model=List[Dict[str, Any]])
 async def get_liquors():
+    current = state
     try:
         return [
-            {"id": lid, "name": liquor_names.get(lid, f"Liquor {lid}")}
-            for lid in lid_to_idx.keys()
+            {"id": lid, "name": current.liquor_names.get(lid, f"Liquor {lid}")}
+            for lid in current.lid_to_idx.keys()
         ]
     except Exception as e:
         print(f"Error fetching liquors: {str(e)}")
@@ -224,10 +851,11 @@ async def get_liquors():
 
 @app.get("/ingredients", response_model=List[Dict[str, Any]])
 async def get_ingredients():
+    current = state
     try:
         return [
-            {"id": iid, "name": ingredient_names.get(iid, f"Ingredient {iid}")}
-            for iid in iid_to_idx.keys()
+            {"id": iid, "name": current.ingredient_names.get(iid, f"Ingredient {iid}")}
+            for iid in current.iid_to_idx.keys()
         ]
     except Exception as e:
         print(f"Error fetching ingredients: {str(e)}")
@@ -0,0 +1,86 @@
+"""
+그래프 delta 로그
+
+/admin/graph/delta로 추가된 노드/edge 요청을 JSON Lines 파일에 순서대로 남긴다.
+    - 재시작하면 로그를 처음부터 다시 적용해서 delta가 사라지지 않는다
+    - 같은 파일을 보는 여러 uvicorn 워커는 주기적으로 로그 끝을 따라잡아 같은 순서로 같은 그래프를 서비스한다
+    - 쓰기는 파일 잠금(fcntl.flock) 안에서만 하고, 잠금을 잡은 워커는 다른 워커가 쓴 delta를 먼저 적용한 뒤 자기 delta를 붙인다
+첫 줄은 기준 그래프 해시로, 스냅샷/CSV가 바뀌어 기준 그래프가 달라졌으면 예전 로그는 적용하지 않는다.
+기록은 적용(검증)에 성공한 delta만 남기지만, 깨진 줄은 읽는 쪽이 None으로 받아 건너뛴다.
+"""
+import contextlib
+import fcntl
+import json
+import os
+
+
+class GraphDeltaLog:
+    """
+    path       :   로그 파일 경로 (잠금은 <path>.lock)
+    base_hash  :   delta를 적용할 기준 그래프 해시
+    """
+
+    def __init__(self, path, base_hash):
+        self.path = path
+        self.base_hash = base_hash
+
+    def size(self):
+        """파일 크기 (없으면 0) - 다른 워커가 로그를 늘렸는지 싸게 확인"""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def read(self, start=0):
+        """start번째 이후의 delta 요청(dict) 목록 (JSON이 깨진 줄은 None), 기준 그래프가 다른 로그면 빈 목록"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+
+        # 쓰는 도중인 마지막 줄(개행 없음)은 다음에 읽는다
+        lines = [line for line in lines if line.endswith("\n") and line.strip()]
+        if not lines:
+            return []
+        header = self._parse(lines[0])
+        if header is None or header.get("base_graph") != self.base_hash:
+            print(f"Warning: graph delta log {self.path} was written for a different base graph, ignoring it")
+            return []
+        return [self._parse(line) for line in lines[1 + start:]]
+
+    @staticmethod
+    def _parse(line):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) else None
+
+    @contextlib.contextmanager
+    def locked(self):
+        """다른 프로세스의 쓰기와 겹치지 않도록 배타 잠금 (블로킹이므로 이벤트 루프 밖에서 잡는다)"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def append(self, record):
+        """delta 요청 하나를 붙인다 (locked() 안에서 호출), 파일이 없거나 기준 그래프가 다르면 새로 시작"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                first = f.readline()
+            header = self._parse(first) if first.endswith("\n") else None
+            fresh = header is None or header.get("base_graph") != self.base_hash
+        except FileNotFoundError:
+            fresh = True
+
+        with open(self.path, "w" if fresh else "a", encoding="utf-8") as f:
+            if fresh:
+                f.write(json.dumps({"base_graph": self.base_hash}) + "\n")
+            f.write(json.dumps(record, allow_nan=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,594 @@
+"""
+성능 측정 스크립트 (ai-server 디렉토리에서 실행)
+
+    python model/benchmark.py loading       # 그래프 로딩: iterrows vs 벡터화 vs 바이너리 스냅샷
+    python model/benchmark.py train-step    # 학습 스텝: 그래프 인코딩 3번 vs 1번
+    python model/benchmark.py bpr-dataset   # BPRDataset 생성: iterrows/리스트 vs 벡터화
+    python model/benchmark.py loader        # 배치 로딩: 샘플별 DataLoader vs BatchLoader
+    python model/benchmark.py negatives     # hard negative: 랜덤 후보 점수화 vs 임베딩 kNN
+    python model/benchmark.py sampled       # 학습 스텝: 전체 그래프 vs 이웃 샘플링 (compound edge 포함/제외)
+    python model/benchmark.py hetero        # 그래프 메모리 / forward: edge 목록 vs 관계별 CSR 블록 (compound edge 포함/제외)
+    python model/benchmark.py precision     # 학습 스텝: float32 vs bfloat16 autocast (시간 / 최대 RSS / 임베딩 오차)
+    python model/benchmark.py cold-start    # 서빙 시작: 체크포인트 + NeuralCF 구성 vs TorchScript 아티팩트 (새 프로세스)
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import DataLoader, Dataset
+from tqdm import tqdm
+
+from dataset import NODES_CSV, EDGES_CSV, COMPOUND_EDGE_TYPES, map_graph_nodes, edges_index, load_graph, BPRDataset, BatchLoader
+from models import NeuralCF
+from negatives import HardNegativeMiner
+from sampling import NeighborSampler
+from graph_store import HeteroGraph
+
+EDGE_TYPE_MAP = {
+    'liqr-ingr': 0,
+    'ingr-ingr': 1,
+    'liqr-liqr': 1,
+    'ingr-fcomp': 2,
+    'ingr-dcomp': 2
+}
+
+
+def timeit(fn, repeat=3):
+    """fn을 repeat번 실행해 (최소 시간, 마지막 결과)"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+# 벡터화 이전 구현 (비교 기준)
+def legacy_map_graph_nodes():
+    nodes_df = pd.read_csv(NODES_CSV)
+
+    nodes_map = {}
+    liquor_map = {}
+    ingredient_map = {}
+    compound_map = {}
+
+    for i, row in nodes_df.iterrows():
+        node_id = row['node_id']
+        node_type = row['node_type']
+
+        if node_type == "liquor":
+            liquor_map[node_id] = i
+        elif node_type == "ingredient":
+            ingredient_map[node_id] = i
+        elif node_type == "compound":
+            compound_map[node_id] = i
+
+        nodes_map[node_id] = i
+    nodes_map["liquor"] = liquor_map
+    nodes_map["ingredient"] = ingredient_map
+    nodes_map["compound"] = compound_map
+
+    return nodes_map
+
+
+def legacy_edges_index(edge_type_map):
+    edges_df = pd.read_csv(EDGES_CSV)
+    nodes_map = legacy_map_graph_nodes()
+
+    edges = []
+    edges_weights = []
+    edges_type = []
+
+    for _, row in tqdm(edges_df.iterrows(), desc="Processing edges...", total=len(edges_df)):
+        src, tgt = row['id_1'], row['id_2']
+        type = row['edge_type']
+
+        if type == "ingr-fcomp" or type == "ingr-dcomp":
+            continue
+
+        edges.append((nodes_map[src], nodes_map[tgt]))
+        edges_weights.append(row['score']) if not pd.isna(row['score']) else edges_weights.append(0.1)
+        edges_type.append(edge_type_map[type])
+
+    edge_index = torch.tensor(edges, dtype=torch.long).t().contiguous()
+    edge_weights = torch.tensor(edges_weights, dtype=torch.float32)
+    edges_type = torch.tensor(edges_type, dtype=torch.long)
+
+    return edge_index, edge_weights, edges_type
+
+
+def bench_loading(args):
+    print(f"Nodes: {NODES_CSV}\nEdges: {EDGES_CSV}\n")
+
+    legacy_nodes_time, legacy_nodes = timeit(legacy_map_graph_nodes, args.repeat)
+    nodes_time, nodes = timeit(map_graph_nodes, args.repeat)
+    assert legacy_nodes == nodes, "map_graph_nodes output differs from the iterrows version"
+
+    legacy_edges_time, legacy_edges = timeit(lambda: legacy_edges_index(EDGE_TYPE_MAP), 1)
+    edges_time, edges = timeit(lambda: edges_index(EDGE_TYPE_MAP), args.repeat)
+    assert all(torch.equal(a, b) for a, b in zip(legacy_edges, edges)), "edges_index output differs from the iterrows version"
+
+    load_graph()  # 스냅샷이 없거나 stale이면 여기서 컴파일
+    snapshot_time, snapshot_edges = timeit(lambda: load_graph().edges(EDGE_TYPE_MAP), args.repeat)
+    assert all(torch.equal(a, b) for a, b in zip(legacy_edges, snapshot_edges)), "snapshot edges differ from the iterrows version"
+
+    print(f"\n{'':<20}{'iterrows':>12}{'vectorized':>12}{'snapshot':>12}{'speedup':>10}")
+    print(f"{'map_graph_nodes':<20}{legacy_nodes_time:>11.3f}s{nodes_time:>11.3f}s{'-':>12}{legacy_nodes_time / nodes_time:>9.1f}x")
+    print(f"{'edges_index':<20}{legacy_edges_time:>11.3f}s{edges_time:>11.3f}s{snapshot_time:>11.3f}s{legacy_edges_time / edges_time:>9.1f}x")
+
+
+# 벡터화 이전 BPRDataset 생성 (비교 기준)
+def legacy_bpr_samples(positive_pairs, hard_negatives, num_items, negative_ratio=5.0):
+    BPR_samples = []
+    positive_list = []
+    negative_list = []
+    positive_set = set()
+
+    for _, row in positive_pairs.iterrows():
+        positive_list.append((row['liquor_id'], row['ingredient_id']))
+        positive_set.add((row['liquor_id'], row['ingredient_id']))
+
+    for _, row in hard_negatives.iterrows():
+        negative_list.append((row['liquor_id'], row['ingredient_id']))
+
+    for u, i in positive_list:
+        for _ in range(int(negative_ratio)):
+            while True:
+                j = random.randint(0, num_items - 1)
+                if (u, j) not in positive_set:
+                    BPR_samples.append((u, i, j))
+                    break
+
+    for u, j in negative_list:
+        positives_for_u = [i for x, i in positive_list if x == u]
+        if positives_for_u:
+            i = random.choice(positives_for_u)
+            BPR_samples.append((u, i, j))
+
+    return BPR_samples
+
+
+def load_pairs():
+    mapping = map_graph_nodes()
+    pairs = []
+    for path in ("./liquor_good_ingredients.csv", "./liquor_bad_ingredients.csv"):
+        df = pd.read_csv(path)[['liquor_id', 'ingredient_id']]
+        df['liquor_id'] = df['liquor_id'].map(mapping['liquor'])
+        df['ingredient_id'] = df['ingredient_id'].map(mapping['ingredient'])
+        pairs.append(df.dropna().astype(np.int64))
+    return pairs
+
+
+def bench_bpr_dataset(args):
+    positive_pairs, hard_negatives = load_pairs()
+    positive_pairs = positive_pairs.sample(frac=args.fraction, random_state=42)
+    print(f"{len(positive_pairs)} positives, {len(hard_negatives)} hard negatives\n")
+
+    legacy_time, legacy = timeit(lambda: legacy_bpr_samples(positive_pairs, hard_negatives, 6498), 1)
+    vectorized_time, dataset = timeit(lambda: BPRDataset(positive_pairs, hard_negatives, num_users=155, num_items=6498), args.repeat)
+    resample_time, _ = timeit(dataset.resample_negatives, args.repeat)
+    assert len(legacy) == len(dataset), "triple count differs from the legacy construction"
+
+    print(f"{'legacy':<20}{legacy_time:>10.3f}s")
+    print(f"{'vectorized':<20}{vectorized_time:>10.3f}s{legacy_time / vectorized_time:>10.1f}x")
+    print(f"{'resample_negatives':<20}{resample_time:>10.3f}s")
+
+
+class LegacyBPRSamples(Dataset):
+    # 이전 BPRDataset.__getitem__: 튜플 리스트에서 샘플마다 텐서 3개 생성
+    def __init__(self, samples):
+        self.BPR_samples = samples
+
+    def __len__(self):
+        return len(self.BPR_samples)
+
+    def __getitem__(self, idx):
+        u, pos, neg = self.BPR_samples[idx]
+        return torch.tensor(u, dtype=torch.long), torch.tensor(pos, dtype=torch.long), torch.tensor(neg, dtype=torch.long)
+
+
+def bench_loader(args):
+    positive_pairs, hard_negatives = load_pairs()
+    dataset = BPRDataset(positive_pairs.sample(frac=0.64, random_state=42), hard_negatives, num_users=155, num_items=6498)
+    legacy = LegacyBPRSamples(list(zip(*(t.tolist() for t in dataset.tensors()))))
+    print(f"{len(dataset)} triples, batch size {args.batch_size}\n")
+
+    loaders = {
+        'DataLoader (per-sample)': DataLoader(legacy, batch_size=args.batch_size, shuffle=True),
+        'DataLoader (__getitems__)': DataLoader(dataset, batch_size=args.batch_size, shuffle=True, collate_fn=BPRDataset.collate),
+        'BatchLoader': BatchLoader(dataset, batch_size=args.batch_size, shuffle=True),
+        'BatchLoader (prefetch)': BatchLoader(dataset, batch_size=args.batch_size, shuffle=True, pin_memory=True, prefetch=2),
+    }
+
+    def epoch(loader):
+        n = 0
+        for user, pos, neg in loader:
+            n += len(user)
+        return n
+
+    baseline = None
+    for name, loader in loaders.items():
+        seconds, n = timeit(lambda: epoch(loader), 1 if name == 'DataLoader (per-sample)' else args.repeat)
+        assert n == len(dataset)
+        baseline = baseline or seconds
+        print(f"{name:<28}{n / seconds:>14,.0f} samples/s{baseline / seconds:>9.1f}x")
+
+
+def candidate_negatives(model, x, user, num_candidates, topk=5):
+    # train.select_hard_negatives와 같은 방식 (후보 num_candidates개를 헤드로 점수화)
+    candidates = torch.randint(0, 6498, (user.size(0), num_candidates))
+    with torch.no_grad():
+        scores = model.score(x, user.unsqueeze(1).expand_as(candidates).reshape(-1), candidates.reshape(-1))
+    _, idx = torch.topk(scores.view(user.size(0), num_candidates), k=min(topk, num_candidates), dim=1)
+    rows = torch.arange(user.size(0))
+    return candidates[rows, idx[rows, torch.randint(0, idx.size(1), (user.size(0),))]]
+
+
+def bench_negatives(args):
+    graph = load_graph()
+    mapping = graph.nodes_map()
+    edges_indexes, edges_weights, edges_type = graph.edges(EDGE_TYPE_MAP)
+    positive_pairs, hard_negatives = load_pairs()
+    dataset = BPRDataset(positive_pairs, hard_negatives, num_users=155, num_items=6498)
+
+    model = NeuralCF(num_users=155, num_items=6498, emb_size=128)
+    model.eval()
+    with torch.no_grad():
+        x = model.encode(edges_indexes, edges_type, edges_weights)
+
+    ingredient_indices = list(mapping['ingredient'].values())
+    miner = HardNegativeMiner.from_dataset(dataset, ingredient_indices, refresh_every=args.refresh_every)
+    refresh_time, _ = timeit(lambda: miner.refresh(x), args.repeat)
+
+    user = dataset.users[torch.randint(0, len(dataset), (args.batch_size,))]
+    positives = set(zip(dataset.positive_users.tolist(), dataset.positive_items.tolist()))
+
+    def report(name, fn, extra=0.0):
+        seconds, neg = timeit(fn, args.repeat)
+        with torch.no_grad():
+            score = model.score(x, user, neg).mean().item()
+            cosine = torch.nn.functional.cosine_similarity(x[user], x[neg]).mean().item()
+        positive_rate = np.mean([(u, n) in positives for u, n in zip(user.tolist(), neg.tolist())])
+        print(f"{name:<22}{(seconds + extra) * 1000:>10.2f} ms{score:>10.4f}{cosine:>10.4f}{positive_rate:>10.3f}")
+
+    print(f"batch size {args.batch_size}, kNN refresh {refresh_time * 1000:.1f} ms every {args.refresh_every} steps\n")
+    print(f"{'':<22}{'per step':>13}{'score':>10}{'cosine':>10}{'positive':>10}")
+    report('uniform', lambda: torch.tensor(ingredient_indices)[torch.randint(0, len(ingredient_indices), (args.batch_size,))])
+    for num_candidates in (10, 100):
+        report(f'candidates x{num_candidates}', lambda: candidate_negatives(model, x, user, num_candidates))
+    report('kNN miner', lambda: miner.sample(user), extra=refresh_time / args.refresh_every)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def sampled_step_worker(with_compounds, sampled, fanouts, batch_size, steps, results):
+    # 설정마다 새 프로세스에서 돌려 최대 RSS를 따로 잰다
+    graph = load_graph()
+    mapping = graph.nodes_map()
+    skip_types = () if with_compounds else COMPOUND_EDGE_TYPES
+    edges_indexes, edges_weights, edges_type = graph.edges(EDGE_TYPE_MAP, skip_types=skip_types)
+    edges = (edges_indexes, edges_type, edges_weights)
+
+    torch.manual_seed(0)
+    model = NeuralCF(num_users=155, num_items=6498, num_relations=3 if with_compounds else 2, emb_size=128)
+    model.train()
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.0002)
+    sampler = NeighborSampler(edges_indexes, edges_type, edges_weights, num_nodes=model.num_nodes, fanouts=fanouts)
+
+    liquors = torch.tensor(list(mapping['liquor'].values()))
+    ingredients = torch.tensor(list(mapping['ingredient'].values()))
+    base_rss = peak_rss_mb()
+
+    def step():
+        user = liquors[torch.randint(0, len(liquors), (batch_size,))]
+        pos = ingredients[torch.randint(0, len(ingredients), (batch_size,))]
+        neg = ingredients[torch.randint(0, len(ingredients), (batch_size,))]
+        optimizer.zero_grad()
+        if sampled:
+            sub = sampler.sample(torch.cat([user, pos, neg]))
+            x = model.encode(sub.edge_index, sub.edge_type, sub.edge_weight, n_id=sub.n_id)
+            user, pos, neg = sub.local(user), sub.local(pos), sub.local(neg)
+        else:
+            x = model.encode(*edges)
+        loss = -torch.mean(torch.log(torch.sigmoid(model.score(x, user, pos) - model.score(x, user, neg)) + 1e-10))
+        loss.backward()
+        optimizer.step()
+
+    step()  # warmup
+    seconds, _ = timeit(step, steps)
+    results.put((edges_indexes.size(1), seconds, peak_rss_mb() - base_rss))
+
+
+def bench_sampled(args):
+    fanouts = [int(f) for f in args.fanouts.split(',')]
+    ctx = mp.get_context('spawn')
+    print(f"batch size {args.batch_size}, fanouts {fanouts}\n")
+    print(f"{'':<28}{'edges':>10}{'ms/step':>10}{'peak RSS +MB':>14}")
+    for with_compounds in (False, True):
+        for sampled in (False, True):
+            results = ctx.Queue()
+            worker = ctx.Process(target=sampled_step_worker, args=(with_compounds, sampled, fanouts, args.batch_size, args.repeat, results))
+            worker.start()
+            num_edges, seconds, rss = results.get()
+            worker.join()
+            name = f"{'sampled' if sampled else 'full graph'}{' + compounds' if with_compounds else ''}"
+            print(f"{name:<28}{num_edges:>10}{seconds * 1000:>10.1f}{rss:>14.1f}")
+
+
+def hetero_forward_worker(with_compounds, blocks, steps, results):
+    # 설정마다 새 프로세스에서 돌려 최대 RSS를 따로 잰다
+    graph = load_graph()
+    num_relations = 3 if with_compounds else 2
+    base_rss = peak_rss_mb()
+
+    start = time.perf_counter()
+    store = HeteroGraph(graph, EDGE_TYPE_MAP)
+    if blocks:
+        graph_bytes = store.memory_bytes(num_relations)
+        num_edges = sum(b.adj.values().size(0) for b in store.blocks(num_relations))
+    else:
+        edges_indexes, edges_weights, edges_type = store.edges(num_relations)
+        graph_bytes = sum(t.numel() * t.element_size() for t in (edges_indexes, edges_weights, edges_type))
+        num_edges = edges_indexes.size(1)
+    load_seconds = time.perf_counter() - start
+
+    torch.manual_seed(0)
+    model = NeuralCF(num_users=155, num_items=6498, num_relations=num_relations, emb_size=128)
+    model.eval()
+
+    def forward():
+        with torch.no_grad():
+            if blocks:
+                return model.encode_graph(store)
+            return model.encode(edges_indexes, edges_type, edges_weights)
+
+    forward()  # warmup
+    seconds, _ = timeit(forward, steps)
+    results.put((num_edges, graph_bytes / 2 ** 20, load_seconds, seconds, peak_rss_mb() - base_rss))
+
+
+def bench_hetero(args):
+    ctx = mp.get_context('spawn')
+    print(f"{'':<30}{'edges':>10}{'graph MB':>10}{'load ms':>10}{'forward ms':>12}{'peak RSS +MB':>14}")
+    for with_compounds in (False, True):
+        for blocks in (False, True):
+            results = ctx.Queue()
+            worker = ctx.Process(target=hetero_forward_worker, args=(with_compounds, blocks, args.repeat, results))
+            worker.start()
+            num_edges, graph_mb, load_seconds, seconds, rss = results.get()
+            worker.join()
+            name = f"{'relation blocks' if blocks else 'edge list (message)'}{' + compounds' if with_compounds else ''}"
+            print(f"{name:<30}{num_edges:>10}{graph_mb:>10.2f}{load_seconds * 1000:>10.1f}{seconds * 1000:>12.1f}{rss:>14.1f}")
+
+
+# cold-start: 새 인터프리터에서 import부터 첫 점수까지 (마지막 줄에 단계별 시간을 JSON으로 출력)
+CHECKPOINT_COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+import torch
+sys.path.insert(0, 'model')
+from models import NeuralCF
+from dataset import load_graph
+imported = time.perf_counter()
+graph = load_graph()
+mapping = graph.nodes_map()
+edges_indexes, edges_weights, edge_type = graph.edges({edge_type_map!r})
+model = NeuralCF.from_state_dict(torch.load({path!r}, map_location=torch.device('cpu')))
+model.eval()
+model.cache_embeddings(edges_indexes, edge_type, edges_weights)
+loaded = time.perf_counter()
+with torch.no_grad():
+    model(torch.tensor([mapping['liquor'][{liquor_id}]]), torch.tensor([mapping['ingredient'][{ingredient_id}]]), edges_indexes, edge_type, edges_weights)
+scored = time.perf_counter()
+print(json.dumps([imported - start, loaded - imported, scored - loaded, 'torch_geometric' in sys.modules]))
+"""
+
+SCRIPTED_COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+import torch
+sys.path.insert(0, 'model')
+from export import load_scripted
+imported = time.perf_counter()
+model = load_scripted({path!r})
+loaded = time.perf_counter()
+with torch.no_grad():
+    model.module.score_ids(torch.tensor([{liquor_id}]), torch.tensor([{ingredient_id}]))
+scored = time.perf_counter()
+print(json.dumps([imported - start, loaded - imported, scored - loaded, 'torch_geometric' in sys.modules]))
+"""
+
+
+def bench_cold_start(args):
+    if not os.path.exists(args.artifact):
+        subprocess.run([sys.executable, 'model/export.py', '--checkpoint', args.checkpoint, '--output', args.artifact], check=True)
+
+    mapping = load_graph().nodes_map()
+    pair = dict(liquor_id=next(iter(mapping['liquor'])), ingredient_id=next(iter(mapping['ingredient'])))
+
+    print(f"\n{'':<22}{'MB':>8}{'total ms':>10}{'import ms':>11}{'load ms':>10}{'score ms':>10}  torch_geometric")
+    for name, template, path in (("checkpoint", CHECKPOINT_COLD_START, args.checkpoint), ("torchscript", SCRIPTED_COLD_START, args.artifact)):
+        code = template.format(path=path, edge_type_map=EDGE_TYPE_MAP, **pair)
+        best = None
+        for _ in range(args.repeat):
+            # 인터프리터 시작과 import까지 포함하도록 매번 새 프로세스
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+            total = time.perf_counter() - start
+            if best is None or total < best[0]:
+                best = (total, *json.loads(out.strip().splitlines()[-1]))
+        total, imported, loaded, scored, uses_pyg = best
+        print(f"{name:<22}{os.path.getsize(path) / 2 ** 20:>8.2f}{total * 1000:>10.1f}{imported * 1000:>11.1f}"
+              f"{loaded * 1000:>10.1f}{scored * 1000:>10.1f}  {'yes' if uses_pyg else 'no'}")
+
+
+def bpr_step_unfused(model, optimizer, user, pos, edges, num_neg_candidates=10, topk=5):
+    # 이전 train_model 스텝: model(...) 호출마다 전체 그래프 인코딩
+    optimizer.zero_grad()
+    pos_output = model(user, pos, *edges)
+    neg_candidates = torch.randint(0, 6498, (user.size(0), num_neg_candidates))
+    neg_scores = model(user.unsqueeze(1).expand_as(neg_candidates).reshape(-1), neg_candidates.reshape(-1), *edges)
+    _, hard_idx = torch.topk(neg_scores.view(user.size(0), num_neg_candidates), k=topk, dim=1)
+    hard_neg = neg_candidates[torch.arange(user.size(0)), hard_idx[torch.arange(user.size(0)), torch.randint(0, topk, (user.size(0),))]]
+    neg_output = model(user, hard_neg, *edges)
+    loss = -torch.mean(torch.log(torch.sigmoid(pos_output - neg_output) + 1e-10))
+    loss.backward()
+    optimizer.step()
+
+
+def bpr_step_fused(model, optimizer, user, pos, edges, num_neg_candidates=10, topk=5):
+    # 현재 train_model 스텝: encode 한 번 + score 여러 번
+    optimizer.zero_grad()
+    x = model.encode(*edges)
+    pos_output = model.score(x, user, pos)
+    neg_candidates = torch.randint(0, 6498, (user.size(0), num_neg_candidates))
+    with torch.no_grad():
+        neg_scores = model.score(x.detach(), user.unsqueeze(1).expand_as(neg_candidates).reshape(-1), neg_candidates.reshape(-1))
+    _, hard_idx = torch.topk(neg_scores.view(user.size(0), num_neg_candidates), k=topk, dim=1)
+    hard_neg = neg_candidates[torch.arange(user.size(0)), hard_idx[torch.arange(user.size(0)), torch.randint(0, topk, (user.size(0),))]]
+    neg_output = model.score(x, user, hard_neg)
+    loss = -torch.mean(torch.log(torch.sigmoid(pos_output - neg_output) + 1e-10))
+    loss.backward()
+    optimizer.step()
+
+
+def precision_step_worker(precision, propagation, batch_size, steps, results):
+    # precision마다 새 프로세스에서 돌려 최대 RSS를 따로 잰다 (스텝은 train_model과 같은 코드)
+    from train import autocast, bpr_loss, select_hard_negatives
+
+    graph = load_graph()
+    mapping = graph.nodes_map()
+    edges_indexes, edges_weights, edges_type = graph.edges(EDGE_TYPE_MAP, skip_types=COMPOUND_EDGE_TYPES)
+    edges = (edges_indexes, edges_type, edges_weights)
+    device = torch.device('cpu')
+
+    torch.manual_seed(0)
+    model = NeuralCF(num_users=155, num_items=6498, emb_size=128, propagation=propagation)
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.0002)
+
+    # 같은 가중치에서 float32 인코딩 대비 상대 오차
+    model.eval()
+    with torch.no_grad():
+        reference = model.encode(*edges)
+        with autocast(device, precision):
+            x = model.encode(*edges)
+    error = ((x.float() - reference).norm() / reference.norm()).item()
+    model.train()
+
+    liquors = torch.tensor(list(mapping['liquor'].values()))
+    ingredients = torch.tensor(list(mapping['ingredient'].values()))
+    base_rss = peak_rss_mb()
+
+    def step():
+        user = liquors[torch.randint(0, len(liquors), (batch_size,))]
+        pos = ingredients[torch.randint(0, len(ingredients), (batch_size,))]
+        optimizer.zero_grad()
+        with autocast(device, precision):
+            x = model.encode(*edges)
+            pos_output = model.score(x, user, pos)
+            neg_output = model.score(x, user, select_hard_negatives(model, x, user))
+        loss = bpr_loss(pos_output, neg_output)
+        loss.backward()
+        optimizer.step()
+
+    step()  # warmup
+    seconds, _ = timeit(step, steps)
+    results.put((seconds, peak_rss_mb() - base_rss, error))
+
+
+def bench_precision(args):
+    ctx = mp.get_context('spawn')
+    print(f"batch size {args.batch_size}\n")
+    print(f"{'':<18}{'ms/step':>10}{'samples/s':>12}{'peak RSS +MB':>14}{'rel. error':>12}")
+    for propagation in ('message', 'sparse'):
+        baseline = None
+        for precision in ('fp32', 'bf16'):
+            results = ctx.Queue()
+            worker = ctx.Process(target=precision_step_worker, args=(precision, propagation, args.batch_size, args.repeat, results))
+            worker.start()
+            seconds, rss, error = results.get()
+            worker.join()
+            baseline = baseline or seconds
+            print(f"{f'{propagation} {precision}':<18}{seconds * 1000:>10.1f}{args.batch_size / seconds:>12.1f}{rss:>14.1f}{error:>12.2e}"
+                  + (f"  ({baseline / seconds:.2f}x)" if precision != 'fp32' else ''))
+
+
+def bench_train_step(args):
+    graph = load_graph()
+    mapping = graph.nodes_map()
+    edges_indexes, edges_weights, edges_type = graph.edges(EDGE_TYPE_MAP)
+    edges = (edges_indexes, edges_type, edges_weights)
+
+    liquors = torch.tensor(list(mapping['liquor'].values()))
+    ingredients = torch.tensor(list(mapping['ingredient'].values()))
+    user = liquors[torch.randint(0, len(liquors), (args.batch_size,))]
+    pos = ingredients[torch.randint(0, len(ingredients), (args.batch_size,))]
+
+    results = {}
+    for name, step in (('unfused', bpr_step_unfused), ('fused', bpr_step_fused)):
+        torch.manual_seed(0)
+        model = NeuralCF(num_users=155, num_items=6498, emb_size=128)
+        model.train()
+        optimizer = torch.optim.Adam(model.parameters(), lr=0.0002)
+        step(model, optimizer, user, pos, edges)  # warmup
+        results[name], _ = timeit(lambda: step(model, optimizer, user, pos, edges), args.repeat)
+
+    print(f"\nbatch size {args.batch_size}")
+    for name, seconds in results.items():
+        print(f"{name:<10}{seconds * 1000:>10.1f} ms/step{args.batch_size / seconds:>12.1f} samples/s")
+    print(f"speedup   {results['unfused'] / results['fused']:>10.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks for the ai-server model code')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions per measurement (best time is reported)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('loading', help='CSV graph loading: iterrows vs vectorized vs binary snapshot').set_defaults(func=bench_loading)
+
+    train_step = subparsers.add_parser('train-step', help='BPR training step: three graph encodes vs one')
+    train_step.add_argument('--batch-size', type=int, default=64)
+    train_step.set_defaults(func=bench_train_step)
+
+    bpr_dataset = subparsers.add_parser('bpr-dataset', help='BPRDataset construction: legacy loops vs vectorized')
+    bpr_dataset.add_argument('--fraction', type=float, default=0.64, help='Fraction of positives to use (0.64 = train split)')
+    bpr_dataset.set_defaults(func=bench_bpr_dataset)
+
+    loader = subparsers.add_parser('loader', help='Batch loading: per-sample DataLoader vs BatchLoader')
+    loader.add_argument('--batch-size', type=int, default=64)
+    loader.set_defaults(func=bench_loader)
+
+    negatives = subparsers.add_parser('negatives', help='Hard negative mining: scored random candidates vs embedding kNN')
+    negatives.add_argument('--batch-size', type=int, default=64)
+    negatives.add_argument('--refresh-every', type=int, default=100)
+    negatives.set_defaults(func=bench_negatives)
+
+    sampled = subparsers.add_parser('sampled', help='Training step: full graph vs neighbor sampling, with and without compound edges')
+    sampled.add_argument('--batch-size', type=int, default=64)
+    sampled.add_argument('--fanouts', type=str, default='10,10,10')
+    sampled.set_defaults(func=bench_sampled)
+
+    subparsers.add_parser('hetero', help='Graph memory and forward latency: edge list vs per-relation CSR blocks, with and without compound edges').set_defaults(func=bench_hetero)
+
+    precision = subparsers.add_parser('precision', help='Training step: float32 vs bfloat16 autocast (time, peak RSS, embedding error)')
+    precision.add_argument('--batch-size', type=int, default=64)
+    precision.set_defaults(func=bench_precision)
+
+    cold_start = subparsers.add_parser('cold-start', help='Serving startup: checkpoint + NeuralCF construction vs TorchScript artifact, in fresh processes')
+    cold_start.add_argument('--checkpoint', type=str, default='./model/checkpoint/best_model.pth')
+    cold_start.add_argument('--artifact', type=str, default='./model/checkpoint/best_model.script.pt', help='Exported with model/export.py if missing')
+    cold_start.set_defaults(func=bench_cold_start)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,205 @@
+"""
+학습 체크포인트 관리
+
+학습 루프는 epoch마다 모델 / optimizer 상태를 CPU로 복사(snapshot)만 하고, 파일 쓰기는 백그라운드 스레드가 한다.
+    - epoch_{n}.pth    :   이어서 학습할 수 있는 전체 상태 (모델, optimizer, scheduler, EarlyStopping, RNG, 데이터셋 샘플링 / hard negative miner 상태, best val loss)
+                           최근 keep_last개만 남기고 오래된 것은 지운다
+    - best_model.pth   :   검증 loss가 가장 좋았던 모델의 state_dict (서빙 / export 스크립트가 그대로 로드)
+파일은 임시 파일에 쓴 뒤 os.replace로 바꿔서, 쓰는 도중에 프로세스가 죽어도 이전 파일이 깨지지 않는다.
+resume()은 가장 최근 epoch 파일에서 상태를 복원해 중단된 다음 epoch부터 같은 결과로 이어서 학습하게 한다.
+"""
+import os
+import queue
+import random
+import re
+import tempfile
+import threading
+
+import numpy as np
+import torch
+
+CHECKPOINT_VERSION = 1
+EPOCH_FILE = re.compile(r"^epoch_(\d+)\.pth$")
+
+
+def cpu_snapshot(obj):
+    """state_dict 등 중첩 구조의 텐서를 CPU 복사본으로 (이후 학습이 바꿔도 저장할 값은 그대로)"""
+    if torch.is_tensor(obj):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {k: cpu_snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(cpu_snapshot(v) for v in obj)
+    return obj
+
+
+def rng_state(generator=None):
+    """python / numpy / torch(CUDA 포함) 전역 RNG 상태, generator를 주면 (BatchLoader 셔플 등) 함께"""
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    if generator is not None:
+        state["generator"] = generator.get_state()
+    return state
+
+
+def set_rng_state(state, generator=None):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+    if generator is not None and "generator" in state:
+        generator.set_state(state["generator"])
+
+
+def atomic_save(obj, path):
+    """같은 디렉토리의 고유한 임시 파일에 저장한 뒤 rename (실패하면 임시 파일은 지운다)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            torch.save(obj, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+class CheckpointManager:
+    """
+    directory    :   체크포인트 디렉토리
+    keep_last    :   남길 epoch 체크포인트 수 (best_model.pth는 따로 항상 유지)
+    async_write  :   False면 호출한 스레드에서 바로 쓴다
+    max_pending  :   쓰기 대기 중인 snapshot 수 상한 (넘으면 학습 루프가 기다린다)
+    """
+
+    def __init__(self, directory="./model/checkpoint", keep_last=3, async_write=True, max_pending=2):
+        self.directory = directory
+        self.keep_last = keep_last
+        self.best_path = os.path.join(directory, "best_model.pth")
+        os.makedirs(directory, exist_ok=True)
+
+        self._error = None
+        self._queue = None
+        self._writer = None
+        if async_write:
+            self._queue = queue.Queue(maxsize=max_pending)
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+
+    def epoch_path(self, epoch):
+        return os.path.join(self.directory, f"epoch_{epoch}.pth")
+
+    def epochs(self):
+        """
+        디렉토리에 있는 epoch 체크포인트 번호 (쓰인 순서)
+        이전 학습의 더 큰 번호 파일이 남아 있어도 이번 학습 파일이 최신이 되도록 번호가 아닌 수정 시각 기준
+        """
+        epochs = [int(m.group(1)) for m in map(EPOCH_FILE.match, os.listdir(self.directory)) if m]
+        return sorted(epochs, key=lambda epoch: os.stat(self.epoch_path(epoch)).st_mtime_ns)
+
+    def _write_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                if self._error is None:
+                    self._write(*job)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, obj, path, prune):
+        atomic_save(obj, path)
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        for epoch in self.epochs()[:-self.keep_last] if self.keep_last > 0 else []:
+            os.remove(self.epoch_path(epoch))
+
+    def _submit(self, obj, path, prune=False):
+        if self._error is not None:
+            raise RuntimeError(f"Checkpoint writer failed: {self._error}") from self._error
+        if self._queue is None:
+            self._write(obj, path, prune)
+        else:
+            self._queue.put((obj, path, prune))
+
+    def save_epoch(self, epoch, model, optimizer, early_stopping=None, scheduler=None, best_val_loss=float("inf"), generator=None, dataset=None, miner=None):
+        """
+        epoch이 끝난 시점의 학습 상태를 snapshot해서 epoch_{epoch}.pth로 (쓰기는 백그라운드)
+        dataset / miner를 주면 각각의 state_dict()도 함께 저장 (BPRDataset의 negative 샘플링 RNG, HardNegativeMiner의 스텝 수와 이웃 목록)
+        """
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "epoch": epoch,
+            "model": cpu_snapshot(model.state_dict()),
+            "optimizer": cpu_snapshot(optimizer.state_dict()),
+            "scheduler": scheduler.state_dict() if scheduler is not None else None,
+            "early_stopping": dict(vars(early_stopping)) if early_stopping is not None else None,
+            "best_val_loss": best_val_loss,
+            "rng": rng_state(generator),
+            "dataset": cpu_snapshot(dataset.state_dict()) if dataset is not None else None,
+            "miner": cpu_snapshot(miner.state_dict()) if miner is not None else None,
+        }
+        self._submit(state, self.epoch_path(epoch), prune=True)
+
+    def save_best(self, model):
+        """best_model.pth (plain state_dict)"""
+        self._submit(cpu_snapshot(model.state_dict()), self.best_path)
+
+    def latest(self):
+        """가장 최근 epoch 체크포인트 경로 (없으면 None)"""
+        epochs = self.epochs()
+        return self.epoch_path(epochs[-1]) if epochs else None
+
+    def resume(self, model, optimizer, early_stopping=None, scheduler=None, generator=None, dataset=None, miner=None, map_location=None):
+        """
+        가장 최근 epoch 체크포인트로 상태를 복원하고 (다음 epoch, best val loss) 반환
+        체크포인트가 없으면 아무것도 바꾸지 않고 (0, inf)
+        체크포인트에 miner 상태가 없으면 (miner 없이 학습) miner는 그대로라 첫 스텝에 목록을 새로 만든다
+        """
+        path = self.latest()
+        if path is None:
+            return 0, float("inf")
+
+        state = torch.load(path, map_location=map_location or torch.device("cpu"), weights_only=False)
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path} is not a resumable checkpoint (version {state.get('version')})")
+
+        model.load_state_dict(state["model"])
+        optimizer.load_state_dict(state["optimizer"])
+        if scheduler is not None and state["scheduler"] is not None:
+            scheduler.load_state_dict(state["scheduler"])
+        if early_stopping is not None and state["early_stopping"] is not None:
+            vars(early_stopping).update(state["early_stopping"])
+        set_rng_state(state["rng"], generator)
+        if dataset is not None and state.get("dataset") is not None:
+            dataset.load_state_dict(state["dataset"])
+        if miner is not None and state.get("miner") is not None:
+            miner.load_state_dict(state["miner"])
+
+        print(f"Resumed from {path} (epoch {state['epoch'] + 1}, best validation loss {state['best_val_loss']:.4f})")
+        return state["epoch"] + 1, state["best_val_loss"]
+
+    def wait(self):
+        """대기 중인 쓰기가 끝날 때까지 기다린다"""
+        if self._queue is not None:
+            self._queue.join()
+        if self._error is not None:
+            raise RuntimeError(f"Checkpoint writer failed: {self._error}") from self._error
+
+    def close(self):
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        if self._error is not None:
+            raise RuntimeError(f"Checkpoint writer failed: {self._error}") from self._error
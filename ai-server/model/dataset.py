@@ -1,114 +1,323 @@
+import os
+import json
+import struct
+import tempfile
 import pandas as pd
-from collections import defaultdict
 import pickle
 import numpy as np
-import random
-from tqdm import tqdm
+import queue
+import threading
 
 import torch
 from torch.utils.data import Dataset
 
+NODES_CSV = "./dataset/nodes_191120_updated.csv"
+EDGES_CSV = "./dataset/edges_191120_updated.csv"
+SNAPSHOT_PATH = "./dataset/graph_snapshot.bin"
+COMPOUND_EDGE_TYPES = ("ingr-fcomp", "ingr-dcomp")
+
 def map_graph_nodes():
-    nodes_df = pd.read_csv("./dataset/nodes_191120_updated.csv")
+    nodes_df = pd.read_csv(NODES_CSV)
 
-    nodes_map = {}
-    liquor_map = {}
-    ingredient_map = {}
-    compound_map = {}
-    
-    for i, row in nodes_df.iterrows():
-        node_id = row['node_id']
-        node_type = row['node_type']
-        
-        if node_type == "liquor":
-            liquor_map[node_id] = i
-        elif node_type == "ingredient":
-            ingredient_map[node_id] = i
-        elif node_type == "compound":
-            compound_map[node_id] = i
-        
-        nodes_map[node_id] = i
-    nodes_map["liquor"] = liquor_map
-    nodes_map["ingredient"] = ingredient_map
-    nodes_map["compound"] = compound_map
+    node_ids = nodes_df['node_id'].to_numpy()
+    node_types = nodes_df['node_type'].to_numpy()
+
+    # node_id -> 행 인덱스 (전체) + 타입별 dict
+    nodes_map = dict(zip(node_ids.tolist(), range(len(node_ids))))
+    for node_type in ("liquor", "ingredient", "compound"):
+        idx = np.flatnonzero(node_types == node_type)
+        nodes_map[node_type] = dict(zip(node_ids[idx].tolist(), idx.tolist()))
     
     return nodes_map
 
 def edges_index(edge_type_map):
-    edges_df = pd.read_csv("./dataset/edges_191120_updated.csv")
-    nodes_map = map_graph_nodes()
+    edges_df = pd.read_csv(EDGES_CSV)
+    node_pos = pd.Index(pd.read_csv(NODES_CSV, usecols=['node_id'])['node_id'])
 
-    edges_index = []
-    edges_weights = []
-    edges_type = []
+    # compound edge 제외
+    edges_df = edges_df[~edges_df['edge_type'].isin(COMPOUND_EDGE_TYPES)]
 
-    for _, row in tqdm(edges_df.iterrows(), desc="Processing edges...", total=len(edges_df)):
-        src, tgt = row['id_1'], row['id_2']
-        type = row['edge_type']
-        
-        if type == "ingr-fcomp" or type == "ingr-dcomp":
-            continue
-        
-        src_idx = nodes_map[src]
-        tgt_idx = nodes_map[tgt]
-        
-        edges_index.append((src_idx, tgt_idx))
-        edges_weights.append(row['score']) if not pd.isna(row['score']) else edges_weights.append(0.1)
-        edges_type.append(edge_type_map[type])
+    src_idx = node_pos.get_indexer(edges_df['id_1'].to_numpy())
+    tgt_idx = node_pos.get_indexer(edges_df['id_2'].to_numpy())
+    if (src_idx < 0).any() or (tgt_idx < 0).any():
+        missing = edges_df['id_1'][src_idx < 0].tolist() + edges_df['id_2'][tgt_idx < 0].tolist()
+        raise KeyError(f"Edges reference unknown node ids: {missing[:10]}")
+
+    edges_type = edges_df['edge_type'].map(edge_type_map)
+    if edges_type.isna().any():
+        raise KeyError(f"Unknown edge types: {sorted(set(edges_df['edge_type'][edges_type.isna()]))}")
         
-    edge_index = torch.tensor(edges_index, dtype=torch.long).t().contiguous()
-    edge_weights = torch.tensor(edges_weights, dtype=torch.float32)
-    edges_type = torch.tensor(edges_type, dtype=torch.long)
+    edge_index = torch.from_numpy(np.stack([src_idx, tgt_idx]).astype(np.int64)).contiguous()
+    edge_weights = torch.tensor(edges_df['score'].fillna(0.1).to_numpy(dtype=np.float32))
+    edges_type = torch.tensor(edges_type.to_numpy(dtype=np.int64))
     
     print(f"Edge index shape: {edge_index.shape}")
     print(f"Edge weights shape: {edge_weights.shape}")
 
     return edge_index, edge_weights, edges_type
 
+"""
+그래프 스냅샷 파일 포맷 (little-endian)
+    magic(8) | version(uint32) | header_len(uint64) | header(JSON) | 64바이트 정렬된 배열들
+header["arrays"]에 배열별 dtype/shape/offset, header["sources"]에 원본 CSV의 크기/mtime을 기록해서
+CSV가 바뀌거나 없으면 스냅샷을 stale로 판단한다. 배열은 np.memmap으로 필요할 때만 읽힌다.
+원본 경로는 스냅샷 파일 기준 상대 경로로 기록해서 다른 cwd에서 열어도 같은 CSV를 확인한다.
+"""
+SNAPSHOT_MAGIC = b"FGSNAP\x00\x00"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ALIGN = 64
+
+def _source_stamp(paths, snapshot_path):
+    """{스냅샷 디렉토리 기준 상대 경로: [크기, mtime]}"""
+    base = os.path.dirname(os.path.abspath(snapshot_path))
+    stamp = {}
+    for p in paths:
+        st = os.stat(p)
+        stamp[os.path.relpath(os.path.abspath(p), base)] = [st.st_size, st.st_mtime_ns]
+    return stamp
+
+def _build_snapshot(nodes_csv=NODES_CSV, edges_csv=EDGES_CSV, path=SNAPSHOT_PATH):
+    """CSV를 읽어 스냅샷 header와 배열을 만든다 (edge는 compound 포함 전부, CSV 순서 유지)"""
+    nodes_df = pd.read_csv(nodes_csv)
+    edges_df = pd.read_csv(edges_csv)
+
+    node_ids = nodes_df['node_id'].to_numpy(dtype=np.int64)
+    node_type_names, node_types = np.unique(nodes_df['node_type'].astype(str).to_numpy(), return_inverse=True)
+    edge_type_names, edge_types = np.unique(edges_df['edge_type'].astype(str).to_numpy(), return_inverse=True)
+
+    node_pos = pd.Index(node_ids)
+    edge_src = node_pos.get_indexer(edges_df['id_1'].to_numpy())
+    edge_dst = node_pos.get_indexer(edges_df['id_2'].to_numpy())
+    if (edge_src < 0).any() or (edge_dst < 0).any():
+        missing = edges_df['id_1'][edge_src < 0].tolist() + edges_df['id_2'][edge_dst < 0].tolist()
+        raise KeyError(f"Edges reference unknown node ids: {missing[:10]}")
+
+    names = [None if pd.isna(n) else str(n) for n in nodes_df['name']]
+
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "sources": _source_stamp([nodes_csv, edges_csv], path),
+        "node_types": node_type_names.tolist(),
+        "edge_types": edge_type_names.tolist(),
+        "names": names,
+    }
+    arrays = {
+        "node_ids": node_ids,
+        "node_types": node_types.astype(np.int8),
+        "edge_src": edge_src.astype(np.int64),
+        "edge_dst": edge_dst.astype(np.int64),
+        "edge_weight": edges_df['score'].fillna(0.1).to_numpy(dtype=np.float32),
+        "edge_type": edge_types.astype(np.int8),
+    }
+    return header, arrays
+
+def compile_graph_snapshot(path=SNAPSHOT_PATH, nodes_csv=NODES_CSV, edges_csv=EDGES_CSV):
+    """
+    노드/엣지 CSV를 하나의 바이너리 스냅샷으로 컴파일 (임시 파일에 쓴 뒤 rename)
+    여러 프로세스가 동시에 컴파일해도 서로의 임시 파일을 덮어쓰지 않도록 임시 파일 이름은 프로세스마다 다르다
+    """
+    header, arrays = _build_snapshot(nodes_csv, edges_csv, path)
+
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += -(-arr.nbytes // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+    header["arrays"] = layout
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    prefix_len = len(SNAPSHOT_MAGIC) + 12 + len(header_bytes)
+    data_start = -(-prefix_len // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.",
+                                     suffix=".tmp", delete=False) as f:
+        tmp_path = f.name
+        try:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack("<IQ", SNAPSHOT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for name, arr in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(arr).tobytes())
+            f.truncate(data_start + offset)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+
+    print(f"Graph snapshot written to {path} ({len(arrays['node_ids'])} nodes, {len(arrays['edge_src'])} edges)")
+    return GraphSnapshot(header, arrays)
+
+def load_graph_snapshot(path=SNAPSHOT_PATH, check_sources=True):
+    """
+    스냅샷을 memmap으로 연다
+    파일이 없거나, 버전/원본 CSV가 달라졌거나, header/배열이 잘리거나 깨졌으면 None (load_graph가 다시 컴파일)
+    """
+    if not os.path.exists(path):
+        return None
+
+    file_size = os.path.getsize(path)
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            version, header_len = struct.unpack("<IQ", f.read(12))
+            if version != SNAPSHOT_VERSION or header_len > file_size:
+                return None
+            header = json.loads(f.read(header_len).decode("utf-8"))
+            layout = header["arrays"]
+            sources = header["sources"]
+            # GraphSnapshot이 읽는 필드
+            header["node_types"], header["edge_types"], header["names"]
+    except (struct.error, ValueError, KeyError, TypeError):
+        # ValueError: JSON / UTF-8 디코딩 실패 포함
+        return None
+
+    if check_sources:
+        base = os.path.dirname(os.path.abspath(path))
+        try:
+            if _source_stamp([os.path.join(base, p) for p in sources], path) != sources:
+                return None
+        except (OSError, TypeError):
+            # 원본 CSV가 없으면 최신인지 알 수 없으므로 stale (예전 형식의 cwd 기준 경로도 여기로)
+            return None
+
+    prefix_len = len(SNAPSHOT_MAGIC) + 12 + header_len
+    data_start = -(-prefix_len // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+    arrays = {}
+    try:
+        for name, spec in layout.items():
+            shape = tuple(spec["shape"])
+            dtype = np.dtype(spec["dtype"])
+            if np.prod(shape) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            # 배열이 파일 끝을 넘으면 쓰다가 잘린 파일
+            if data_start + spec["offset"] + int(np.prod(shape)) * dtype.itemsize > file_size:
+                return None
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + spec["offset"], shape=shape)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return GraphSnapshot(header, arrays)
+
+def load_graph(path=SNAPSHOT_PATH, nodes_csv=NODES_CSV, edges_csv=EDGES_CSV):
+    """
+    최신 스냅샷이 있으면 그것을, 없거나 stale이면 CSV에서 다시 컴파일해서 반환
+    스냅샷을 쓸 수 없는 환경(읽기 전용 등)에서는 메모리에서만 만든다
+    """
+    snapshot = load_graph_snapshot(path)
+    if snapshot is not None:
+        return snapshot
+
+    print("Graph snapshot missing or stale, rebuilding from CSV...")
+    try:
+        return compile_graph_snapshot(path, nodes_csv, edges_csv)
+    except OSError as e:
+        print(f"Could not write graph snapshot ({str(e)}), using in-memory graph")
+        return GraphSnapshot(*_build_snapshot(nodes_csv, edges_csv, path))
+
+class GraphSnapshot:
+    """컴파일된 그래프 (map_graph_nodes / edges_index 와 같은 형태로 꺼내 쓴다)"""
+
+    def __init__(self, header, arrays):
+        self.header = header
+        self.arrays = arrays
+
+    @property
+    def num_nodes(self):
+        return len(self.arrays["node_ids"])
+
+    def nodes_map(self):
+        """map_graph_nodes()와 같은 구조의 dict"""
+        node_ids = np.asarray(self.arrays["node_ids"]).tolist()
+        node_types = np.asarray(self.arrays["node_types"])
+
+        nodes_map = dict(zip(node_ids, range(len(node_ids))))
+        for code, type_name in enumerate(self.header["node_types"]):
+            if type_name not in ("liquor", "ingredient", "compound"):
+                continue
+            idx = np.flatnonzero(node_types == code)
+            nodes_map[type_name] = dict(zip(np.asarray(self.arrays["node_ids"])[idx].tolist(), idx.tolist()))
+        for type_name in ("liquor", "ingredient", "compound"):
+            nodes_map.setdefault(type_name, {})
+        return nodes_map
+
+    def names(self, node_type=None):
+        """node_id -> name (node_type을 주면 해당 타입만)"""
+        node_ids = np.asarray(self.arrays["node_ids"]).tolist()
+        names = self.header["names"]
+        if node_type is None:
+            return dict(zip(node_ids, names))
+
+        code = self.header["node_types"].index(node_type)
+        idx = np.flatnonzero(np.asarray(self.arrays["node_types"]) == code).tolist()
+        return {node_ids[i]: names[i] for i in idx}
+
+    def edges(self, edge_type_map, skip_types=COMPOUND_EDGE_TYPES):
+        """edges_index()와 같은 (edge_index, edge_weights, edges_type) 텐서"""
+        type_names = self.header["edge_types"]
+        edge_type = np.asarray(self.arrays["edge_type"])
+
+        keep_codes = [c for c, t in enumerate(type_names) if t not in skip_types]
+        mask = np.isin(edge_type, keep_codes)
+        type_lookup = np.array([edge_type_map[t] if t not in skip_types else -1 for t in type_names], dtype=np.int64)
+
+        src = np.asarray(self.arrays["edge_src"])[mask]
+        dst = np.asarray(self.arrays["edge_dst"])[mask]
+
+        edge_index = torch.from_numpy(np.stack([src, dst])).contiguous()
+        edge_weights = torch.from_numpy(np.asarray(self.arrays["edge_weight"])[mask])
+        edges_type = torch.from_numpy(type_lookup[edge_type[mask]])
+
+        print(f"Edge index shape: {edge_index.shape}")
+        print(f"Edge weights shape: {edge_weights.shape}")
+
+        return edge_index, edge_weights, edges_type
+
 class InteractionDataset(Dataset):
+    """
+    (liquor, ingredient, label) 데이터셋: positive 1, hard negative 0, 랜덤 negative 0
+    users / items / labels 세 개의 연속된 텐서에 저장 (BatchLoader로 배치 단위 슬라이싱)
+    """
+
     def __init__(self, positive_pairs, hard_negatives, num_users, num_items, negative_ratio=5.0):
-        self.samples = []
         self.num_users = num_users
         self.num_items = num_items
 
-        # Positive samples
-        for _, row in positive_pairs.iterrows():
-            self.samples.append((row['liquor_id'], row['ingredient_id'], 1))
+        positive = positive_pairs[['liquor_id', 'ingredient_id']].dropna().to_numpy(dtype=np.int64)
+        hard = hard_negatives[['liquor_id', 'ingredient_id']].dropna().to_numpy(dtype=np.int64)
 
-        # Hard negatives
-        for _, row in hard_negatives.iterrows():
-            self.samples.append((row['liquor_id'], row['ingredient_id'], 0))  
-
-        # Negative samples
+        # Negative samples (positive 쌍에 걸린 것은 버린다)
         num_neg = int(len(positive_pairs) * negative_ratio)
-        for _ in range(num_neg):
-            u = random.randint(0, num_users - 1)
-            i = random.randint(0, num_items - 1)
-            if (u, i) not in positive_pairs:
-                self.samples.append((u, i, 0))
+        random_users = np.random.randint(0, num_users, size=num_neg)
+        random_items = np.random.randint(0, num_items, size=num_neg)
+        positive_keys = np.unique(positive[:, 0] * BPRDataset.KEY_BASE + positive[:, 1])
+        keep = ~np.isin(random_users * BPRDataset.KEY_BASE + random_items, positive_keys)
+
+        self.users = torch.from_numpy(np.concatenate([positive[:, 0], hard[:, 0], random_users[keep]]))
+        self.items = torch.from_numpy(np.concatenate([positive[:, 1], hard[:, 1], random_items[keep]]))
+        self.labels = torch.cat([
+            torch.ones(len(positive), dtype=torch.float32),
+            torch.zeros(len(hard) + int(keep.sum()), dtype=torch.float32),
+        ])
+
+    def tensors(self):
+        return self.users, self.items, self.labels
 
     def __len__(self):
-        return len(self.samples)
+        return len(self.users)
 
     def __getitem__(self, idx):
-        user, item, label = self.samples[idx]
-        return torch.tensor(user), torch.tensor(item), torch.tensor(label, dtype=torch.float32)
+        return self.users[idx], self.items[idx], self.labels[idx]
 
 def preprocess():
-    nodes_df = pd.read_csv("./dataset/nodes_191120_updated.csv")
+    nodes_df = pd.read_csv(NODES_CSV)
     edges_df = pd.read_csv("./dataset/flavor diffusion/edges_191120.csv")
     
-    liquors_map = []
-    ingredients_map = []
-    compounds_map = []
-    
-    for _, row in nodes_df.iterrows():
-        if row['node_type'] == "liquor":
-            liquors_map.append(row['node_id'])
-        elif row['node_type'] == "ingredient":
-            ingredients_map.append(row['node_id'])
-        elif row['node_type'] == "compound":
-            compounds_map.append(row['node_id'])
+    liquors_map = nodes_df.loc[nodes_df['node_type'] == "liquor", 'node_id'].tolist()
+    ingredients_map = nodes_df.loc[nodes_df['node_type'] == "ingredient", 'node_id'].tolist()
+    compounds_map = nodes_df.loc[nodes_df['node_type'] == "compound", 'node_id'].tolist()
     
     print(len(liquors_map))
     print(len(ingredients_map))
@@ -119,71 +328,233 @@ def preprocess():
     with open("./model/data/ingredient_key.pkl", "wb") as f:
         pickle.dump(ingredients_map, f)
     
-    liqr_liqr = 0
-    liqr_ingr = 0
-    ingr_ingr = 0
-    
-    for idx, row in tqdm(edges_df.iterrows(), desc="Changing Edge Type..."):
-        src, tgt = row['id_1'], row['id_2']
-        etype = row['edge_type']
-        
-        if etype == 'ingr-ingr':
-            if src in liquors_map and tgt in liquors_map:
-                edges_df.at[idx, 'edge_type'] = 'liqr-liqr'
-                liqr_liqr += 1
-            elif (src in liquors_map) ^ (tgt in liquors_map):
-                edges_df.at[idx, 'edge_type'] = 'liqr-ingr'
-                liqr_ingr += 1
-            else:
-                ingr_ingr += 1
+    print("Changing Edge Type...")
+    is_ingr = edges_df['edge_type'] == 'ingr-ingr'
+    src_liquor = edges_df['id_1'].isin(liquors_map)
+    tgt_liquor = edges_df['id_2'].isin(liquors_map)
+
+    liqr_liqr_mask = is_ingr & src_liquor & tgt_liquor
+    liqr_ingr_mask = is_ingr & (src_liquor ^ tgt_liquor)
+    edges_df.loc[liqr_liqr_mask, 'edge_type'] = 'liqr-liqr'
+    edges_df.loc[liqr_ingr_mask, 'edge_type'] = 'liqr-ingr'
+
+    liqr_liqr = int(liqr_liqr_mask.sum())
+    liqr_ingr = int(liqr_ingr_mask.sum())
+    ingr_ingr = int(is_ingr.sum()) - liqr_liqr - liqr_ingr
     
     print(f"Total prev ingr-ingr edges :\t{ingr_ingr + liqr_liqr + liqr_ingr}\nChanged to ...")
     print(f"liqr-liqr edges :\t{liqr_liqr}")
     print(f"liqr_ingr edges :\t{liqr_ingr}")
     print(f"ingr_ingr edges :\t{ingr_ingr}")
     
-    edges_df.to_csv("./dataset/edges_191120_updated.csv", index=False)
+    edges_df.to_csv(EDGES_CSV, index=False)
     
 class BPRDataset(Dataset):
-    def __init__(self, positive_pairs, hard_negatives=None, num_users=None, num_items=None, negative_ratio=5.0):
-        self.BPR_samples = []
-        self.positive_pairs = []
-        self.negative_pairs = []
-        self.positive_set = set()
+    """
+    (liquor, positive ingredient, negative ingredient) BPR triple 데이터셋
+
+    positive_pairs   :   liquor_id / ingredient_id 열이 노드 인덱스로 매핑된 DataFrame (매핑 안 된 NaN 행은 제외)
+    hard_negatives   :   같은 형식의 나쁜 조합 DataFrame, 각 행마다 해당 술의 positive 하나와 짝지음 (None이면 사용 안 함)
+    negative_ratio   :   positive 하나당 랜덤 negative 개수
+    seed             :   negative 샘플링 시드 (None이면 np.random 전역 상태에서 뽑음)
+
+    triple은 users / pos / neg 세 개의 연속된 int64 텐서에 저장되고,
+    배치 단위로 __getitems__가 텐서를 바로 슬라이싱한다 (DataLoader에 collate_fn=BPRDataset.collate).
+    """
+
+    # (u, i) -> u * KEY_BASE + i 정수 키로 positive 집합 검사
+    KEY_BASE = 1 << 32
+
+    def __init__(self, positive_pairs, hard_negatives=None, num_users=None, num_items=None, negative_ratio=5.0, seed=None):
         self.num_users = num_users
         self.num_items = num_items
-        
+        self.negative_ratio = int(negative_ratio)
+        self.rng = np.random.default_rng(seed if seed is not None else np.random.randint(2 ** 31))
+
         # Positive samples
-        for _, row in positive_pairs.iterrows():
-            self.positive_pairs.append((row['liquor_id'], row['ingredient_id']))
-            self.positive_set.add((row['liquor_id'], row['ingredient_id']))
+        self.positive_users, self.positive_items = self._pair_arrays(positive_pairs)
+        self.positive_keys = np.unique(self.positive_users * self.KEY_BASE + self.positive_items)
 
-        # Hard negatives
-        for _, row in hard_negatives.iterrows():
-            self.negative_pairs.append((row['liquor_id'], row['ingredient_id']))  
-        
-        for pair in self.positive_pairs:
-            u = pair[0]
-            i = pair[1]
-            for _ in range(int(negative_ratio)):
-                while True:
-                    j = random.randint(0, num_items - 1)
-                    if (u, j) not in self.positive_set:
-                        self.BPR_samples.append((u, i, j))
-                        break
-        
+        # 술별 positive 재료 (CSR): pos_items[pos_indptr[u]:pos_indptr[u + 1]]
+        order = np.argsort(self.positive_users, kind="stable")
+        counts = np.bincount(self.positive_users, minlength=(self.positive_users.max() + 1) if len(self.positive_users) else 0)
+        self.pos_indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.pos_items = self.positive_items[order]
+
+        # Hard negatives (positive가 하나도 없는 술은 짝지을 수 없으므로 제외)
         if hard_negatives is not None:
-            for pair in self.negative_pairs:
-                u = pair[0]
-                j = pair[1]
-                positives_for_u = [i for x, i in self.positive_pairs if x == u]
-                if positives_for_u:
-                    i = random.choice(positives_for_u)
-                    self.BPR_samples.append((u, i, j))
-                        
+            hard_users, hard_items = self._pair_arrays(hard_negatives)
+            has_positive = hard_users < len(counts)
+            has_positive[has_positive] = counts[hard_users[has_positive]] > 0
+            self.hard_users, self.hard_items = hard_users[has_positive], hard_items[has_positive]
+        else:
+            self.hard_users = self.hard_items = np.empty(0, dtype=np.int64)
+
+        self.resample_negatives()
+
+    @staticmethod
+    def _pair_arrays(pairs):
+        pairs = pairs[['liquor_id', 'ingredient_id']].dropna()
+        return pairs['liquor_id'].to_numpy(dtype=np.int64), pairs['ingredient_id'].to_numpy(dtype=np.int64)
+
+    def is_positive(self, users, items):
+        """(users[k], items[k])가 positive 쌍인지 (벡터화)"""
+        keys = np.asarray(users, dtype=np.int64) * self.KEY_BASE + np.asarray(items, dtype=np.int64)
+        pos = np.searchsorted(self.positive_keys, keys)
+        pos[pos == len(self.positive_keys)] = 0
+        return self.positive_keys[pos] == keys if len(self.positive_keys) else np.zeros(len(keys), dtype=bool)
+
+    def sample_negatives(self, users):
+        """users 각각에 대해 positive가 아닌 재료를 균일하게 뽑는다 (걸린 것만 다시 뽑기)"""
+        items = self.rng.integers(0, self.num_items, size=len(users))
+        redo = np.flatnonzero(self.is_positive(users, items))
+        while len(redo):
+            items[redo] = self.rng.integers(0, self.num_items, size=len(redo))
+            redo = redo[self.is_positive(users[redo], items[redo])]
+        return items
+
+    def resample_negatives(self):
+        """
+        랜덤 negative와 hard negative에 짝지을 positive를 새로 뽑는다
+        에폭마다 호출하면 negative가 생성 시점에 고정되지 않는다
+        """
+        users = np.repeat(self.positive_users, self.negative_ratio)
+        pos = np.repeat(self.positive_items, self.negative_ratio)
+        neg = self.sample_negatives(users)
+
+        if len(self.hard_users):
+            start = self.pos_indptr[self.hard_users]
+            count = self.pos_indptr[self.hard_users + 1] - start
+            hard_pos = self.pos_items[start + self.rng.integers(0, count)]
+            users = np.concatenate([users, self.hard_users])
+            pos = np.concatenate([pos, hard_pos])
+            neg = np.concatenate([neg, self.hard_items])
+
+        self.users = torch.from_numpy(np.ascontiguousarray(users))
+        self.pos = torch.from_numpy(np.ascontiguousarray(pos))
+        self.neg = torch.from_numpy(np.ascontiguousarray(neg))
+
+    def state_dict(self):
+        """negative 샘플링 RNG 상태 (resume 후 resample_negatives()가 같은 triple을 뽑도록 체크포인트에 저장)"""
+        return {"rng": self.rng.bit_generator.state}
+
+    def load_state_dict(self, state):
+        self.rng.bit_generator.state = state["rng"]
+
+    def tensors(self):
+        return self.users, self.pos, self.neg
+
     def __len__(self):
-        return len(self.BPR_samples)
+        return len(self.users)
     
     def __getitem__(self, idx):
-        u, pos, neg = self.BPR_samples[idx]
-        return torch.tensor(u, dtype=torch.long), torch.tensor(pos, dtype=torch.long), torch.tensor(neg, dtype=torch.long)
+        return self.users[idx], self.pos[idx], self.neg[idx]
+
+    def __getitems__(self, indices):
+        # DataLoader가 배치 인덱스를 한 번에 넘기면 샘플별 텐서 없이 바로 슬라이싱
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        return self.users[indices], self.pos[indices], self.neg[indices]
+
+    @staticmethod
+    def collate(batch):
+        """__getitems__ 결과(이미 배치된 텐서)를 그대로 사용하는 collate_fn"""
+        if isinstance(batch, tuple):
+            return batch
+        users, pos, neg = zip(*batch)
+        return torch.stack(users), torch.stack(pos), torch.stack(neg)
+
+class BatchLoader:
+    """
+    DataLoader 대신 쓰는 배치 단위 로더
+    에폭마다 인덱스를 한 번 섞고, 배치마다 dataset.tensors()의 각 텐서를 인덱스 슬라이스로 한 번에 가져온다
+    (샘플별 텐서 생성/collate 없음)
+
+    dataset      :   tensors()가 길이가 같은 텐서들을 돌려주는 데이터셋 (BPRDataset, InteractionDataset)
+    batch_size   :   배치 크기
+    shuffle      :   에폭마다 순서를 섞을지
+    drop_last    :   마지막 작은 배치를 버릴지
+    pin_memory   :   CUDA가 있으면 배치를 pinned memory로 (non_blocking 전송용)
+    prefetch     :   백그라운드 스레드가 미리 만들어 둘 배치 수 (0이면 스레드 없음)
+    """
+
+    def __init__(self, dataset, batch_size=64, shuffle=False, drop_last=False, pin_memory=False, prefetch=0, generator=None):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self.prefetch = prefetch
+        self.generator = generator
+
+    def __len__(self):
+        n = len(self.dataset)
+        return n // self.batch_size if self.drop_last else (n + self.batch_size - 1) // self.batch_size
+
+    def _batches(self):
+        # resample_negatives() 등으로 텐서가 바뀔 수 있으므로 에폭마다 다시 가져온다
+        tensors = self.dataset.tensors()
+        n = len(tensors[0])
+        order = torch.randperm(n, generator=self.generator) if self.shuffle else None
+
+        for start in range(0, len(self) * self.batch_size, self.batch_size):
+            if order is not None:
+                idx = order[start:start + self.batch_size]
+                batch = tuple(t.index_select(0, idx) for t in tensors)
+            else:
+                batch = tuple(t[start:start + self.batch_size] for t in tensors)
+            if self.pin_memory:
+                batch = tuple(t.pin_memory() for t in batch)
+            yield batch
+
+    def __iter__(self):
+        if self.prefetch <= 0:
+            yield from self._batches()
+            return
+
+        # 텐서 gather는 GIL을 놓으므로 학습 스텝과 겹쳐서 다음 배치를 준비할 수 있다
+        buffer = queue.Queue(maxsize=self.prefetch)
+        done = object()
+        stop = threading.Event()
+        errors = []
+
+        def produce():
+            try:
+                for batch in self._batches():
+                    if stop.is_set():
+                        return
+                    buffer.put(batch)
+            except BaseException as e:
+                # 소비하는 쪽에서 다시 올린다 (잘린 에폭이 정상 종료처럼 보이지 않게)
+                errors.append(e)
+            finally:
+                buffer.put(done)
+
+        worker = threading.Thread(target=produce, daemon=True)
+        worker.start()
+        try:
+            while True:
+                batch = buffer.get()
+                if batch is done:
+                    if errors:
+                        raise errors[0]
+                    break
+                yield batch
+        finally:
+            # 중간에 멈춘 경우 생산 스레드가 put에서 막히지 않도록 비운다
+            stop.set()
+            while worker.is_alive():
+                try:
+                    buffer.get_nowait()
+                except queue.Empty:
+                    worker.join(timeout=0.01)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compile the node/edge CSVs into a binary graph snapshot')
+    parser.add_argument('--output', type=str, default=SNAPSHOT_PATH, help='Snapshot path')
+    parser.add_argument('--nodes', type=str, default=NODES_CSV, help='Nodes CSV')
+    parser.add_argument('--edges', type=str, default=EDGES_CSV, help='Edges CSV')
+    args = parser.parse_args()
+
+    compile_graph_snapshot(args.output, args.nodes, args.edges)
@@ -0,0 +1,307 @@
+"""
+CPU 다중 프로세스 데이터 병렬 학습 (torch.distributed, gloo)
+
+rank마다 프로세스 하나가 BPRDataset triple의 1/N 조각으로 train_model과 같은 스텝(그래프 인코딩 한 번 + 헤드)을 돌리고,
+backward 뒤에 그래디언트를 평탄화해 all-reduce 한 번으로 평균낸 다음 같은 optimizer 스텝을 밟는다.
+    - edge 텐서(edges_index 결과)와 triple 텐서는 부모 프로세스에서 shared memory로 옮겨 rank들이 복사 없이 공유
+    - 모델은 같은 시드로 만들고 rank 0의 파라미터를 broadcast해서 시작, 그 뒤 RNG는 rank마다 seed + rank
+    - 검증 / 체크포인트(model/checkpointing.py) / early stopping은 rank 0만, 중단 여부는 broadcast
+rank당 배치가 --batch-size이므로 전체 배치는 N배이고, 학습률 기본값은 large-batch 모드처럼 sqrt(N)배로 키운다.
+
+    python model/distributed.py --nprocs 4 [--epochs 200] [--with-compounds] [--precision bf16]
+    python model/distributed.py --scaling 1,2,4 [--steps 20]     # 1 -> N 프로세스 처리량 / 확장 효율
+"""
+import argparse
+import math
+import os
+import socket
+import time
+
+import pandas as pd
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.optim as optim
+from sklearn.model_selection import train_test_split
+from tqdm import tqdm
+
+from dataset import load_graph, BPRDataset, BatchLoader, COMPOUND_EDGE_TYPES
+from models import NeuralCF
+from graph_store import HeteroGraph
+from train import EarlyStopping, bpr_loss, select_hard_negatives, end_epoch, autocast, peak_memory_mb, reset_peak_memory
+from checkpointing import CheckpointManager
+
+EDGE_TYPE_MAP = {
+    'liqr-ingr': 0,
+    'ingr-ingr': 1,
+    'liqr-liqr': 1,
+    'ingr-fcomp': 2,
+    'ingr-dcomp': 2
+}
+
+
+class ShardedDataset:
+    """
+    dataset     :   tensors()가 길이가 같은 텐서들을 돌려주는 데이터셋 (BPRDataset)
+    rank        :   이 프로세스의 rank
+    world_size  :   전체 프로세스 수
+    seed        :   모든 rank가 같은 순서로 섞도록 공유하는 시드 (에폭마다 seed + epoch)
+
+    에폭마다 전체 triple을 같은 순서로 섞은 뒤 rank::world_size 조각만 돌려준다 (BatchLoader에 그대로 사용).
+    나머지(len % world_size)는 버려서 모든 rank의 스텝 수가 같다.
+    """
+
+    def __init__(self, dataset, rank, world_size, seed=123):
+        self.dataset = dataset
+        self.rank = rank
+        self.world_size = world_size
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def tensors(self):
+        tensors = self.dataset.tensors()
+        generator = torch.Generator().manual_seed(self.seed + self.epoch)
+        order = torch.randperm(len(tensors[0]), generator=generator)[:len(self) * self.world_size]
+        shard = order[self.rank::self.world_size]
+        return tuple(t.index_select(0, shard) for t in tensors)
+
+    def __len__(self):
+        return len(self.dataset) // self.world_size
+
+
+def share_tensors(*tensors):
+    """부모 프로세스에서 shared memory로 옮겨 rank들에 핸들만 넘긴다 (rank마다 복사하지 않음)"""
+    return tuple(t.share_memory_() for t in tensors)
+
+
+def broadcast_parameters(model, src=0):
+    for p in model.parameters():
+        dist.broadcast(p.data, src)
+
+
+def all_reduce_gradients(model, world_size):
+    """
+    그래디언트를 하나로 평탄화해 all-reduce 한 번으로 평균
+    어느 rank에서도 그래디언트가 없는 파라미터는 grad=None 그대로 둬서 단일 프로세스 학습처럼
+    optimizer(Adam weight_decay 포함)가 건너뛰게 한다
+    """
+    params = list(model.parameters())
+    has_grad = torch.tensor([p.grad is not None for p in params], dtype=torch.uint8)
+    dist.all_reduce(has_grad, op=dist.ReduceOp.MAX)
+    params = [p for p, flag in zip(params, has_grad.tolist()) if flag]
+    if not params:
+        return
+
+    # 일부 rank에만 있는 그래디언트는 나머지 rank 몫을 0으로 평균
+    flat = torch.cat([(p.grad if p.grad is not None else torch.zeros_like(p)).reshape(-1) for p in params])
+    dist.all_reduce(flat)
+    flat /= world_size
+
+    offset = 0
+    for p in params:
+        n = p.numel()
+        p.grad = flat[offset:offset + n].view_as(p)
+        offset += n
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def setup(rank, world_size, port, threads):
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    torch.set_num_threads(threads)
+
+
+def build_model(num_relations, rank, world_size, seed=123):
+    torch.manual_seed(seed)
+    model = NeuralCF(num_users=155, num_items=6498, num_relations=num_relations, emb_size=128)
+    if world_size > 1:
+        broadcast_parameters(model)
+    # 초기화 뒤에는 rank마다 다른 RNG 스트림 (hard negative 후보와 dropout이 rank마다 달라야 N배 배치가 의미 있다)
+    torch.manual_seed(seed + rank)
+    return model
+
+
+def train_step(model, optimizer, edges, user, pos, world_size, precision, device):
+    """train_model 스텝 + 그래디언트 all-reduce -> (loss, 맞춘 수)"""
+    edges_index, edges_type, edges_weights = edges
+    optimizer.zero_grad()
+    with autocast(device, precision):
+        x = model.encode(edges_index, edges_type, edges_weights)
+        pos_output = model.score(x, user, pos)
+        neg_output = model.score(x, user, select_hard_negatives(model, x, user))
+    loss = bpr_loss(pos_output, neg_output)
+    loss.backward()
+    if world_size > 1:
+        all_reduce_gradients(model, world_size)
+    optimizer.step()
+    return loss.item(), (pos_output > neg_output).sum().item()
+
+
+def train_worker(rank, world_size, port, threads, edges, num_relations, train_dataset, val_dataset, args):
+    setup(rank, world_size, port, threads)
+    device = torch.device('cpu')
+    edges_index, edges_weights, edges_type = edges
+
+    model = build_model(num_relations, rank, world_size)
+    model.train()
+    lr = args.lr if args.lr is not None else 0.0002 * math.sqrt(world_size)
+    optimizer = optim.Adam(model.parameters(), lr=lr, weight_decay=1e-5)
+
+    shard = ShardedDataset(train_dataset, rank, world_size)
+    train_loader = BatchLoader(shard, batch_size=args.batch_size, shuffle=True, prefetch=2, generator=torch.Generator().manual_seed(rank))
+    val_loader = BatchLoader(val_dataset, batch_size=64)
+
+    early_stopping = EarlyStopping(patience=10, delta=0.001)
+    checkpoints = CheckpointManager(keep_last=args.keep_last) if rank == 0 else None
+    best_val_loss = float('inf')
+
+    if rank == 0:
+        print(f"Training on {world_size} processes x {threads} threads (gloo, {args.batch_size} triples/rank/step, lr {lr:.6f}, {args.precision})")
+        print(f"Edge tensors in shared memory: {all(t.is_shared() for t in edges)}")
+
+    for epoch in range(args.epochs):
+        model.train()
+        shard.set_epoch(epoch)
+        reset_peak_memory(device)
+        epoch_start = time.perf_counter()
+        stats = torch.zeros(3, dtype=torch.float64)  # loss 합, 맞춘 수, triple 수
+
+        for user, pos, neg in tqdm(train_loader, desc=f"Epoch {epoch+1}/{args.epochs}", disable=rank != 0):
+            user, pos = user.long(), pos.long()
+            loss, correct = train_step(model, optimizer, (edges_index, edges_type, edges_weights), user, pos, world_size, args.precision, device)
+            stats += torch.tensor([loss * pos.size(0), correct, pos.size(0)], dtype=torch.float64)
+
+        dist.all_reduce(stats)
+        epoch_time = time.perf_counter() - epoch_start
+
+        stop = torch.zeros(1)
+        if rank == 0:
+            total_loss, correct, total = stats.tolist()
+            print(f"[Epoch {epoch+1}] Loss: {total_loss / total:.4f} | Accuracy: {correct / total:.4f} | Time: {epoch_time:.1f}s ({total / epoch_time:.0f} samples/s) | Peak memory (rank 0): {peak_memory_mb(device):.0f} MB")
+
+            best_val_loss, early_stop = end_epoch(epoch, model, val_loader, edges_index, edges_weights, edges_type, device, optimizer, early_stopping, checkpoints, best_val_loss)
+            stop[0] = float(early_stop)
+
+        # 모든 rank가 같은 에폭에서 멈추도록 rank 0의 판단을 공유
+        dist.broadcast(stop, 0)
+        if stop.item():
+            break
+
+    if rank == 0:
+        checkpoints.wait()
+    dist.destroy_process_group()
+
+
+def scaling_worker(rank, world_size, port, threads, edges, num_relations, train_dataset, args, results):
+    # 검증 / 체크포인트 없이 스텝만 재서 처리량 측정
+    setup(rank, world_size, port, threads)
+    device = torch.device('cpu')
+    edges_index, edges_weights, edges_type = edges
+
+    model = build_model(num_relations, rank, world_size)
+    model.train()
+    optimizer = optim.Adam(model.parameters(), lr=0.0002 * math.sqrt(world_size), weight_decay=1e-5)
+
+    shard = ShardedDataset(train_dataset, rank, world_size)
+    batches = iter(BatchLoader(shard, batch_size=args.batch_size, shuffle=True, generator=torch.Generator().manual_seed(rank)))
+
+    def step():
+        user, pos, _ = next(batches)
+        train_step(model, optimizer, (edges_index, edges_type, edges_weights), user.long(), pos.long(), world_size, args.precision, device)
+
+    step()  # warmup
+    dist.barrier()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        step()
+    dist.barrier()
+    seconds = time.perf_counter() - start
+
+    rss = torch.tensor([peak_memory_mb(device)])
+    dist.all_reduce(rss, op=dist.ReduceOp.MAX)
+    if rank == 0:
+        results.put((seconds, rss.item(), all(t.is_shared() for t in edges)))
+    dist.destroy_process_group()
+
+
+def load_datasets(mapping):
+    """train.py와 같은 분할 (train / val)"""
+    lid_to_idx = mapping['liquor']
+    iid_to_idx = mapping['ingredient']
+
+    positive_pairs = pd.read_csv("./liquor_good_ingredients.csv")[['liquor_id', 'ingredient_id']]
+    negative_pairs = pd.read_csv("./liquor_bad_ingredients.csv")[['liquor_id', 'ingredient_id']]
+    for pairs in (positive_pairs, negative_pairs):
+        pairs['liquor_id'] = pairs['liquor_id'].map(lid_to_idx)
+        pairs['ingredient_id'] = pairs['ingredient_id'].map(iid_to_idx)
+
+    train_val_pairs, _ = train_test_split(positive_pairs, test_size=0.2, random_state=42)
+    train_pairs, val_pairs = train_test_split(train_val_pairs, test_size=0.2, random_state=42)
+
+    train_dataset = BPRDataset(positive_pairs=train_pairs, hard_negatives=negative_pairs, num_users=155, num_items=6498)
+    val_dataset = BPRDataset(positive_pairs=val_pairs, hard_negatives=negative_pairs, num_users=155, num_items=6498)
+    share_tensors(*train_dataset.tensors())
+    return train_dataset, val_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Data-parallel NeuralCF training across CPU processes (torch.distributed, gloo)')
+    parser.add_argument('--nprocs', type=int, default=max(1, (os.cpu_count() or 1) // 2), help='Number of training processes')
+    parser.add_argument('--threads', type=int, default=None, help='Torch threads per process (default: cores / processes)')
+    parser.add_argument('--epochs', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=64, help='Triples per rank per step (global batch = nprocs x batch size)')
+    parser.add_argument('--lr', type=float, default=None, help='Learning rate (default 0.0002 x sqrt(nprocs))')
+    parser.add_argument('--keep-last', type=int, default=3, help='Epoch checkpoints to keep (best_model.pth is always kept)')
+    parser.add_argument('--with-compounds', action='store_true', help='Keep ingr-fcomp / ingr-dcomp edges (both directions) as relation 2 (num_relations=3)')
+    parser.add_argument('--precision', type=str, default='fp32', choices=['fp32', 'bf16'], help='bf16: bfloat16 autocast (see train.py)')
+    parser.add_argument('--scaling', type=str, default=None, help='Comma-separated process counts to benchmark instead of training, e.g. 1,2,4')
+    parser.add_argument('--steps', type=int, default=20, help='Timed steps per process count in --scaling mode')
+    args = parser.parse_args()
+
+    graph = load_graph()
+    mapping = graph.nodes_map()
+    if args.with_compounds:
+        # compound edge는 역방향(compound -> 재료/술)까지 relation 2로 (model/graph_store.py)
+        num_relations = 3
+        edges_indexes, edges_weights, edges_type = HeteroGraph(graph, EDGE_TYPE_MAP).edges(num_relations)
+    else:
+        num_relations = 2
+        edges_indexes, edges_weights, edges_type = graph.edges(EDGE_TYPE_MAP, skip_types=COMPOUND_EDGE_TYPES)
+    edges = share_tensors(edges_indexes, edges_weights, edges_type.long())
+
+    train_dataset, val_dataset = load_datasets(mapping)
+    cores = os.cpu_count() or 1
+
+    if args.scaling is None:
+        threads = args.threads or max(1, cores // args.nprocs)
+        mp.spawn(train_worker, args=(args.nprocs, free_port(), threads, edges, num_relations, train_dataset, val_dataset, args), nprocs=args.nprocs)
+        return
+
+    # 프로세스당 스레드 수를 고정해서 N 프로세스가 N배 코어를 쓸 때의 효율을 본다
+    counts = [int(n) for n in args.scaling.split(',')]
+    threads = args.threads or max(1, cores // max(counts))
+    ctx = mp.get_context('spawn')
+    print(f"{cores} cores, {threads} threads/process, {args.batch_size} triples/rank/step, {args.steps} steps\n")
+    print(f"{'procs':>6}{'ms/step':>10}{'samples/s':>12}{'speedup':>10}{'efficiency':>12}{'peak RSS/rank MB':>18}  shared edges")
+    baseline = None
+    for n in counts:
+        results = ctx.SimpleQueue()
+        mp.spawn(scaling_worker, args=(n, free_port(), threads, edges, num_relations, train_dataset, args, results), nprocs=n)
+        seconds, rss, shared = results.get()
+        throughput = n * args.batch_size * args.steps / seconds
+        baseline = baseline or throughput / n
+        speedup = throughput / baseline
+        print(f"{n:>6}{seconds / args.steps * 1000:>10.1f}{throughput:>12.1f}{speedup:>10.2f}{speedup / n:>12.1%}{rss:>18.0f}  {'yes' if shared else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
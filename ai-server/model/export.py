@@ -0,0 +1,239 @@
+"""
+TorchScript 추론 아티팩트
+
+서빙 프로세스가 torch_geometric을 import하고 NeuralCF를 만들어 체크포인트를 로드한 뒤
+그래프 전체를 인코딩하는 대신, export 시점에 계산한 그래프 임베딩과 GMF+MLP 헤드,
+술/재료 id -> 노드 인덱스 표를 하나의 TorchScript 파일로 저장한다.
+torch.jit.load 한 번으로 로드되고 torch 외의 의존성이 없다.
+
+    python model/export.py --checkpoint ./model/checkpoint/best_model.pth [--output ./model/checkpoint/best_model.script.pt]
+
+구조(hidden_layers 등)는 체크포인트 shape에서 읽어 strict 로드하므로 구조가 다르면 export 단계에서 실패한다.
+"""
+import copy
+import json
+import os
+import tempfile
+import zipfile
+from typing import Optional, Tuple
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+SCRIPTED_VERSION = 1
+META_FILE = "meta.json"
+
+
+class ScriptedScorer(nn.Module):
+    """
+    embeddings          :   고정된 그래프 임베딩 [num_nodes, emb_size]
+    mlp, output_layer   :   NeuralCF 헤드 (가중치 복사)
+    liquor_ids          :   술 node_id 목록
+    ingredient_ids      :   재료 node_id 목록
+    node_index          :   node_id -> 노드 인덱스 표 (없으면 -1), 술/재료만
+    """
+
+    def __init__(self, embeddings, mlp, output_layer, liquor_ids, ingredient_ids, node_index):
+        super().__init__()
+        self.register_buffer("embeddings", embeddings)
+        self.mlp = mlp
+        self.output_layer = output_layer
+        self.register_buffer("liquor_ids", liquor_ids)
+        self.register_buffer("ingredient_ids", ingredient_ids)
+        self.register_buffer("node_index", node_index)
+        self.register_buffer("ingredient_indices", node_index[ingredient_ids])
+
+    def score(self, user_indices: torch.Tensor, item_indices: torch.Tensor) -> torch.Tensor:
+        """NeuralCF.score와 같은 GMF + MLP 헤드"""
+        user_emb = self.embeddings[user_indices]
+        item_emb = self.embeddings[item_indices]
+
+        gmf_output = F.normalize(user_emb, dim=-1) * F.normalize(item_emb, dim=-1)
+        mlp_output = self.mlp(torch.cat([user_emb, item_emb], dim=-1))
+        return self.output_layer(torch.cat([gmf_output, mlp_output], dim=-1)).squeeze()
+
+    def forward(self, user_indices: torch.Tensor, item_indices: torch.Tensor,
+                edge_index: Optional[torch.Tensor] = None, edge_type: Optional[torch.Tensor] = None,
+                edge_weight: Optional[torch.Tensor] = None) -> torch.Tensor:
+        # 그래프 인자는 NeuralCF와 호출 형태를 맞추기 위한 것 (임베딩은 export 시점의 그래프로 고정)
+        return self.score(user_indices, item_indices)
+
+    @torch.jit.export
+    def lookup(self, node_ids: torch.Tensor) -> torch.Tensor:
+        """node_id -> 노드 인덱스 (없으면 -1)"""
+        valid = (node_ids >= 0) & (node_ids < self.node_index.size(0))
+        return torch.where(valid, self.node_index[node_ids.clamp(0, self.node_index.size(0) - 1)], -1)
+
+    @torch.jit.export
+    def score_ids(self, liquor_ids: torch.Tensor, ingredient_ids: torch.Tensor) -> torch.Tensor:
+        """node_id 쌍의 점수"""
+        user_indices = self.lookup(liquor_ids)
+        item_indices = self.lookup(ingredient_ids)
+        if bool((user_indices < 0).any()) or bool((item_indices < 0).any()):
+            raise ValueError("Unknown liquor or ingredient id")
+        return self.score(user_indices, item_indices).reshape(-1)
+
+    @torch.jit.export
+    def recommend(self, liquor_id: int, k: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        """술 하나에 대해 전체 재료 중 상위 k개의 (ingredient_id, score)"""
+        user_index = self.lookup(torch.tensor([liquor_id]))
+        if bool(user_index[0] < 0):
+            raise ValueError("Unknown liquor id")
+        scores = self.score(user_index.expand(self.ingredient_indices.size(0)), self.ingredient_indices).reshape(-1)
+        top_scores, top = torch.topk(scores, min(k, scores.size(0)))
+        return self.ingredient_ids[top], top_scores
+
+
+def build_scripted(model, x, mapping):
+    """NeuralCF, 그래프 임베딩 x(encode 결과), nodes_map()으로 스크립트 모듈 생성"""
+    liquor_ids = torch.tensor(list(mapping['liquor'].keys()), dtype=torch.long)
+    ingredient_ids = torch.tensor(list(mapping['ingredient'].keys()), dtype=torch.long)
+    node_index = torch.full((int(max(liquor_ids.max(), ingredient_ids.max())) + 1,), -1, dtype=torch.long)
+    node_index[liquor_ids] = torch.tensor(list(mapping['liquor'].values()), dtype=torch.long)
+    node_index[ingredient_ids] = torch.tensor(list(mapping['ingredient'].values()), dtype=torch.long)
+
+    scorer = ScriptedScorer(
+        x.detach().float().cpu().contiguous(),
+        copy.deepcopy(model.mlp),
+        copy.deepcopy(model.output_layer),
+        liquor_ids,
+        ingredient_ids,
+        node_index,
+    )
+    for p in scorer.parameters():
+        p.requires_grad_(False)
+    return torch.jit.script(scorer.eval())
+
+
+def save_scripted(module, path, **meta):
+    """임시 파일에 저장한 뒤 rename (meta는 아카이브 안의 meta.json), 임시 파일 이름은 프로세스마다 다르다"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        torch.jit.save(module, tmp_path, _extra_files={META_FILE: json.dumps({"version": SCRIPTED_VERSION, **meta})})
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+def source_checkpoint(path):
+    """export 파일이 만들어진 기본 체크포인트 경로 (best_model.script.pt -> best_model.pth)"""
+    base = path[:-len(".script.pt")] if path.endswith(".script.pt") else os.path.splitext(path)[0]
+    return f"{base}.pth"
+
+
+def check_scripted(path, scripted, checkpoint_path=None):
+    """
+    export 이후 체크포인트가 다시 학습됐으면 ValueError (meta의 checkpoint_hash와 비교)
+    checkpoint_path가 없으면 source_checkpoint(path), 그 파일이 없으면 확인하지 않는다
+    ai-server를 sys.path에 두고 model 패키지로 import하는 쪽(API, 서버 스크립트)에서 호출
+    """
+    from model.score_matrix import checkpoint_hash
+
+    checkpoint_path = checkpoint_path or source_checkpoint(path)
+    if not os.path.exists(checkpoint_path):
+        return
+    if scripted.meta.get("checkpoint_hash") != checkpoint_hash(checkpoint_path):
+        raise ValueError(f"{path} is stale: {checkpoint_path} changed since it was exported (run model/export.py again)")
+
+
+def is_scripted_export(path):
+    """TorchScript 아카이브인지 (torch.save 체크포인트도 zip이므로 constants.pkl로 구분)"""
+    if not zipfile.is_zipfile(path):
+        return False
+    with zipfile.ZipFile(path) as archive:
+        return any(name.endswith("/constants.pkl") for name in archive.namelist())
+
+
+class ScriptedNeuralCF:
+    """API/스크립트에서 NeuralCF 대신 쓰는 얇은 래퍼 (model(users, items, *graph) 호출 형태 유지)"""
+
+    variant = "torchscript"
+
+    def __init__(self, module, meta):
+        self.module = module
+        self.meta = meta
+        self.graph_hash = meta.get("graph_hash")
+        self.num_nodes = module.embeddings.size(0)
+
+    def __call__(self, user_indices, item_indices, edge_index=None, edge_type=None, edge_weight=None):
+        return self.module(user_indices, item_indices)
+
+    def eval(self):
+        return self
+
+    def cache_embeddings(self, *args, **kwargs):
+        return None
+
+
+def load_scripted(path):
+    """torch.jit.load 한 번으로 로드 (torch_geometric / NeuralCF 불필요)"""
+    extra_files = {META_FILE: ""}
+    module = torch.jit.load(path, map_location="cpu", _extra_files=extra_files)
+    meta = json.loads(extra_files[META_FILE] or "{}")
+    if meta.get("version") != SCRIPTED_VERSION:
+        raise ValueError(f"Unsupported scripted model version: {meta.get('version')}")
+    return ScriptedNeuralCF(module.eval(), meta)
+
+
+def main():
+    import argparse
+    import time
+
+    from models import NeuralCF
+    from dataset import load_graph
+    from graph_store import HeteroGraph, cache_node_embeddings
+    from score_matrix import checkpoint_hash, graph_digest
+
+    parser = argparse.ArgumentParser(description='Export a self-contained TorchScript scoring module')
+    parser.add_argument('--checkpoint', type=str, default='./model/checkpoint/best_model.pth', help='Path to model checkpoint')
+    parser.add_argument('--output', type=str, default=None, help='Export path (default: <checkpoint>.script.pt)')
+    args = parser.parse_args()
+    output = args.output or f"{os.path.splitext(args.checkpoint)[0]}.script.pt"
+
+    edge_type_map = {
+        'liqr-ingr': 0,
+        'ingr-ingr': 1,
+        'liqr-liqr': 1,
+        'ingr-fcomp': 2,
+        'ingr-dcomp': 2
+    }
+
+    graph = load_graph()
+    mapping = graph.nodes_map()
+    edges_indexes, edges_weights, edge_type = graph.edges(edge_type_map)
+
+    model = NeuralCF.from_state_dict(torch.load(args.checkpoint, map_location=torch.device('cpu')))
+    model.eval()
+    # --with-compounds 체크포인트는 compound 관계를 관계별 블록으로 인코딩
+    x = cache_node_embeddings(model, (edges_indexes, edge_type, edges_weights), HeteroGraph(graph, edge_type_map))
+
+    scripted = build_scripted(model, x, mapping)
+
+    # 스크립트 모듈이 원래 모델과 같은 점수를 내는지 확인
+    users = torch.tensor(list(mapping['liquor'].values())).repeat_interleave(64)
+    items = torch.tensor(list(mapping['ingredient'].values()))[torch.randint(0, len(mapping['ingredient']), (len(users),))]
+    with torch.no_grad():
+        diff = (model(users, items, edges_indexes, edge_type, edges_weights) - scripted(users, items)).abs().max().item()
+    if diff > 1e-5:
+        raise RuntimeError(f"Scripted module disagrees with the checkpoint (max diff {diff:.2e})")
+
+    save_scripted(
+        scripted, output,
+        checkpoint_hash=checkpoint_hash(args.checkpoint),
+        graph_hash=graph_digest(edges_indexes, edge_type, edges_weights),
+        num_nodes=model.num_nodes,
+        hidden_layers=[m.out_features for m in model.mlp if isinstance(m, nn.Linear)],
+    )
+
+    start = time.perf_counter()
+    load_scripted(output)
+    print(f"Scripted module written to {output} ({os.path.getsize(output) / 2 ** 20:.2f} MB, max diff {diff:.2e}, "
+          f"loads in {(time.perf_counter() - start) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+이종(heterogeneous) 그래프 저장소
+
+노드 타입마다 인덱스 구간(liquor / ingredient는 0~6652 안에 섞여 있고 compound는 6653~8297)을 두고,
+관계마다 [도착 구간 x 출발 구간] 크기의 CSR 블록으로 edge를 저장한다.
+WeightedRGCNConv는 블록의 출발 구간 노드에만 W_r을 곱하고 도착 구간에만 더하므로
+compound 관계(2)가 전체 노드 x 전체 노드 행렬이나 edge 단위 중간 텐서를 만들지 않는다.
+
+compound edge(ingr-fcomp / ingr-dcomp)는 모델이 num_relations=3으로 요청할 때 처음 읽는다.
+CSV에는 재료/술 -> compound 방향만 있어서 그대로면 compound 정보가 재료로 돌아오지 않으므로
+같은 관계 번호로 역방향 블록(compound -> 재료/술)을 함께 만든다.
+"""
+from collections import namedtuple
+
+import numpy as np
+import torch
+
+try:
+    from dataset import COMPOUND_EDGE_TYPES
+except ImportError:
+    # ai-server를 sys.path에 두고 model 패키지로 import하는 쪽 (API, 서버 스크립트)
+    from model.dataset import COMPOUND_EDGE_TYPES
+
+RelationBlock = namedtuple("RelationBlock", ["relation", "adj", "dst_range", "src_range"])
+RelationBlock.__doc__ = """
+relation   :   관계 번호 (WeightedRGCNConv.rel_lins 인덱스)
+adj        :   CSR 인접행렬 [dst 구간 길이, src 구간 길이], adj[target, source] = edge_weight
+dst_range  :   (start, stop) 메시지를 받는 노드 구간
+src_range  :   (start, stop) 메시지를 보내는 노드 구간
+"""
+
+
+class HeteroGraph:
+    """
+    graph          :   GraphSnapshot (load_graph())
+    edge_type_map  :   edge_type 이름 -> 관계 번호
+    lazy_types     :   필요할 때(해당 관계를 요청할 때)까지 읽지 않는 edge_type
+    reverse_types  :   역방향 블록을 같은 관계로 추가할 edge_type
+    """
+
+    def __init__(self, graph, edge_type_map, lazy_types=COMPOUND_EDGE_TYPES, reverse_types=COMPOUND_EDGE_TYPES):
+        self.graph = graph
+        self.edge_type_map = edge_type_map
+        self.lazy_types = tuple(lazy_types)
+        self.reverse_types = tuple(reverse_types)
+
+        # 노드 타입별 인덱스 구간 (start, stop)
+        node_types = np.asarray(graph.arrays["node_types"])
+        self.node_type_names = graph.header["node_types"]
+        self.node_ranges = {}
+        for code, name in enumerate(self.node_type_names):
+            idx = np.flatnonzero(node_types == code)
+            if len(idx):
+                self.node_ranges[name] = (int(idx[0]), int(idx[-1]) + 1)
+
+        self._blocks = {}         # relation -> [RelationBlock] (CPU)
+        self._device_blocks = {}  # (relation, device) -> [RelationBlock]
+
+    @property
+    def num_relations(self):
+        return max(self.edge_type_map.values()) + 1
+
+    def relation_types(self, relation):
+        return [t for t in self.graph.header["edge_types"] if self.edge_type_map.get(t) == relation]
+
+    def is_loaded(self, relation):
+        return relation in self._blocks
+
+    def _type_range(self, nodes):
+        """nodes가 속한 노드 타입 구간들을 모두 덮는 (start, stop)"""
+        node_types = np.asarray(self.graph.arrays["node_types"])
+        ranges = [self.node_ranges[self.node_type_names[c]] for c in np.unique(node_types[nodes])]
+        return min(r[0] for r in ranges), max(r[1] for r in ranges)
+
+    def _relation_edges(self, relation):
+        """관계 relation의 (src, dst, weight, reverse 여부) numpy 배열, 스냅샷에서 해당 edge만 읽는다"""
+        type_names = self.graph.header["edge_types"]
+        codes = [c for c, t in enumerate(type_names) if self.edge_type_map.get(t) == relation]
+        reverse_codes = [c for c in codes if type_names[c] in self.reverse_types]
+
+        edge_type = np.asarray(self.graph.arrays["edge_type"])
+        mask = np.isin(edge_type, codes)
+        src = np.asarray(self.graph.arrays["edge_src"])[mask]
+        dst = np.asarray(self.graph.arrays["edge_dst"])[mask]
+        weight = np.asarray(self.graph.arrays["edge_weight"])[mask]
+        reverse = np.isin(edge_type[mask], reverse_codes)
+        return src, dst, weight, reverse
+
+    def _build_relation(self, relation):
+        src, dst, weight, reverse = self._relation_edges(relation)
+        if len(src) == 0:
+            return []
+
+        parts = [(src, dst, weight)]
+        if reverse.any():
+            parts.append((dst[reverse], src[reverse], weight[reverse]))
+
+        blocks = []
+        for s, d, w in parts:
+            src_range = self._type_range(s)
+            dst_range = self._type_range(d)
+            # 중복 edge는 coalesce에서 합쳐지므로 aggr='add'와 동일
+            adj = torch.sparse_coo_tensor(
+                torch.from_numpy(np.stack([d - dst_range[0], s - src_range[0]])),
+                torch.from_numpy(np.ascontiguousarray(w)),
+                (dst_range[1] - dst_range[0], src_range[1] - src_range[0]),
+            ).coalesce().to_sparse_csr()
+            blocks.append(RelationBlock(relation, adj, dst_range, src_range))
+        return blocks
+
+    def relation(self, relation, device=None):
+        """관계 relation의 블록 목록 (처음 요청할 때 만들고 이후에는 재사용)"""
+        if relation not in self._blocks:
+            self._blocks[relation] = self._build_relation(relation)
+
+        blocks = self._blocks[relation]
+        device = torch.device(device) if device is not None else None
+        if device is None or device.type == "cpu":
+            return blocks
+
+        key = (relation, device)
+        if key not in self._device_blocks:
+            self._device_blocks[key] = [b._replace(adj=b.adj.to(device)) for b in blocks]
+        return self._device_blocks[key]
+
+    def blocks(self, num_relations=None, device=None):
+        """관계 0..num_relations-1의 블록 (num_relations=2면 compound edge는 읽지 않는다)"""
+        num_relations = num_relations if num_relations is not None else self.num_relations
+        return [b for r in range(num_relations) for b in self.relation(r, device)]
+
+    def num_nodes(self, num_relations=None):
+        """블록들이 참조하는 노드 구간의 끝 (이보다 뒤의 노드는 edge가 없어 계산하지 않는다)"""
+        blocks = self.blocks(num_relations)
+        return max((max(b.dst_range[1], b.src_range[1]) for b in blocks), default=0)
+
+    def edges(self, num_relations=None):
+        """
+        블록과 같은 그래프를 edges_index()와 같은 (edge_index, edge_weights, edges_type) 전역 인덱스 텐서로
+        (message 전파, NeighborSampler 등 edge 목록을 받는 코드용)
+        """
+        edge_index, edge_weights, edges_type = [], [], []
+        for b in self.blocks(num_relations):
+            adj = b.adj.to_sparse_coo()
+            dst, src = adj.indices()
+            edge_index.append(torch.stack([src + b.src_range[0], dst + b.dst_range[0]]))
+            edge_weights.append(adj.values())
+            edges_type.append(torch.full((adj.values().size(0),), b.relation, dtype=torch.long))
+
+        edge_index = torch.cat(edge_index, dim=1).contiguous()
+        edge_weights = torch.cat(edge_weights)
+        edges_type = torch.cat(edges_type)
+
+        print(f"Edge index shape: {edge_index.shape}")
+        print(f"Edge weights shape: {edge_weights.shape}")
+
+        return edge_index, edge_weights, edges_type
+
+    def memory_bytes(self, num_relations=None):
+        """블록 CSR(crow / col / value) 크기 합"""
+        total = 0
+        for b in self.blocks(num_relations):
+            for t in (b.adj.crow_indices(), b.adj.col_indices(), b.adj.values()):
+                total += t.numel() * t.element_size()
+        return total
+
+
+def missing_relations(model, edge_type):
+    """model이 edge_type 텐서에 없는 관계까지 학습했는지 (train.py --with-compounds 체크포인트를 compound 없는 edge로 서빙하는 경우)"""
+    num_relations = getattr(model, "num_relations", None)
+    if num_relations is None:
+        return False
+    return num_relations > (int(edge_type.max()) + 1 if edge_type.numel() else 0)
+
+
+def cache_node_embeddings(model, edges, store=None):
+    """
+    model.cache_embeddings(*edges)와 같지만, edges에 없는 관계(compound)까지 학습한 모델이면
+    store(HeteroGraph)의 관계별 CSR 블록으로 encode_graph()한 임베딩을 edges의 캐시로 둔다
+    edges: (edge_index, edge_type, edge_weight), 이후 model(..., *edges) 호출은 이 캐시를 쓴다
+    """
+    if not missing_relations(model, edges[1]):
+        return model.cache_embeddings(*edges)
+    if store is None:
+        raise ValueError(f"Model has {model.num_relations} relations but the edges have fewer (pass the HeteroGraph store)")
+
+    was_training = model.training
+    model.eval()
+    try:
+        with torch.no_grad():
+            x = model.encode_graph(store)
+    finally:
+        model.train(was_training)
+    return model.cache_embeddings(*edges, x=x)
@@ -0,0 +1,171 @@
+"""
+그래프 증분 갱신
+
+새 재료/술 노드나 edge 몇 개가 추가될 때 전체 그래프를 다시 인코딩하지 않고
+RGCN 레이어마다 입력 임베딩을 보관해 두었다가 영향을 받는 노드만 다시 계산한다.
+
+레이어 l의 출력이 바뀌는 노드 = 레이어 l 입력이 바뀐 노드 + 그 노드에서 나가는 edge의 도착 노드 + 새 edge의 도착 노드
+이므로 새 노드/edge에서 최대 레이어 수(3) hop 안의 노드만 다시 계산하고 나머지 캐시는 그대로 둔다.
+eval 상태(dropout 없음)의 추론 임베딩에만 사용한다.
+"""
+import time
+from collections import namedtuple
+
+import torch
+
+DeltaResult = namedtuple("DeltaResult", ["new_nodes", "affected", "seconds"])
+DeltaResult.__doc__ = """
+new_nodes  :   추가된 노드 인덱스
+affected   :   레이어별로 다시 계산한 노드 수
+seconds    :   갱신에 걸린 시간
+"""
+
+
+class IncrementalEncoder:
+    """
+    model        :   NeuralCF (eval로 바꿔서 사용, 노드가 추가되면 임베딩 테이블이 커진다)
+    edge_index   :   현재 그래프 edge (전역 인덱스) [2, E]
+    edge_type    :   edge 관계 [E]
+    edge_weight  :   edge 가중치 [E] (없으면 1)
+    """
+
+    def __init__(self, model, edge_index, edge_type, edge_weight=None):
+        self.model = model
+        self.edge_index = edge_index
+        self.edge_type = edge_type
+        self.edge_weight = edge_weight if edge_weight is not None else torch.ones(edge_index.size(1), device=edge_index.device)
+
+        self.layer_inputs = None  # 레이어별 입력 [num_nodes, emb_size]
+        self.embeddings = None    # 마지막 레이어 출력 (= encode() 결과)
+        self.refresh()
+
+    @property
+    def num_nodes(self):
+        return self.model.num_nodes
+
+    @torch.no_grad()
+    def refresh(self):
+        """전체 그래프로 레이어별 입력과 최종 임베딩을 다시 계산"""
+        model = self.model
+        model.eval()
+
+        adj = None
+        if model.propagation == "sparse":
+            adj = model.relation_adjacency(self.edge_index, self.edge_type, self.edge_weight)
+
+        x = model.embedding.weight.detach().clone()
+        self.layer_inputs = []
+        for conv, norm in model.rgcn_layers():
+            self.layer_inputs.append(x)
+            x = conv(x, self.edge_index, self.edge_type, self.edge_weight, adj=adj)
+            if norm is not None:
+                x = model.post_layer(x, norm)
+        self.embeddings = x
+        self._publish()
+
+    def _publish(self):
+        # model(...) / node_embeddings()가 현재 그래프에서 갱신된 임베딩을 바로 쓰도록 캐시로 등록
+        self.model.cache_embeddings(self.edge_index, self.edge_type, self.edge_weight, x=self.embeddings)
+
+    def _init_embeddings(self, new_nodes, edge_index):
+        """새 노드 초기 임베딩: 새 edge로 연결된 기존 노드 임베딩의 평균 (연결이 없으면 전체 평균)"""
+        weight = self.model.embedding.weight.detach()
+        num_old = weight.size(0)
+        init = weight.mean(dim=0, keepdim=True).repeat(len(new_nodes), 1)
+        if edge_index is None or edge_index.size(1) == 0:
+            return init
+
+        # 양방향으로 본 (새 노드, 기존 이웃) 쌍
+        a = torch.cat([edge_index[0], edge_index[1]])
+        b = torch.cat([edge_index[1], edge_index[0]])
+        mask = (a >= num_old) & (b < num_old)
+        if not mask.any():
+            return init
+
+        rows = a[mask] - num_old
+        sums = torch.zeros_like(init).index_add_(0, rows, weight[b[mask]])
+        counts = torch.bincount(rows, minlength=len(new_nodes)).unsqueeze(1)
+        return torch.where(counts > 0, sums / counts.clamp(min=1), init)
+
+    def _recompute(self, layer, rows):
+        """레이어 layer의 출력 중 rows만 다시 계산 (rows로 들어오는 edge만 사용)"""
+        conv, norm = self.model.rgcn_layers()[layer]
+        x = self.layer_inputs[layer]
+
+        in_mask = torch.isin(self.edge_index[1], rows)
+        src, dst = self.edge_index[0][in_mask], self.edge_index[1][in_mask]
+
+        # rows + 출발 노드로 된 부분 그래프 (n_id는 정렬되어 있어 searchsorted로 로컬 인덱스)
+        n_id = torch.cat([rows, src]).unique()
+        local_edges = torch.stack([torch.searchsorted(n_id, src), torch.searchsorted(n_id, dst)])
+        out = conv(x[n_id], local_edges, self.edge_type[in_mask], self.edge_weight[in_mask])
+        out = out[torch.searchsorted(n_id, rows)]
+        if norm is not None:
+            out = self.model.post_layer(out, norm)
+
+        target = self.layer_inputs[layer + 1] if layer + 1 < len(self.layer_inputs) else self.embeddings
+        target[rows] = out
+
+    @torch.no_grad()
+    def apply(self, num_new_nodes=0, edge_index=None, edge_type=None, edge_weight=None, node_init=None):
+        """
+        노드/edge를 추가하고 영향을 받는 노드의 임베딩만 다시 계산
+        num_new_nodes  :   추가할 노드 수 (인덱스는 현재 num_nodes부터 차례로)
+        edge_index     :   추가할 edge (새 노드 인덱스 포함 가능) [2, E_new]
+        edge_type      :   추가할 edge 관계 [E_new]
+        edge_weight    :   추가할 edge 가중치 [E_new] (없으면 1)
+        node_init      :   새 노드 초기 임베딩 [num_new_nodes, emb_size] (없으면 이웃 평균)
+        """
+        start = time.perf_counter()
+        model = self.model
+        model.eval()
+        device = self.edge_index.device
+
+        if edge_index is None:
+            edge_index = torch.empty(2, 0, dtype=torch.long, device=device)
+            edge_type = torch.empty(0, dtype=torch.long, device=device)
+        edge_index = torch.as_tensor(edge_index, dtype=torch.long, device=device).reshape(2, -1)
+        edge_type = torch.as_tensor(edge_type, dtype=self.edge_type.dtype, device=device).reshape(-1)
+        if edge_weight is None:
+            edge_weight = torch.ones(edge_index.size(1), device=device)
+        edge_weight = torch.as_tensor(edge_weight, dtype=self.edge_weight.dtype, device=device).reshape(-1)
+
+        num_nodes = self.num_nodes + num_new_nodes
+        if edge_type.size(0) != edge_index.size(1) or edge_weight.size(0) != edge_index.size(1):
+            raise ValueError("edge_index, edge_type and edge_weight must have the same number of edges")
+        if edge_index.numel() and (int(edge_index.min()) < 0 or int(edge_index.max()) >= num_nodes):
+            raise ValueError(f"Edge endpoints must be in [0, {num_nodes})")
+        if edge_type.numel() and (int(edge_type.min()) < 0 or int(edge_type.max()) >= model.num_relations):
+            raise ValueError(f"Edge types must be in [0, {model.num_relations})")
+
+        # 1) 새 노드: 임베딩 테이블과 레이어별 캐시를 늘린다
+        new_nodes = torch.empty(0, dtype=torch.long, device=device)
+        if num_new_nodes > 0:
+            new_nodes = torch.arange(self.num_nodes, num_nodes, device=device)
+            if node_init is None:
+                node_init = self._init_embeddings(new_nodes, edge_index)
+            model.grow_embeddings(num_new_nodes, init=node_init)
+            self.layer_inputs[0] = torch.cat([self.layer_inputs[0], model.embedding.weight.detach()[new_nodes]])
+            for i in range(1, len(self.layer_inputs)):
+                self.layer_inputs[i] = torch.cat([self.layer_inputs[i], self.layer_inputs[i].new_zeros(num_new_nodes, self.layer_inputs[i].size(1))])
+            self.embeddings = torch.cat([self.embeddings, self.embeddings.new_zeros(num_new_nodes, self.embeddings.size(1))])
+
+        # 2) 새 edge를 그래프에 붙인다 (기존 텐서는 그대로 두고 새 텐서로 교체)
+        self.edge_index = torch.cat([self.edge_index, edge_index], dim=1)
+        self.edge_type = torch.cat([self.edge_type, edge_type])
+        self.edge_weight = torch.cat([self.edge_weight, edge_weight])
+
+        # 3) 레이어마다 입력이 바뀐 노드에서 한 hop씩 넓혀 가며 다시 계산
+        changed = new_nodes
+        new_dst = edge_index[1].unique()
+        affected = []
+        for layer in range(len(self.layer_inputs)):
+            out_neighbors = self.edge_index[1][torch.isin(self.edge_index[0], changed)]
+            rows = torch.cat([changed, out_neighbors, new_dst]).unique()
+            if len(rows):
+                self._recompute(layer, rows)
+            affected.append(len(rows))
+            changed = rows
+
+        self._publish()
+        return DeltaResult(new_nodes=new_nodes, affected=affected, seconds=time.perf_counter() - start)
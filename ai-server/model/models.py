@@ -13,7 +13,7 @@ loss.backward()
 """
 
 class NeuralCF(nn.Module):
-    def __init__(self, num_users, num_items, num_nodes=8298, num_relations=2, emb_size=128, hidden_layers=[256, 128, 64, 32], emb_init = None):
+    def __init__(self, num_users, num_items, num_nodes=8298, num_relations=2, emb_size=128, hidden_layers=[256, 128, 64, 32], emb_init = None, propagation="message"):
         super(NeuralCF, self).__init__()
         """
             num_users       :   술 노드의 개수
@@ -24,12 +24,25 @@ class NeuralCF(nn.Module):
             hidden_layer    :   MLP
             user_init       :   술 초기 임베딩
             item_init       :   음식 초기 임베딩
+            propagation     :   RGCN 전파 방식 ("message": edge 단위 message passing, "sparse": 관계별 CSR 행렬곱)
         """
         """
             GNN 구현 완료 
             CSP_Aggregation 미구현
         """
         self.num_nodes = num_nodes
+        self.num_relations = num_relations
+        self.propagation = propagation
+
+        # sparse 전파용 관계별 인접행렬 캐시 (그래프가 바뀔 때만 다시 만든다)
+        self._adj_cache = None
+        self._adj_cache_key = None
+        self._adj_cache_graph = None
+
+        # 추론용 GNN 임베딩 캐시 (eval + no_grad 에서만 사용)
+        self._emb_cache = None
+        self._emb_cache_key = None
+        self._emb_cache_graph = None
         
         self.embedding = nn.Embedding(num_nodes, emb_size) # GNN에서 사용될 노드 임베딩
         
@@ -41,9 +54,9 @@ class NeuralCF(nn.Module):
         self.norm2 = nn.LayerNorm(emb_size)
         
         # RGNN
-        self.wrgcn = WeightedRGCNConv(emb_size, emb_size, num_relations) # GNN layer
-        self.wrgcn2 = WeightedRGCNConv(emb_size, emb_size, num_relations)
-        self.wrgcn3 = WeightedRGCNConv(emb_size, emb_size, num_relations)
+        self.wrgcn = WeightedRGCNConv(emb_size, emb_size, num_relations, propagation=propagation) # GNN layer
+        self.wrgcn2 = WeightedRGCNConv(emb_size, emb_size, num_relations, propagation=propagation)
+        self.wrgcn3 = WeightedRGCNConv(emb_size, emb_size, num_relations, propagation=propagation)
 
         layers = []
         input_size = emb_size * 2
@@ -57,29 +70,115 @@ class NeuralCF(nn.Module):
         # 최종 결과 출력층 
         self.output_layer = nn.Linear(hidden_layers[-1] + emb_size, 1)
 
-    def forward(self, user_indices, item_indices, edge_index, edge_type, edge_weight=None, is_embbed=False):
+    @classmethod
+    def from_state_dict(cls, state_dict, num_users=155, num_items=6498, **kwargs):
         """
-            user_indices :   술 노드의 인덱스
-            item_indices :   음식 노드의 인덱스
+            체크포인트의 텐서 shape에서 구조(num_nodes, emb_size, hidden_layers, num_relations)를 읽어 모델 생성 후 로드
+        """
+        num_nodes, emb_size = state_dict['embedding.weight'].shape
+        num_relations = len([k for k in state_dict if k.startswith('wrgcn.rel_lins.')])
+        linear_keys = sorted(
+            (k for k in state_dict if k.startswith('mlp.') and k.endswith('.weight')),
+            key=lambda k: int(k.split('.')[1])
+        )
+        hidden_layers = [state_dict[k].shape[0] for k in linear_keys]
+
+        model = cls(num_users, num_items, num_nodes=num_nodes, num_relations=num_relations,
+                    emb_size=emb_size, hidden_layers=hidden_layers, **kwargs)
+        model.load_state_dict(state_dict)
+        return model
+
+    def encode(self, edge_index, edge_type, edge_weight=None, n_id=None):
+        """
+            전체 그래프에 RGCN을 적용하여 모든 노드의 임베딩을 계산
             edge_index   :   GNN에서 사용할 edge_index
+            edge_type    :   GNN에서 사용할 edge_type
             edge_weight  :   GNN에서 사용할 edge_weight (default: None)
+            n_id         :   부분 그래프의 전역 노드 인덱스 (model/sampling.py), 주면 edge_index는 n_id 기준 로컬 인덱스이고
+                             반환값도 n_id 순서의 [len(n_id), emb_size]
         """
-        # RGCN 기반 임베딩
-        x = self.embedding(torch.arange(self.num_nodes, device=edge_index.device))
-        
-        x = self.wrgcn(x, edge_index, edge_type, edge_weight)
-        x = F.relu(x)
-        x = F.dropout(x, p=0.2, training=self.training)
-        x = self.norm1(x)
-        x = self.wrgcn2(x, edge_index, edge_type, edge_weight)
+        if n_id is None:
+            n_id = torch.arange(self.num_nodes, device=edge_index.device)
+
+        adj = self.relation_adjacency(edge_index, edge_type, edge_weight, num_nodes=len(n_id)) if self.propagation == "sparse" else None
+
+        x = self.embedding(n_id)
+        return self._rgcn_layers(x, edge_index, edge_type, edge_weight, adj=adj)
+
+    def encode_graph(self, graph):
+        """
+            HeteroGraph(model/graph_store.py)의 관계별 CSR 블록으로 RGCN 적용
+            관계 0..num_relations-1의 블록만 사용하고 (num_relations=3이면 compound edge 포함)
+            반환값은 블록이 참조하는 노드 구간 [graph.num_nodes(num_relations), emb_size]
+        """
+        device = self.embedding.weight.device
+        blocks = graph.blocks(self.num_relations, device=device)
+        num_nodes = graph.num_nodes(self.num_relations)
+        if num_nodes > self.num_nodes:
+            raise ValueError(f"Graph has {num_nodes} nodes but the embedding table has {self.num_nodes}")
+
+        x = self.embedding(torch.arange(num_nodes, device=device))
+        return self._rgcn_layers(x, None, None, blocks=blocks)
+
+    def rgcn_layers(self):
+        """
+            (RGCN 레이어, 뒤에 붙는 LayerNorm 또는 None) 순서 목록
+            encode()와 증분 갱신(model/incremental.py)이 같은 순서로 레이어를 적용한다
+        """
+        return [(self.wrgcn, self.norm1), (self.wrgcn2, self.norm2), (self.wrgcn3, None)]
+
+    def post_layer(self, x, norm):
+        # 노드(행)별 연산만 있으므로 일부 노드에만 적용해도 결과가 같다
         x = F.relu(x)
         x = F.dropout(x, p=0.2, training=self.training)
-        x = self.norm2(x)
-        x = self.wrgcn3(x, edge_index, edge_type, edge_weight)
-        
-        if is_embbed:
-            return x
+        return norm(x)
+
+    def _rgcn_layers(self, x, edge_index, edge_type, edge_weight=None, **conv_kwargs):
+        for conv, norm in self.rgcn_layers():
+            x = conv(x, edge_index, edge_type, edge_weight, **conv_kwargs)
+            if norm is not None:
+                x = self.post_layer(x, norm)
+        return x
+
+    def grow_embeddings(self, count, init=None):
+        """
+            임베딩 테이블 끝에 노드 count개를 추가하고 새 노드 인덱스를 반환
+            init    :   새 노드의 초기 임베딩 [count, emb_size] (없으면 기존 임베딩 평균)
+        """
+        old = self.embedding.weight.data
+        if init is None:
+            init = old.mean(dim=0, keepdim=True).expand(count, -1)
+
+        embedding = nn.Embedding(old.size(0) + count, old.size(1)).to(old.device)
+        embedding.weight.data.copy_(torch.cat([old, init.to(old)]))
+        self.embedding = embedding
+        self.num_nodes = old.size(0) + count
+
+        self.clear_embedding_cache()
+        self._adj_cache = None
+        self._adj_cache_key = None
+        self._adj_cache_graph = None
+        return torch.arange(old.size(0), self.num_nodes, device=old.device)
 
+    def relation_adjacency(self, edge_index, edge_type, edge_weight=None, num_nodes=None):
+        """
+            sparse 전파에 쓰는 관계별 CSR 인접행렬 (세 레이어가 공유, 그래프가 같으면 재사용)
+        """
+        num_nodes = num_nodes if num_nodes is not None else self.num_nodes
+        key = (self._cache_key(edge_index, edge_type, edge_weight)[0], num_nodes)
+        if self._adj_cache is None or self._adj_cache_key != key:
+            self._adj_cache = build_relation_adjacency(edge_index, edge_type, edge_weight, num_nodes, self.num_relations)
+            self._adj_cache_key = key
+            self._adj_cache_graph = (edge_index, edge_type, edge_weight)
+        return self._adj_cache
+
+    def score(self, x, user_indices, item_indices):
+        """
+            encode()로 계산된 노드 임베딩에서 GMF + MLP 헤드만 통과
+            x            :   전체 노드 임베딩 [num_nodes, emb_size]
+            user_indices :   술 노드의 인덱스
+            item_indices :   음식 노드의 인덱스
+        """
         # GNN 결과 슬라이싱
         gmf_user_emb = x[user_indices]
         gmf_item_emb = x[item_indices]
@@ -102,17 +201,121 @@ class NeuralCF(nn.Module):
         GMF + MLP 둘이 성질이 다르기 때문에 곱하거나 평균내지 않고 그냥 나란히 붙인다
         """
         final_input = torch.cat([gmf_output, mlp_output], dim=-1)
-        logits = self.output_layer(final_input)
         score = self.output_layer(final_input).squeeze() 
         
         #return torch.sigmoid(logits).squeeze()
         #score = torch.tanh(score)
         return score
 
+    def _cache_key(self, edge_index, edge_type, edge_weight):
+        # 그래프 텐서나 파라미터가 교체/in-place 수정(load_state_dict, optimizer.step 등)되면 키가 달라진다
+        graph = tuple(
+            None if t is None else (t.data_ptr(), tuple(t.shape), t._version)
+            for t in (edge_index, edge_type, edge_weight)
+        )
+        params = tuple(p._version for p in self.parameters())
+        return graph, params
+
+    def cache_embeddings(self, edge_index, edge_type, edge_weight=None, x=None):
+        """
+            추론용으로 GNN 임베딩을 한 번 계산해 고정 텐서로 보관
+            체크포인트(파라미터)나 edge 텐서가 바뀌면 자동으로 무효화된다
+            x를 주면 계산하지 않고 그 임베딩을 이 그래프의 캐시로 둔다 (증분 갱신 결과 등)
+        """
+        if x is None:
+            with torch.no_grad():
+                was_training = self.training
+                self.train(False)
+                x = self.encode(edge_index, edge_type, edge_weight)
+                self.train(was_training)
+
+        self._emb_cache = x
+        self._emb_cache_key = self._cache_key(edge_index, edge_type, edge_weight)
+        # 키의 data_ptr이 재사용되지 않도록 그래프 텐서 참조를 함께 보관
+        self._emb_cache_graph = (edge_index, edge_type, edge_weight)
+        return x
+
+    def clear_embedding_cache(self):
+        self._emb_cache = None
+        self._emb_cache_key = None
+        self._emb_cache_graph = None
+
+    def node_embeddings(self, edge_index, edge_type, edge_weight=None):
+        """
+            eval + no_grad 상태에서는 캐시된 임베딩을 재사용하고, 그 외에는 매번 encode()
+        """
+        if self.training or torch.is_grad_enabled():
+            return self.encode(edge_index, edge_type, edge_weight)
+
+        if self._emb_cache is None or self._emb_cache_key != self._cache_key(edge_index, edge_type, edge_weight):
+            self.cache_embeddings(edge_index, edge_type, edge_weight)
+        return self._emb_cache
+
+    def _apply(self, fn, *args, **kwargs):
+        # .to(device) 등으로 파라미터가 옮겨지면 캐시도 무효
+        self.clear_embedding_cache()
+        self._adj_cache = None
+        self._adj_cache_key = None
+        self._adj_cache_graph = None
+        return super()._apply(fn, *args, **kwargs)
+
+    def forward(self, user_indices, item_indices, edge_index, edge_type, edge_weight=None, is_embbed=False):
+        """
+            user_indices :   술 노드의 인덱스
+            item_indices :   음식 노드의 인덱스
+            edge_index   :   GNN에서 사용할 edge_index
+            edge_weight  :   GNN에서 사용할 edge_weight (default: None)
+        """
+        # RGCN 기반 임베딩 (추론 시에는 캐시 사용)
+        x = self.node_embeddings(edge_index, edge_type, edge_weight)
+        
+        if is_embbed:
+            return x
+
+        return self.score(x, user_indices, item_indices)
+
+
+def build_relation_adjacency(edge_index, edge_type, edge_weight, num_nodes, num_relations):
+    """
+    관계별 가중 인접행렬 A_r 목록 (CSR, [num_nodes, num_nodes], A_r[target, source] = edge_weight)
+    edge가 없는 관계는 None
+    """
+    if edge_weight is None:
+        edge_weight = torch.ones(edge_index.size(1), device=edge_index.device)
+
+    adj = []
+    for r in range(num_relations):
+        mask = edge_type == r
+        if not mask.any():
+            adj.append(None)
+            continue
+        # 중복 edge는 coalesce에서 합쳐지므로 aggr='add'와 동일
+        a = torch.sparse_coo_tensor(
+            torch.stack([edge_index[1][mask], edge_index[0][mask]]),
+            edge_weight[mask],
+            (num_nodes, num_nodes),
+        ).coalesce()
+        adj.append(a.to_sparse_csr())
+    return adj
+
+
+def sparse_matmul(adj, h):
+    """
+    adj @ h, CSR 행렬곱은 bfloat16을 지원하지 않으므로 autocast 중에도 인접행렬 dtype(float32)으로 집계
+    """
+    with torch.autocast(device_type=h.device.type, enabled=False):
+        return torch.sparse.mm(adj, h.to(adj.dtype))
+
 
 class WeightedRGCNConv(MessagePassing):
-    def __init__(self, in_channels, out_channels, num_relations, aggr='add', bias=True):
+    def __init__(self, in_channels, out_channels, num_relations, aggr='add', bias=True, propagation="message"):
         super().__init__(aggr=aggr)
+        """
+        propagation: "message" (edge 단위 gather + scatter) 또는 "sparse" (A_r @ (X W_r), per-edge 중간 텐서 없음)
+        """
+        if propagation not in ("message", "sparse"):
+            raise ValueError(f"Unknown propagation: {propagation}")
+        self.propagation = propagation
         self.num_relations = num_relations
         self.in_channels = in_channels
         self.out_channels = out_channels
@@ -133,36 +336,65 @@ class WeightedRGCNConv(MessagePassing):
         if self.bias is not None:
             nn.init.zeros_(self.bias)
 
-    def forward(self, x, edge_index, edge_type, edge_weight=None):
+    def forward(self, x, edge_index, edge_type, edge_weight=None, adj=None, blocks=None):
         """
         x: [num_nodes, in_channels]
         edge_index: [2, num_edges]
         edge_type: [num_edges]
         edge_weight: [num_edges] or None
+        adj: build_relation_adjacency() 결과 (sparse 전파에서만 사용, None이면 새로 생성)
+        blocks: HeteroGraph.blocks() 결과, 주면 edge_index / edge_type 대신 블록으로 전파
         """
+        if blocks is not None:
+            return self.block_propagate(x, blocks)
+
+        if self.propagation == "sparse":
+            return self.sparse_propagate(x, edge_index, edge_type, edge_weight, adj)
         
         if edge_weight is None:
             edge_weight = torch.ones(edge_index.size(1), device=edge_index.device)
 
-        return self.propagate(edge_index, x=x, edge_type=edge_type, edge_weight=edge_weight)
+        # 관계별 변환을 edge가 아닌 노드 단위로 한 번에 계산 (typed matmul) 후 edge별로 gather
+        num_nodes = x.size(0)
+        rel_weight = torch.stack([lin.weight for lin in self.rel_lins])  # [num_relations, out, in]
+        h = torch.matmul(x, rel_weight.transpose(1, 2))  # [num_relations, num_nodes, out]
+        h = h.reshape(-1, self.out_channels)
+        rel_src = edge_type * num_nodes + edge_index[0]
 
-    def message(self, x_j, edge_type, edge_weight):
-        """
-        x_j: source node features [num_edges, in_channels]
-        edge_type: edge types [num_edges]
-        edge_weight: edge weights [num_edges]
-        """
+        return self.propagate(edge_index, size=(num_nodes, num_nodes), x=x, h=h, rel_src=rel_src, edge_weight=edge_weight)
 
-        # 각 관계에 따라 다른 transformation
-        out = torch.zeros(x_j.size(0), self.out_channels, device=x_j.device)
+    def sparse_propagate(self, x, edge_index, edge_type, edge_weight=None, adj=None):
+        if adj is None:
+            adj = build_relation_adjacency(edge_index, edge_type, edge_weight, x.size(0), self.num_relations)
 
-        for r in range(self.num_relations):
-            mask = edge_type == r
-            if mask.sum() > 0:
-                transformed = self.rel_lins[r](x_j[mask])
-                out[mask] = edge_weight[mask].unsqueeze(-1) * transformed
+        aggr_out = None
+        for r, a in enumerate(adj):
+            if a is None:
+                continue
+            out_r = sparse_matmul(a, self.rel_lins[r](x))
+            aggr_out = out_r if aggr_out is None else aggr_out + out_r
 
-        return out
+        if aggr_out is None:
+            aggr_out = x.new_zeros(x.size(0), self.out_channels)
+        return self.update(aggr_out, x)
+
+    def block_propagate(self, x, blocks):
+        """블록마다 출발 구간 노드에만 W_r을 곱하고 (A_block @ X_src W_r) 도착 구간에 더한다"""
+        aggr_out = x.new_zeros(x.size(0), self.out_channels, dtype=torch.float32)
+        for block in blocks:
+            (dst_start, dst_stop), (src_start, src_stop) = block.dst_range, block.src_range
+            h = self.rel_lins[block.relation](x[src_start:src_stop])
+            aggr_out[dst_start:dst_stop] += sparse_matmul(block.adj, h)
+        return self.update(aggr_out, x)
+
+    def message(self, h, rel_src, edge_weight):
+        """
+        h: relation-transformed node features [num_relations * num_nodes, out_channels]
+        rel_src: row of h for each edge (edge_type * num_nodes + source) [num_edges]
+        edge_weight: edge weights [num_edges]
+        autocast(bfloat16) 중에는 h가 bfloat16이므로 가중치도 맞춰서 edge 단위 텐서를 float32로 키우지 않는다
+        """
+        return edge_weight.unsqueeze(-1).to(h.dtype) * h.index_select(0, rel_src)
 
     def update(self, aggr_out, x):
         out = aggr_out + self.root(x)
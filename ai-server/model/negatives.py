@@ -0,0 +1,123 @@
+"""
+그래프 임베딩 기반 hard negative 마이닝
+
+학습 중 N optimizer 스텝마다 encode() 결과에서 술/재료 임베딩을 떼어내 스냅샷을 만들고,
+술마다 코사인 유사도가 가장 높은 재료 중 positive가 아닌 것 num_neighbors개를 목록으로 저장한다.
+스텝마다 hard negative는 이 목록에서 균일하게 뽑기만 하므로 비용이 후보 풀 크기와 무관하다.
+
+술 155개 x 재료 6498개라 근사 인덱스 없이 행렬곱 + topk로 정확한 이웃을 구한다.
+"""
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+class HardNegativeMiner:
+    """
+    ingredient_indices  :   negative 후보가 될 재료 노드 인덱스
+    positive_users      :   positive 쌍의 술 노드 인덱스 배열
+    positive_items      :   positive 쌍의 재료 노드 인덱스 배열
+    refresh_every       :   이웃 목록을 다시 만드는 주기 (optimizer 스텝 수, 학습 루프가 스텝마다 step() 호출)
+    num_neighbors       :   술마다 저장할 nearest non-positive 재료 수
+    """
+
+    def __init__(self, ingredient_indices, positive_users, positive_items, refresh_every=100, num_neighbors=50):
+        self.ingredient_indices = torch.as_tensor(np.asarray(ingredient_indices), dtype=torch.long)
+        self.refresh_every = refresh_every
+        self.num_neighbors = min(num_neighbors, len(self.ingredient_indices))
+
+        positive_users = np.array(positive_users, dtype=np.int64)
+        positive_items = np.array(positive_items, dtype=np.int64)
+        self.liquor_indices = torch.as_tensor(np.unique(positive_users), dtype=torch.long)
+
+        # 노드 인덱스 -> 행/열 위치 (-1: 없음)
+        num_nodes = int(max(self.ingredient_indices.max().item(), self.liquor_indices.max().item(), positive_items.max())) + 1
+        self.row_of = torch.full((num_nodes,), -1, dtype=torch.long)
+        self.row_of[self.liquor_indices] = torch.arange(len(self.liquor_indices))
+        col_of = torch.full((num_nodes,), -1, dtype=torch.long)
+        col_of[self.ingredient_indices] = torch.arange(len(self.ingredient_indices))
+
+        # [술, 재료] positive 마스크 (이웃에서 제외)
+        rows = self.row_of[torch.from_numpy(positive_users)]
+        cols = col_of[torch.from_numpy(positive_items)]
+        valid = cols >= 0
+        self.positive_mask = torch.zeros(len(self.liquor_indices), len(self.ingredient_indices), dtype=torch.bool)
+        self.positive_mask[rows[valid], cols[valid]] = True
+
+        self.neighbors = None   # [술, num_neighbors] 재료 노드 인덱스
+        self.steps = 0
+        self.refreshes = 0
+        self.refreshed_at = None   # 마지막 갱신 시점의 steps
+
+    @classmethod
+    def from_dataset(cls, dataset, ingredient_indices, **kwargs):
+        """BPRDataset의 positive 쌍으로 생성"""
+        return cls(ingredient_indices, dataset.positive_users, dataset.positive_items, **kwargs)
+
+    @torch.no_grad()
+    def refresh(self, x):
+        """노드 임베딩 x 스냅샷으로 술별 nearest non-positive 재료 목록을 다시 만든다"""
+        x = x.detach()
+        device = x.device
+        liquor_emb = F.normalize(x[self.liquor_indices.to(device)], dim=1)
+        ingredient_emb = F.normalize(x[self.ingredient_indices.to(device)], dim=1)
+
+        sim = liquor_emb @ ingredient_emb.t()
+        sim.masked_fill_(self.positive_mask.to(device), float('-inf'))
+        _, cols = torch.topk(sim, k=self.num_neighbors, dim=1)
+
+        self.neighbors = self.ingredient_indices.to(device)[cols]
+        self.refreshes += 1
+        self.refreshed_at = self.steps
+
+    def state_dict(self):
+        """스텝 수와 현재 이웃 목록 (epoch 체크포인트에 저장해 resume 후 같은 주기 / 같은 목록으로 이어간다)"""
+        return {
+            "steps": self.steps,
+            "refreshes": self.refreshes,
+            "refreshed_at": self.refreshed_at,
+            "neighbors": self.neighbors,
+        }
+
+    def load_state_dict(self, state):
+        neighbors = state["neighbors"]
+        if neighbors is not None and tuple(neighbors.shape) != (len(self.liquor_indices), self.num_neighbors):
+            raise ValueError(f"Miner state has neighbors of shape {tuple(neighbors.shape)}, expected {(len(self.liquor_indices), self.num_neighbors)}")
+        self.steps = state["steps"]
+        self.refreshes = state["refreshes"]
+        self.refreshed_at = state["refreshed_at"]
+        self.neighbors = neighbors
+
+    def needs_refresh(self):
+        """이번 스텝에 목록을 갱신해야 하는지 (refresh_every 스텝마다 한 번, 한 스텝에 sample을 여러 번 불러도 한 번)"""
+        if self.neighbors is None:
+            return True
+        return self.steps % self.refresh_every == 0 and self.refreshed_at != self.steps
+
+    def step(self):
+        """optimizer 스텝 하나가 끝났음을 알린다 (refresh_every는 이 호출 수로 센다)"""
+        self.steps += 1
+
+    def sample(self, user, x=None):
+        """
+        user 각각에 대해 nearest non-positive 목록에서 negative 하나
+        x를 주면 needs_refresh()일 때 그 임베딩으로 목록을 갱신
+        positive가 없어 목록이 없는 술은 재료 전체에서 균일하게 뽑는다
+        """
+        if x is not None and self.needs_refresh():
+            self.refresh(x)
+        if self.neighbors is None:
+            raise RuntimeError("HardNegativeMiner.sample() needs embeddings before the first refresh")
+
+        device = user.device
+        row_of = self.row_of.to(device)
+        rows = torch.where(user < len(row_of), row_of[user.clamp(max=len(row_of) - 1)], -1)
+        known = rows >= 0
+        pick = torch.randint(0, self.num_neighbors, (user.size(0),), device=device)
+        neg = self.neighbors.to(device)[rows.clamp(min=0), pick]
+
+        if not bool(known.all()):
+            pool = self.ingredient_indices.to(device)
+            fallback = pool[torch.randint(0, len(pool), (user.size(0),), device=device)]
+            neg = torch.where(known, neg, fallback)
+        return neg
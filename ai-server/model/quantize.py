@@ -0,0 +1,263 @@
+"""
+NeuralCF 추론용 양자화 export
+
+서빙에는 GNN이 필요 없고 (그래프 임베딩은 cache_embeddings()로 고정) GMF+MLP 헤드만 통과하므로
+export에는 그래프 임베딩과 헤드만 저장한다.
+    - 노드 임베딩: float16 또는 int8 + 행별 scale (max|x| / 127)
+    - 헤드(mlp + output_layer): Linear를 dynamic int8 양자화
+float32 모델과 155개 술 전체의 재료 순위를 비교한 결과(top-10 겹침, Kendall tau)를 함께 기록한다.
+API는 CHECKPOINT_PATH에 체크포인트 대신 export 파일을 주면 이 모델로 서빙한다.
+
+    python model/quantize.py --checkpoint ./model/checkpoint/best_model.pth [--embeddings int8|float16]
+"""
+import io
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+QUANTIZED_FORMAT = "neuralcf-quantized"
+QUANTIZED_VERSION = 1
+
+
+def is_quantized_export(obj):
+    return isinstance(obj, dict) and obj.get("format") == QUANTIZED_FORMAT
+
+
+def quantize_rows(x):
+    """행별 대칭 int8 양자화 -> (int8 [N, D], scale float32 [N])"""
+    scales = x.abs().amax(dim=1).clamp(min=1e-12) / 127.0
+    q = torch.round(x / scales.unsqueeze(1)).clamp(-127, 127).to(torch.int8)
+    return q, scales.float()
+
+
+class QuantizedNeuralCF(nn.Module):
+    """
+    embeddings     :   고정된 그래프 임베딩 (float16 또는 int8) [num_nodes, emb_size]
+    scales         :   int8일 때 행별 scale [num_nodes], float16이면 None
+    hidden_layers  :   NeuralCF mlp 구조
+    """
+
+    def __init__(self, embeddings, scales=None, hidden_layers=[256, 128, 64, 32]):
+        super().__init__()
+        self.num_nodes, emb_size = embeddings.shape
+        self.hidden_layers = list(hidden_layers)
+        self.register_buffer("embeddings", embeddings)
+        self.register_buffer("scales", scales)
+        self.graph_hash = None  # export에 기록된 그래프 해시
+
+        # NeuralCF와 같은 구조/이름 (state_dict 키가 같도록)
+        layers = []
+        input_size = emb_size * 2
+        for h in hidden_layers:
+            layers.append(nn.Linear(input_size, h))
+            layers.append(nn.ReLU())
+            layers.append(nn.Dropout(0.2))
+            input_size = h
+        self.mlp = nn.Sequential(*layers)
+        self.output_layer = nn.Linear(hidden_layers[-1] + emb_size, 1)
+        self.eval()
+
+    @property
+    def embedding_dtype(self):
+        return "int8" if self.embeddings.dtype == torch.int8 else "float16"
+
+    @property
+    def variant(self):
+        return f"int8 head / {self.embedding_dtype} embeddings"
+
+    def quantize_head(self):
+        torch.ao.quantization.quantize_dynamic(self, {nn.Linear}, dtype=torch.qint8, inplace=True)
+        return self
+
+    @classmethod
+    def from_model(cls, model, x, embedding_dtype="int8"):
+        """NeuralCF와 그 그래프 임베딩 x(encode 결과)로 생성"""
+        x = x.detach().float().cpu()
+        if embedding_dtype == "int8":
+            embeddings, scales = quantize_rows(x)
+        elif embedding_dtype == "float16":
+            embeddings, scales = x.half(), None
+        else:
+            raise ValueError(f"Unknown embedding dtype: {embedding_dtype}")
+
+        hidden_layers = [m.out_features for m in model.mlp if isinstance(m, nn.Linear)]
+        quantized = cls(embeddings, scales, hidden_layers)
+        quantized.mlp.load_state_dict(model.mlp.state_dict())
+        quantized.output_layer.load_state_dict(model.output_layer.state_dict())
+        return quantized.quantize_head()
+
+    @classmethod
+    def from_export(cls, export):
+        if export.get("version") != QUANTIZED_VERSION:
+            raise ValueError(f"Unsupported quantized export version: {export.get('version')}")
+        model = cls(export["embeddings"], export["scales"], export["hidden_layers"]).quantize_head()
+        model.load_state_dict(export["state_dict"])
+        model.graph_hash = export.get("graph_hash")
+        return model
+
+    def export(self, **meta):
+        return {
+            "format": QUANTIZED_FORMAT,
+            "version": QUANTIZED_VERSION,
+            "embeddings": self.embeddings,
+            "scales": self.scales,
+            "hidden_layers": self.hidden_layers,
+            "state_dict": self.state_dict(),
+            **meta,
+        }
+
+    def embed(self, indices):
+        """indices 행만 float32로 복원"""
+        x = self.embeddings[indices].float()
+        if self.scales is not None:
+            x = x * self.scales[indices].unsqueeze(-1)
+        return x
+
+    def score(self, user_indices, item_indices):
+        """NeuralCF.score와 같은 GMF + MLP 헤드"""
+        user_emb = self.embed(user_indices)
+        item_emb = self.embed(item_indices)
+
+        gmf_output = F.normalize(user_emb, dim=-1) * F.normalize(item_emb, dim=-1)
+        mlp_output = self.mlp(torch.cat([user_emb, item_emb], dim=-1))
+        return self.output_layer(torch.cat([gmf_output, mlp_output], dim=-1)).squeeze()
+
+    def forward(self, user_indices, item_indices, edge_index=None, edge_type=None, edge_weight=None, is_embbed=False):
+        # 그래프 인자는 NeuralCF와 호출 형태를 맞추기 위한 것 (임베딩은 export 시점의 그래프로 고정)
+        if is_embbed:
+            return self.node_embeddings()
+        return self.score(user_indices, item_indices)
+
+    def node_embeddings(self, *args, **kwargs):
+        return self.embed(torch.arange(self.num_nodes))
+
+    def cache_embeddings(self, *args, **kwargs):
+        return None
+
+
+def serialized_bytes(obj):
+    buffer = io.BytesIO()
+    torch.save(obj, buffer)
+    return buffer.tell()
+
+
+def score_all(model, liquor_indices, ingredient_indices, graph=(), batch_pairs=131072):
+    """
+    [len(liquor_indices), len(ingredient_indices)] 점수 행렬
+    graph  :   model(users, items, *graph)에 넘길 (edge_index, edge_type, edge_weight), 양자화 모델은 무시
+    """
+    liquor_indices = torch.as_tensor(np.asarray(liquor_indices), dtype=torch.long)
+    ingredient_indices = torch.as_tensor(np.asarray(ingredient_indices), dtype=torch.long)
+    num_items = len(ingredient_indices)
+    liquors_per_batch = max(1, batch_pairs // max(num_items, 1))
+
+    out = np.empty((len(liquor_indices), num_items), dtype=np.float32)
+    with torch.no_grad():
+        for start in range(0, len(liquor_indices), liquors_per_batch):
+            chunk = liquor_indices[start:start + liquors_per_batch]
+            scores = model(chunk.repeat_interleave(num_items), ingredient_indices.repeat(len(chunk)), *graph)
+            out[start:start + len(chunk)] = scores.reshape(len(chunk), num_items).numpy()
+    return out
+
+
+def ranking_report(reference, candidate, k=10):
+    """술(행)별 순위 비교: top-k 겹침 비율과 전체 재료에 대한 Kendall tau"""
+    from scipy.stats import kendalltau
+
+    overlaps, taus = [], []
+    for ref_row, cand_row in zip(reference, candidate):
+        ref_top = np.argpartition(-ref_row, k - 1)[:k]
+        cand_top = np.argpartition(-cand_row, k - 1)[:k]
+        overlaps.append(len(np.intersect1d(ref_top, cand_top)) / k)
+        taus.append(kendalltau(ref_row, cand_row)[0])
+
+    overlaps, taus = np.array(overlaps), np.array(taus)
+    return {
+        "liquors": len(reference),
+        f"top{k}_overlap_mean": float(overlaps.mean()),
+        f"top{k}_overlap_min": float(overlaps.min()),
+        "kendall_tau_mean": float(taus.mean()),
+        "kendall_tau_min": float(taus.min()),
+        "max_abs_score_diff": float(np.abs(reference - candidate).max()),
+    }
+
+
+def main():
+    import argparse
+
+    from models import NeuralCF
+    from dataset import load_graph
+    from graph_store import HeteroGraph, cache_node_embeddings
+    from score_matrix import checkpoint_hash, graph_digest
+
+    parser = argparse.ArgumentParser(description='Export a quantized NeuralCF scoring model for inference')
+    parser.add_argument('--checkpoint', type=str, default='./model/checkpoint/best_model.pth', help='Path to model checkpoint')
+    parser.add_argument('--embeddings', type=str, default='int8', choices=['int8', 'float16'], help='Node embedding storage dtype')
+    parser.add_argument('--output', type=str, default=None, help='Export path (default: <checkpoint>.<embeddings>.pt)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions for the scoring benchmark (best time is reported)')
+    args = parser.parse_args()
+    output = args.output or f"{os.path.splitext(args.checkpoint)[0]}.{args.embeddings}.pt"
+
+    edge_type_map = {
+        'liqr-ingr': 0,
+        'ingr-ingr': 1,
+        'liqr-liqr': 1,
+        'ingr-fcomp': 2,
+        'ingr-dcomp': 2
+    }
+
+    graph = load_graph()
+    mapping = graph.nodes_map()
+    edges_indexes, edges_weights, edge_type = graph.edges(edge_type_map)
+
+    state_dict = torch.load(args.checkpoint, map_location=torch.device('cpu'))
+    model = NeuralCF.from_state_dict(state_dict)
+    model.eval()
+    # --with-compounds 체크포인트는 compound 관계를 관계별 블록으로 인코딩
+    x = cache_node_embeddings(model, (edges_indexes, edge_type, edges_weights), HeteroGraph(graph, edge_type_map))
+
+    quantized = QuantizedNeuralCF.from_model(model, x, embedding_dtype=args.embeddings)
+
+    liquor_indices = list(mapping['liquor'].values())
+    ingredient_indices = list(mapping['ingredient'].values())
+
+    timings = {}
+    scores = {}
+    for name, m in (("float32", model), (args.embeddings, quantized)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            scores[name] = score_all(m, liquor_indices, ingredient_indices, (edges_indexes, edge_type, edges_weights))
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    report = ranking_report(scores["float32"], scores[args.embeddings])
+    export = quantized.export(
+        checkpoint_hash=checkpoint_hash(args.checkpoint),
+        graph_hash=graph_digest(edges_indexes, edge_type, edges_weights),
+        validation=report,
+    )
+    torch.save(export, output)
+
+    # 서빙에 필요한 것: float32는 체크포인트 + 캐시된 그래프 임베딩, 양자화는 export 하나
+    sizes = {
+        "float32": serialized_bytes(state_dict) + x.numel() * x.element_size(),
+        args.embeddings: os.path.getsize(output),
+    }
+    num_pairs = len(liquor_indices) * len(ingredient_indices)
+    print(f"\n{'':<10}{'MB':>10}{'score all ms':>15}{'pairs/s':>14}")
+    for name in ("float32", args.embeddings):
+        print(f"{name:<10}{sizes[name] / 2 ** 20:>10.2f}{timings[name] * 1000:>15.1f}{num_pairs / timings[name]:>14.0f}")
+    print(f"\nRanking agreement over {report['liquors']} liquors:")
+    for key, value in report.items():
+        if key != "liquors":
+            print(f"  {key:<22}{value:.4f}")
+    print(f"\nQuantized export written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+이웃 샘플링 부분 그래프
+
+배치의 seed 노드(술 / positive / negative 재료)에서 시작해 hop마다 들어오는 edge를 최대 fanout개씩 뽑아
+k-hop 부분 그래프를 만든다. NeuralCF.encode(..., n_id=...)가 이 부분 그래프에서만 RGCN을 돌리므로
+스텝 비용이 전체 그래프 크기(compound edge 포함 여부)가 아니라 배치 크기와 fanout에 비례한다.
+"""
+from collections import namedtuple
+
+import torch
+
+SampledSubgraph = namedtuple("SampledSubgraph", ["n_id", "edge_index", "edge_type", "edge_weight", "local"])
+SampledSubgraph.__doc__ = """
+n_id         :   부분 그래프 노드의 전역 인덱스 (seed가 앞쪽)
+edge_index   :   n_id 기준 로컬 인덱스 edge [2, E]
+edge_type    :   edge 관계 [E]
+edge_weight  :   edge 가중치 [E] (없으면 None)
+local        :   전역 인덱스 -> 로컬 인덱스 함수
+"""
+
+
+class NeighborSampler:
+    """
+    edge_index   :   전체 그래프 edge (전역 인덱스) [2, E], message는 edge_index[0] -> edge_index[1]
+    edge_type    :   edge 관계 [E]
+    edge_weight  :   edge 가중치 [E] (없으면 None)
+    num_nodes    :   전체 노드 수
+    fanouts      :   hop마다 노드당 뽑을 들어오는 edge 수 (-1이면 전부), 길이 = GNN 레이어 수
+
+    방문 표시 / 로컬 인덱스용 [num_nodes] 버퍼는 한 번만 만들어 스텝마다 재사용하므로 (건드린 위치만 되돌림)
+    sample() 비용은 부분 그래프 크기에만 비례한다 - 한 인스턴스를 여러 스레드에서 동시에 쓰면 안 된다
+    """
+
+    def __init__(self, edge_index, edge_type, edge_weight=None, num_nodes=None, fanouts=(10, 10, 10), generator=None):
+        num_nodes = num_nodes if num_nodes is not None else int(edge_index.max()) + 1
+        self.num_nodes = num_nodes
+        self.fanouts = list(fanouts)
+        self.generator = generator
+
+        # 도착 노드 기준 CSR: 노드 v로 들어오는 edge는 src[indptr[v]:indptr[v + 1]]
+        dst = edge_index[1]
+        order = torch.argsort(dst, stable=True)
+        self.src = edge_index[0][order].contiguous()
+        self.dst = dst[order].contiguous()
+        self.edge_type = edge_type[order].contiguous()
+        self.edge_weight = edge_weight[order].contiguous() if edge_weight is not None else None
+        counts = torch.bincount(dst, minlength=num_nodes)
+        self.indptr = torch.cat([torch.zeros(1, dtype=torch.long), torch.cumsum(counts, 0)])
+
+        # sample()의 scratch 버퍼, 호출이 끝나면 항상 전부 False / -1
+        self._visited = torch.zeros(num_nodes, dtype=torch.bool)
+        self._local_of = torch.full((num_nodes,), -1, dtype=torch.long)
+
+    def _in_edges(self, nodes, fanout):
+        """nodes 각각으로 들어오는 edge 위치 (fanout보다 많으면 복원 추출 후 중복 제거)"""
+        start = self.indptr[nodes]
+        deg = self.indptr[nodes + 1] - start
+
+        take_all = deg <= fanout if fanout >= 0 else torch.ones_like(deg, dtype=torch.bool)
+        parts = []
+
+        if take_all.any():
+            s, d = start[take_all], deg[take_all]
+            owner = torch.repeat_interleave(torch.arange(len(s)), d)
+            offset = torch.arange(int(d.sum())) - torch.repeat_interleave(torch.cumsum(d, 0) - d, d)
+            parts.append(s[owner] + offset)
+
+        if (~take_all).any():
+            s, d = start[~take_all], deg[~take_all]
+            r = torch.rand(len(s), fanout, generator=self.generator)
+            parts.append((s.unsqueeze(1) + (r * d.unsqueeze(1)).long()).reshape(-1).unique())
+
+        return torch.cat(parts) if parts else torch.empty(0, dtype=torch.long)
+
+    def sample(self, seeds):
+        """seeds(전역 노드 인덱스)의 k-hop 부분 그래프"""
+        try:
+            return self._sample(seeds)
+        except BaseException:
+            # 도중에 실패하면 어디까지 건드렸는지 모르므로 버퍼 전체를 되돌린다
+            self._visited.zero_()
+            self._local_of.fill_(-1)
+            raise
+
+    def _sample(self, seeds):
+        seeds = torch.as_tensor(seeds, dtype=torch.long).reshape(-1).unique()
+        visited = self._visited
+        visited[seeds] = True
+
+        n_id = [seeds]
+        edges = []
+        frontier = seeds
+        for fanout in self.fanouts:
+            if len(frontier) == 0:
+                break
+            e = self._in_edges(frontier, fanout)
+            edges.append(e)
+            src = self.src[e]
+            frontier = src[~visited[src]].unique()
+            visited[frontier] = True
+            n_id.append(frontier)
+
+        n_id = torch.cat(n_id)
+        e = torch.cat(edges) if edges else torch.empty(0, dtype=torch.long)
+
+        local_of = self._local_of
+        local_of[n_id] = torch.arange(len(n_id))
+        edge_index = torch.stack([local_of[self.src[e]], local_of[self.dst[e]]])
+        visited[n_id] = False
+        local_of[n_id] = -1
+
+        # 반환 뒤에도 쓰는 전역 -> 로컬 변환은 버퍼 대신 정렬된 n_id에서 이진 탐색 (없는 노드는 -1)
+        sorted_ids, order = torch.sort(n_id)
+
+        def local(nodes):
+            nodes = nodes.to(n_id.device)
+            if len(sorted_ids) == 0:
+                return torch.full_like(nodes, -1)
+            pos = torch.searchsorted(sorted_ids, nodes).clamp(max=len(sorted_ids) - 1)
+            return torch.where(sorted_ids[pos] == nodes, order[pos], -1)
+
+        return SampledSubgraph(
+            n_id=n_id,
+            edge_index=edge_index,
+            edge_type=self.edge_type[e],
+            edge_weight=self.edge_weight[e] if self.edge_weight is not None else None,
+            local=local,
+        )
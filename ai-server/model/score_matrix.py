@@ -0,0 +1,221 @@
+"""
+술 x 재료 전체 점수 행렬 사전 계산
+
+155 x 6498 (~1M) 점수를 캐시된 그래프 임베딩 위에서 한 번에 계산해서
+체크포인트 옆에 memmap 파일(<checkpoint>.scores.bin + .scores.json)로 저장한다.
+bin을 먼저, 메타데이터를 마지막에 바꾸고 메타데이터에 bin의 크기/해시를 남겨서,
+쓰는 도중이거나 짝이 맞지 않는 bin/메타데이터는 로드하지 않는다.
+API는 이 행렬로 /predict는 O(1) 조회, /recommend는 O(n) top-K로 처리할 수 있다.
+
+    python model/score_matrix.py --checkpoint ./model/checkpoint/best_model.pth [--dtype float16]
+"""
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+import torch
+
+SCORE_MATRIX_VERSION = 2
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return _stream_hash(f)
+
+
+def _stream_hash(f):
+    h = hashlib.sha256()
+    for block in iter(lambda: f.read(1 << 20), b""):
+        h.update(block)
+    return h.hexdigest()
+
+
+def checkpoint_hash(path):
+    """체크포인트 파일의 sha256 (행렬/캐시가 어느 체크포인트에서 나왔는지 구분)"""
+    return file_hash(path)
+
+
+def graph_digest(*tensors):
+    """edge 텐서 내용의 sha256 (edge 집합이 바뀌면 행렬도 무효)"""
+    h = hashlib.sha256()
+    for t in tensors:
+        if t is not None:
+            h.update(t.detach().cpu().contiguous().numpy().tobytes())
+    return h.hexdigest()
+
+
+def matrix_paths(checkpoint_path):
+    base, _ = os.path.splitext(checkpoint_path)
+    return f"{base}.scores.bin", f"{base}.scores.json"
+
+
+def compute_score_matrix(model, liquor_indices, ingredient_indices, edge_index, edge_type, edge_weight=None, batch_pairs=262144):
+    """
+    [len(liquor_indices), len(ingredient_indices)] 점수 행렬
+    그래프 임베딩은 한 번만 계산하고 GMF+MLP 헤드를 큰 배치로 통과시킨다
+    """
+    model.eval()
+    liquor_indices = torch.as_tensor(np.asarray(liquor_indices), dtype=torch.long)
+    ingredient_indices = torch.as_tensor(np.asarray(ingredient_indices), dtype=torch.long)
+    num_items = len(ingredient_indices)
+    liquors_per_batch = max(1, batch_pairs // max(num_items, 1))
+
+    out = np.empty((len(liquor_indices), num_items), dtype=np.float32)
+    with torch.no_grad():
+        x = model.node_embeddings(edge_index, edge_type, edge_weight)
+        for start in range(0, len(liquor_indices), liquors_per_batch):
+            chunk = liquor_indices[start:start + liquors_per_batch]
+            users = chunk.repeat_interleave(num_items)
+            items = ingredient_indices.repeat(len(chunk))
+            out[start:start + len(chunk)] = model.score(x, users, items).reshape(len(chunk), num_items).cpu().numpy()
+    return out
+
+
+def _temp_path(path):
+    """path와 같은 디렉토리의 고유한 임시 파일 (동시에 저장하는 프로세스끼리 겹치지 않게)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    return tmp_path
+
+
+def save_score_matrix(checkpoint_path, scores, liquor_ids, ingredient_ids, graph_hash, dtype="float32"):
+    """
+    행렬을 <checkpoint>.scores.bin(raw) + .scores.json(메타데이터)으로 저장
+    bin을 먼저 바꾸고 (bin 크기/해시를 담은) 메타데이터를 마지막에 바꾼다
+    """
+    bin_path, meta_path = matrix_paths(checkpoint_path)
+    tmp_bin, tmp_meta = _temp_path(bin_path), _temp_path(meta_path)
+    try:
+        data = np.memmap(tmp_bin, dtype=np.dtype(dtype), mode="w+", shape=scores.shape)
+        data[:] = scores
+        data.flush()
+        del data
+
+        meta = {
+            "version": SCORE_MATRIX_VERSION,
+            "dtype": np.dtype(dtype).name,
+            "shape": list(scores.shape),
+            "checkpoint_hash": checkpoint_hash(checkpoint_path),
+            "graph_hash": graph_hash,
+            "bin_size": os.path.getsize(tmp_bin),
+            "bin_hash": file_hash(tmp_bin),
+            "liquor_ids": [int(i) for i in liquor_ids],
+            "ingredient_ids": [int(i) for i in ingredient_ids],
+        }
+        with open(tmp_meta, "w") as f:
+            json.dump(meta, f)
+
+        os.replace(tmp_bin, bin_path)
+        os.replace(tmp_meta, meta_path)
+    except BaseException:
+        for path in (tmp_bin, tmp_meta):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return bin_path
+
+
+def load_score_matrix(checkpoint_path, graph_hash=None, ckpt_hash=None):
+    """
+    저장된 행렬을 memmap으로 연다
+    파일이 없거나 체크포인트/그래프 해시가 다르거나, bin이 메타데이터에 기록된 것과 다르면
+    (저장 도중 / 다른 저장의 bin) None (라이브 모델 평가로 대체)
+    """
+    bin_path, meta_path = matrix_paths(checkpoint_path)
+    if not (os.path.exists(bin_path) and os.path.exists(meta_path)):
+        return None
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except ValueError:
+        return None
+
+    if meta.get("version") != SCORE_MATRIX_VERSION:
+        return None
+    if meta["checkpoint_hash"] != (ckpt_hash or checkpoint_hash(checkpoint_path)):
+        return None
+    if graph_hash is not None and meta["graph_hash"] != graph_hash:
+        return None
+
+    # 확인한 파일을 그대로 매핑 (확인과 매핑 사이에 다른 저장이 bin을 바꿔도 섞이지 않게)
+    with open(bin_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size != meta["bin_size"] or _stream_hash(f) != meta["bin_hash"]:
+            return None
+        scores = np.memmap(f, dtype=np.dtype(meta["dtype"]), mode="r", shape=tuple(meta["shape"]))
+    return ScoreMatrix(scores, meta["liquor_ids"], meta["ingredient_ids"])
+
+
+class ScoreMatrix:
+    """liquor_id / ingredient_id로 조회하는 점수 행렬"""
+
+    def __init__(self, scores, liquor_ids, ingredient_ids):
+        self.scores = scores
+        self.liquor_ids = np.asarray(liquor_ids, dtype=np.int64)
+        self.ingredient_ids = np.asarray(ingredient_ids, dtype=np.int64)
+        self.liquor_row = {lid: r for r, lid in enumerate(self.liquor_ids.tolist())}
+        self.ingredient_col = {iid: c for c, iid in enumerate(self.ingredient_ids.tolist())}
+
+    def score(self, liquor_id, ingredient_id):
+        return float(self.scores[self.liquor_row[liquor_id], self.ingredient_col[ingredient_id]])
+
+    def score_pairs(self, liquor_ids, ingredient_ids):
+        """여러 (liquor_id, ingredient_id) 쌍의 점수를 한 번의 fancy indexing으로"""
+        rows = np.fromiter((self.liquor_row[lid] for lid in liquor_ids), dtype=np.int64, count=len(liquor_ids))
+        cols = np.fromiter((self.ingredient_col[iid] for iid in ingredient_ids), dtype=np.int64, count=len(ingredient_ids))
+        return np.asarray(self.scores[rows, cols], dtype=np.float32)
+
+    def rows(self, liquor_ids):
+        """[len(liquor_ids), n_ingredients] float32 (ingredient_ids 순서)"""
+        return np.asarray(self.scores[[self.liquor_row[lid] for lid in liquor_ids]], dtype=np.float32)
+
+
+def main():
+    import argparse
+
+    from models import NeuralCF
+    from dataset import load_graph
+    from graph_store import HeteroGraph, cache_node_embeddings
+
+    parser = argparse.ArgumentParser(description='Precompute the liquor x ingredient score matrix for a checkpoint')
+    parser.add_argument('--checkpoint', type=str, default='./model/checkpoint/best_model.pth', help='Path to model checkpoint')
+    parser.add_argument('--dtype', type=str, default='float32', choices=['float32', 'float16'], help='Storage dtype')
+    args = parser.parse_args()
+
+    edge_type_map = {
+        'liqr-ingr': 0,
+        'ingr-ingr': 1,
+        'liqr-liqr': 1,
+        'ingr-fcomp': 2,
+        'ingr-dcomp': 2
+    }
+
+    graph = load_graph()
+    mapping = graph.nodes_map()
+    edges_indexes, edges_weights, edge_type = graph.edges(edge_type_map)
+
+    model = NeuralCF.from_state_dict(torch.load(args.checkpoint, map_location=torch.device('cpu')))
+    model.eval()
+    # --with-compounds 체크포인트는 compound 관계를 관계별 블록으로 인코딩 (compute_score_matrix는 이 캐시를 쓴다)
+    cache_node_embeddings(model, (edges_indexes, edge_type, edges_weights), HeteroGraph(graph, edge_type_map))
+
+    liquor_ids = list(mapping['liquor'].keys())
+    ingredient_ids = list(mapping['ingredient'].keys())
+    scores = compute_score_matrix(
+        model,
+        [mapping['liquor'][i] for i in liquor_ids],
+        [mapping['ingredient'][i] for i in ingredient_ids],
+        edges_indexes, edge_type, edges_weights
+    )
+
+    path = save_score_matrix(
+        args.checkpoint, scores, liquor_ids, ingredient_ids,
+        graph_digest(edges_indexes, edge_type, edges_weights), dtype=args.dtype
+    )
+    print(f"Score matrix {scores.shape} ({args.dtype}) written to {path}")
+
+
+if __name__ == "__main__":
+    main()
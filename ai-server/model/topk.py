@@ -0,0 +1,144 @@
+"""
+Top-K 재료 추천 엔진
+
+전체 재료 점수를 정렬하지 않고 argpartition으로 상위 K개만 고른다.
+술별 top-N 목록을 미리 계산해 두면 일반적인 요청은 dict 조회 + 필터만으로 끝나고,
+필터 때문에 top-N 안에서 limit개를 채우지 못할 때만 전체 점수를 다시 계산한다.
+"""
+import numpy as np
+import pandas as pd
+import torch
+
+
+def top_k(scores, k):
+    """scores에서 점수가 높은 순서로 k개의 위치 (전체 정렬 없이 O(n))"""
+    k = min(int(k), len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def load_bad_pairs(path="./liquor_bad_ingredients.csv"):
+    """liquor_id -> 같이 추천하면 안 되는 ingredient_id 집합"""
+    df = pd.read_csv(path, usecols=['liquor_id', 'ingredient_id'])
+    return {int(lid): set(group.tolist()) for lid, group in df.groupby('liquor_id')['ingredient_id']}
+
+
+def load_hub_ingredients(path="./dataset/Hub_Nodes.csv"):
+    """허브 재료 node_id 집합"""
+    df = pd.read_csv(path, usecols=['node_id', 'node_type'])
+    return set(df.loc[df['node_type'] == 'ingredient', 'node_id'].tolist())
+
+
+def make_model_scorer(model, ingredient_indices, edge_index, edge_type, edge_weight=None, batch_pairs=131072):
+    """
+    NeuralCF로 [len(liquor_indices), len(ingredient_indices)] 점수 행렬을 계산하는 함수
+    eval 상태의 모델이면 캐시된 그래프 임베딩을 쓰므로 헤드만 통과한다
+    """
+    ingredient_tensor = torch.as_tensor(np.asarray(ingredient_indices), dtype=torch.long)
+    num_items = len(ingredient_tensor)
+    liquors_per_batch = max(1, batch_pairs // max(num_items, 1))
+
+    def score(liquor_indices):
+        liquor_indices = np.atleast_1d(np.asarray(liquor_indices, dtype=np.int64))
+        out = np.empty((len(liquor_indices), num_items), dtype=np.float32)
+
+        with torch.no_grad():
+            for start in range(0, len(liquor_indices), liquors_per_batch):
+                chunk = torch.from_numpy(liquor_indices[start:start + liquors_per_batch])
+                users = chunk.repeat_interleave(num_items)
+                items = ingredient_tensor.repeat(len(chunk))
+                scores = model(users, items, edge_index, edge_type, edge_weight)
+                out[start:start + len(chunk)] = scores.reshape(len(chunk), num_items).cpu().numpy()
+        return out
+
+    return score
+
+
+class TopKRecommender:
+    """
+    score_fn         :   liquor 인덱스 배열 -> [n_liquors, n_ingredients] 점수 행렬
+    lid_to_idx       :   liquor_id -> 노드 인덱스
+    ingredient_ids   :   score_fn 열 순서에 대응하는 ingredient_id 배열
+    bad_pairs        :   liquor_id -> 제외할 ingredient_id 집합 (exclude_bad 필터)
+    hub_ingredients  :   허브 ingredient_id 집합 (hub_only 필터)
+    top_n            :   술별로 미리 저장해 둘 상위 개수
+    """
+
+    def __init__(self, score_fn, lid_to_idx, ingredient_ids, bad_pairs=None, hub_ingredients=None, top_n=100):
+        self.score_fn = score_fn
+        self.lid_to_idx = lid_to_idx
+        self.ingredient_ids = np.asarray(ingredient_ids, dtype=np.int64)
+        self.id_to_pos = {iid: pos for pos, iid in enumerate(self.ingredient_ids.tolist())}
+        self.top_n = top_n
+
+        self.bad_positions = {
+            lid: np.array([self.id_to_pos[i] for i in ids if i in self.id_to_pos], dtype=np.int64)
+            for lid, ids in (bad_pairs or {}).items()
+        }
+        self.hub_mask = np.zeros(len(self.ingredient_ids), dtype=bool)
+        if hub_ingredients:
+            self.hub_mask[[self.id_to_pos[i] for i in hub_ingredients if i in self.id_to_pos]] = True
+
+        # liquor_id -> (상위 위치 배열, 점수 배열)
+        self.top_lists = {}
+
+    def precompute(self, liquor_ids=None, batch_liquors=32):
+        """모든(또는 주어진) 술에 대해 top-N 목록을 계산해 저장"""
+        liquor_ids = list(self.lid_to_idx.keys()) if liquor_ids is None else list(liquor_ids)
+        for start in range(0, len(liquor_ids), batch_liquors):
+            chunk = liquor_ids[start:start + batch_liquors]
+            scores = self.score_fn([self.lid_to_idx[lid] for lid in chunk])
+            for lid, row in zip(chunk, scores):
+                self._store(lid, row)
+        return self
+
+    def clear(self):
+        self.top_lists = {}
+
+    def _store(self, liquor_id, scores):
+        idx = top_k(scores, self.top_n)
+        self.top_lists[liquor_id] = (idx, scores[idx])
+
+    def _exclusion_mask(self, liquor_id, positions, exclude_bad, hub_only, exclude_ids):
+        """positions 중 필터를 통과하는 것만 True"""
+        keep = np.ones(len(positions), dtype=bool)
+        if hub_only:
+            keep &= self.hub_mask[positions]
+        excluded = []
+        if exclude_bad and liquor_id in self.bad_positions:
+            excluded.append(self.bad_positions[liquor_id])
+        if exclude_ids:
+            excluded.append(np.array([self.id_to_pos[i] for i in exclude_ids if i in self.id_to_pos], dtype=np.int64))
+        if excluded:
+            keep &= ~np.isin(positions, np.concatenate(excluded))
+        return keep
+
+    def recommend(self, liquor_id, limit=10, exclude_bad=False, hub_only=False, exclude_ids=()):
+        """
+        상위 limit개의 (ingredient_id, score) 목록
+        exclude_bad  :   liquor_bad_ingredients.csv의 나쁜 조합 제외
+        hub_only     :   Hub_Nodes.csv의 허브 재료만
+        exclude_ids  :   이미 본 재료 등 추가로 제외할 ingredient_id
+        """
+        if liquor_id not in self.lid_to_idx:
+            raise KeyError(f"Liquor ID {liquor_id} not found")
+
+        # 1) 미리 계산된 top-N에서 필터 후 limit개가 남으면 그대로 사용
+        if limit <= self.top_n:
+            if liquor_id not in self.top_lists:
+                self.precompute([liquor_id])
+            positions, scores = self.top_lists[liquor_id]
+            keep = self._exclusion_mask(liquor_id, positions, exclude_bad, hub_only, exclude_ids)
+            if keep.sum() >= limit or len(positions) == len(self.ingredient_ids):
+                positions, scores = positions[keep][:limit], scores[keep][:limit]
+                return list(zip(self.ingredient_ids[positions].tolist(), scores.tolist()))
+
+        # 2) 필터가 많이 걸렸거나 limit이 큰 경우 전체 점수에서 다시 선택
+        scores = self.score_fn([self.lid_to_idx[liquor_id]])[0]
+        all_positions = np.arange(len(scores))
+        keep = self._exclusion_mask(liquor_id, all_positions, exclude_bad, hub_only, exclude_ids)
+        candidates = all_positions[keep]
+        idx = candidates[top_k(scores[candidates], limit)]
+        return list(zip(self.ingredient_ids[idx].tolist(), scores[idx].tolist()))
@@ -1,16 +1,25 @@
+import argparse
+import contextlib
+import math
+import resource
+import time
 import torch
-from torch.utils.data import DataLoader
 import torch.nn as nn
 import torch.optim as optim
+from torch.optim.lr_scheduler import LambdaLR
 from tqdm import tqdm
 import pandas as pd
 from sklearn.model_selection import train_test_split
 import numpy as np
 import random
 
-from dataset import map_graph_nodes, edges_index, BPRDataset
+from dataset import load_graph, BPRDataset, BatchLoader, COMPOUND_EDGE_TYPES
 from plot import test_visualization, all_score_visualization
 from models import NeuralCF
+from negatives import HardNegativeMiner
+from sampling import NeighborSampler
+from graph_store import HeteroGraph
+from checkpointing import CheckpointManager
 
 def set_seed(seed=123):
     random.seed(seed)
@@ -40,124 +49,381 @@ class EarlyStopping:
             self.counter = 0
 
 def bpr_loss(pos_scores, neg_scores):
-    return -torch.mean(torch.log(torch.sigmoid(pos_scores - neg_scores) + 1e-10))
+    # bf16 autocast 중에도 loss는 float32로 계산
+    return -torch.mean(torch.log(torch.sigmoid(pos_scores.float() - neg_scores.float()) + 1e-10))
 
-def train_model(model, train_loader, val_loader, edges_index, edges_weights, edges_type, num_epochs=10, lr=0.0002, weight_decay=1e-5):
-    device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
-    torch.manual_seed(123)
+def autocast(device, precision="fp32"):
+    """
+    precision='bf16'이면 RGCN 레이어(관계별 matmul, edge 메시지)와 MLP 헤드를 bfloat16으로 계산
+    파라미터와 optimizer 상태(master weight)는 float32 그대로이고
+    bfloat16은 float32와 지수 범위가 같아 fp16과 달리 loss scaling이 필요 없다
+    """
+    if precision == "bf16":
+        return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+def reset_peak_memory(device):
+    """다음 peak_memory_mb()가 지금부터의 최대값만 보도록 초기화 (epoch 시작 시 호출)"""
+    if device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(device)
+        return
+    try:
+        # Linux: 최대 RSS(VmHWM)를 현재 RSS로 되돌린다
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_memory_mb(device):
+    """
+    reset_peak_memory() 이후 최대 메모리 (MB) - CUDA는 최대 할당량, CPU는 /proc/self/status의 VmHWM
+    /proc이 없는 환경에서는 프로세스 전체 최대 RSS (epoch마다 초기화되지 않음)
+    """
+    if device.type == "cuda":
+        return torch.cuda.max_memory_allocated(device) / 2 ** 20
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def select_hard_negatives(model, x, user, num_neg_candidates=10, topk=5):
+    """
+    랜덤 후보 num_neg_candidates개 중 점수 상위 topk개에서 하나를 골라 hard negative로 사용
+    후보 점수는 선택에만 쓰므로 그래디언트 없이 계산
+    """
+    device = user.device
+    neg_candidates = torch.randint(0, 6498, (user.size(0), num_neg_candidates), device=device)
+
+    user_expand = user.unsqueeze(1).expand_as(neg_candidates)
+    user_flat = user_expand.reshape(-1)
+    neg_flat = neg_candidates.reshape(-1)
+
+    with torch.no_grad():
+        neg_scores = model.score(x.detach(), user_flat, neg_flat)
+    neg_scores = neg_scores.view(user.size(0), num_neg_candidates)
+
+    hard_neg_scores, hard_neg_indices = torch.topk(neg_scores, k=topk, dim=1)
+
+    rows = torch.arange(user.size(0), device=device)
+    random_idx = torch.randint(0, topk, (user.size(0),), device=device)
+    return neg_candidates[rows, hard_neg_indices[rows, random_idx]]
+
+def encode_full(model, edges_index, edges_weights, edges_type, graph=None):
+    """전체 그래프 인코딩 - graph(HeteroGraph)를 주면 edge 목록 대신 관계별 CSR 블록으로 (--with-compounds)"""
+    if graph is not None:
+        return model.encode_graph(graph)
+    return model.encode(edges_index, edges_type, edges_weights)
+
+def evaluate(model, loader, edges_index, edges_weights, edges_type, device, graph=None):
+    """(평균 BPR loss, 랭킹 정확도) - 그래프는 한 번만 인코딩"""
+    model.eval()
+    val_loss = 0
+    val_correct = 0
+    val_total = 0
     
-    model.to(device)
+    with torch.no_grad():
+        x = encode_full(model, edges_index, edges_weights, edges_type, graph)
+        for user, pos, neg in loader:
+            user = user.long()
+            pos = pos.long()
+            neg = neg.long()
+
+            user, pos, neg = user.to(device), pos.to(device), neg.to(device)
+
+            pos_output = model.score(x, user, pos)
+            neg_output = model.score(x, user, neg)
+            loss = bpr_loss(pos_output, neg_output)
+            
+            val_loss += loss.item() * pos.size(0)
+            # Calculate ranking accuracy for BPR
+            val_correct += (pos_output > neg_output).sum().item()  # Count correct rankings
+            val_total += pos.size(0)  # Total number of positive samples
     
-    edges_index = edges_index.to(device)
-    edges_weights = edges_weights.to(device)
-    edges_type = edges_type.to(device).long()
-    model.train()
+    return val_loss / val_total, val_correct / val_total
 
-    #criterion = bpr_loss()
-    optimizer = optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
-    early_stopping = EarlyStopping(patience=10, delta=0.001)
+def encode_eval(model, edges_index, edges_type, edges_weights, graph=None):
+    """학습 도중 전체 그래프 임베딩이 필요할 때 (miner 갱신) - dropout 없이 그래디언트 없이 인코딩하고 모드는 되돌린다"""
+    was_training = model.training
+    model.eval()
+    try:
+        with torch.no_grad():
+            return encode_full(model, edges_index, edges_weights, edges_type, graph)
+    finally:
+        model.train(was_training)
 
-    best_model = None
-    best_val_loss = float('inf')
+def start_epoch_from(checkpoints, resume, model, optimizer, early_stopping, scheduler=None, generator=None, dataset=None, miner=None, device=None):
+    """(시작 epoch, best val loss) - resume이면 checkpoints의 가장 최근 epoch 체크포인트에서 복원"""
+    if not resume:
+        return 0, float('inf')
+    return checkpoints.resume(model, optimizer, early_stopping, scheduler, generator=generator, dataset=dataset, miner=miner, map_location=device)
 
-    topk = 5
+def end_epoch(epoch, model, val_loader, edges_index, edges_weights, edges_type, device, optimizer, early_stopping, checkpoints, best_val_loss, scheduler=None, generator=None, dataset=None, miner=None, graph=None):
+    """
+    모든 학습 모드가 공유하는 epoch 마무리: 검증 -> best 모델 저장 -> early stopping -> epoch 체크포인트
+    (새 best val loss, 멈출지) 반환
+    """
+    avg_val_loss, val_acc = evaluate(model, val_loader, edges_index, edges_weights, edges_type, device, graph=graph)
+    print(f"[Validation] Loss: {avg_val_loss:.4f} | Accuracy: {val_acc:.4f}")
+
+    if avg_val_loss < best_val_loss:
+        best_val_loss = avg_val_loss
+        checkpoints.save_best(model)
+        print(f"Best model saved at epoch {epoch+1} with validation loss {best_val_loss:.4f}")
+
+    # Check Early Stopping
+    early_stopping(avg_val_loss)
+    checkpoints.save_epoch(epoch, model, optimizer, early_stopping, scheduler=scheduler, best_val_loss=best_val_loss, generator=generator, dataset=dataset, miner=miner)
+    if early_stopping.early_stop:
+        print("Early stopping triggered.")
+    return best_val_loss, early_stopping.early_stop
+
+def warmup_cosine(total_steps, warmup_steps, min_ratio=0.05):
+    """LambdaLR용 배율: warmup_steps 동안 선형 증가 후 min_ratio까지 cosine 감소"""
+    def lr_lambda(step):
+        if step < warmup_steps:
+            return (step + 1) / warmup_steps
+        progress = min(1.0, (step - warmup_steps) / max(1, total_steps - warmup_steps))
+        return min_ratio + (1 - min_ratio) * 0.5 * (1 + math.cos(math.pi * progress))
+    return lr_lambda
+
+def prepare_training(model, edges_index, edges_weights, edges_type, seed):
+    """세 학습 모드 공통 준비: 학습 RNG 시드, 모델 / 그래프를 device로 -> (device, edges_index, edges_weights, edges_type)"""
+    device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
+    torch.manual_seed(seed)
+    model.to(device)
+    return device, edges_index.to(device), edges_weights.to(device), edges_type.to(device).long()
 
-    print(f"Training on {device}")
-    for epoch in range(num_epochs):
+def run_epochs(model, train_loader, val_loader, edges_index, edges_weights, edges_type, device, optimizer, train_step, num_epochs, checkpoints, resume, scheduler=None, miner=None, resample_negatives=False, epoch_info=None, graph=None):
+    """
+    세 학습 모드가 공유하는 epoch 루프
+    resume 복원 -> epoch마다 (negative 재샘플링 -> 배치마다 train_step -> 학습 로그 -> end_epoch) -> 체크포인트 쓰기 대기
+
+    train_step   :   (user, pos, neg) long 텐서(CPU)로 optimizer 스텝 하나를 하고 (loss 합, 맞춘 수, triple 수) 반환
+    miner        :   있으면 스텝마다 miner.step()을 부르고 체크포인트에 상태를 저장
+    epoch_info   :   epoch 로그 끝에 붙일 모드별 문자열을 돌려주는 함수 (대배치 LR, 샘플링 부분 그래프 크기)
+    graph        :   검증 인코딩에 쓸 HeteroGraph (없으면 edge 목록)
+    """
+    early_stopping = EarlyStopping(patience=10, delta=0.001)
+    checkpoints = checkpoints or CheckpointManager()
+    start_epoch, best_val_loss = start_epoch_from(checkpoints, resume, model, optimizer, early_stopping, scheduler, generator=train_loader.generator, dataset=train_loader.dataset, miner=miner, device=device)
+
+    for epoch in range(start_epoch, num_epochs):
+        if resample_negatives:
+            train_loader.dataset.resample_negatives()
+        model.train()
+        reset_peak_memory(device)
+        epoch_start = time.perf_counter()
         total_loss = 0
         correct = 0
         total = 0
 
         for user, pos, neg in tqdm(train_loader, desc=f"Epoch {epoch+1}/{num_epochs}"):
-            user = user.long()   
-            pos = pos.long()   
-            neg = neg.long()
+            step_loss, step_correct, step_total = train_step(user.long(), pos.long(), neg.long())
+            if miner is not None:
+                miner.step()
 
-            user, pos, neg = user.to(device), pos.to(device), neg.to(device)
+            total_loss += step_loss
+            # Calculate ranking accuracy for BPR
+            correct += step_correct  # Count correct rankings
+            total += step_total  # Total number of positive samples
 
-            optimizer.zero_grad()
+        avg_loss = total_loss / total
+        acc = correct / total
+        epoch_time = time.perf_counter() - epoch_start
+        info = epoch_info() if epoch_info is not None else ""
+        print(f"[Epoch {epoch+1}] Loss: {avg_loss:.4f} | Accuracy: {acc:.4f} | Time: {epoch_time:.1f}s ({total / epoch_time:.0f} samples/s) | Peak memory: {peak_memory_mb(device):.0f} MB{info}")
+
+        best_val_loss, stop = end_epoch(epoch, model, val_loader, edges_index, edges_weights, edges_type, device, optimizer, early_stopping, checkpoints, best_val_loss, scheduler=scheduler, generator=train_loader.generator, dataset=train_loader.dataset, miner=miner, graph=graph)
+        if stop:
+            break
 
-            pos_output = model(user, pos, edges_index, edges_type, edges_weights)
+    # 백그라운드 쓰기가 끝나야 best_model.pth를 바로 로드할 수 있다
+    checkpoints.wait()
+
+def train_model(model, train_loader, val_loader, edges_index, edges_weights, edges_type, num_epochs=10, lr=0.0002, weight_decay=1e-5, miner=None, precision="fp32", checkpoints=None, resume=False, seed=123, resample_negatives=False, graph=None):
+    """
+    miner        :   HardNegativeMiner를 주면 랜덤 후보 대신 임베딩 nearest non-positive에서 hard negative를 뽑는다
+    precision    :   "bf16"이면 그래프 인코딩과 헤드를 bfloat16 autocast로 계산 (autocast() 참고, 검증은 float32)
+    checkpoints  :   CheckpointManager (없으면 ./model/checkpoint에 최근 3개 + best), epoch 체크포인트는 백그라운드로 쓴다
+    resume       :   True면 checkpoints의 가장 최근 epoch 체크포인트에서 이어서 학습
+    seed         :   학습 중 RNG 시드 (hard negative 후보, dropout), resume하면 체크포인트의 RNG 상태로 덮어쓴다
+    resample_negatives  :   True면 epoch 시작마다 train_loader.dataset.resample_negatives()로 랜덤 negative를 새로 뽑는다
+                            (샘플링 RNG는 epoch 체크포인트에 저장되어 resume해도 같은 triple)
+    graph        :   HeteroGraph를 주면 그래프 인코딩(학습 / 검증)을 edge 목록 대신 model.encode_graph()의 관계별 CSR 블록으로
+                     (--with-compounds, 관계 수는 model.num_relations)
+    """
+    device, edges_index, edges_weights, edges_type = prepare_training(model, edges_index, edges_weights, edges_type, seed)
 
-            num_neg_candidates = 10
-            neg_candidates = torch.randint(0, 6498, (user.size(0), num_neg_candidates), device=device)
+    #criterion = bpr_loss()
+    optimizer = optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
 
-            user_expand = user.unsqueeze(1).expand_as(neg_candidates)
-            user_flat = user_expand.reshape(-1)
-            neg_flat = neg_candidates.reshape(-1)
+    topk = 5
 
-            neg_scores = model(user_flat, neg_flat, edges_index, edges_type, edges_weights)
-            neg_scores = neg_scores.view(user.size(0), num_neg_candidates)
+    def train_step(user, pos, neg):
+        user, pos = user.to(device), pos.to(device)
 
-            hard_neg_scores, hard_neg_indices = torch.topk(neg_scores, k=topk, dim=1)
+        optimizer.zero_grad()
 
-            random_idx = torch.randint(0, topk, (user.size(0),), device=device)
-            hard_neg = neg_candidates[torch.arange(user.size(0)), hard_neg_indices[torch.arange(user.size(0)), random_idx]]
+        # 그래프 인코딩은 스텝당 한 번만 하고 positive / 후보 / hard negative 점수는 헤드만 통과
+        with autocast(device, precision):
+            x = encode_full(model, edges_index, edges_weights, edges_type, graph)
 
-            neg_output = model(user, hard_neg, edges_index, edges_type, edges_weights)
-            loss = bpr_loss(pos_output, neg_output)
-            #loss = criterion(output, label)
+            pos_output = model.score(x, user, pos)
+            hard_neg = miner.sample(user, x) if miner is not None else select_hard_negatives(model, x, user, topk=topk)
+            neg_output = model.score(x, user, hard_neg)
+        loss = bpr_loss(pos_output, neg_output)
+        #loss = criterion(output, label)
 
+        loss.backward()
+        optimizer.step()
+        return loss.item() * pos.size(0), (pos_output > neg_output).sum().item(), pos.size(0)
+
+    print(f"Training on {device} ({precision})")
+    run_epochs(model, train_loader, val_loader, edges_index, edges_weights, edges_type, device, optimizer, train_step, num_epochs, checkpoints, resume,
+               miner=miner, resample_negatives=resample_negatives, graph=graph)
+
+def train_model_large_batch(model, train_loader, val_loader, edges_index, edges_weights, edges_type, num_epochs=50, lr=0.002, weight_decay=1e-5, chunk_size=1024, warmup_epochs=2, miner=None, precision="fp32", checkpoints=None, resume=False, seed=123, resample_negatives=False, graph=None):
+    """
+    대배치 학습: train_loader의 배치 하나(수천 개 BPR triple)가 optimizer 스텝 하나
+    그래프는 스텝당 한 번만 인코딩하고, 헤드는 chunk_size씩 나눠 떼어낸 임베딩에 그래디언트를 누적한 뒤
+    누적된 임베딩 그래디언트로 GNN을 한 번만 역전파한다
+    학습률은 warmup_epochs 동안 선형 증가 후 cosine 감소
+    miner를 주면 hard negative를 임베딩 nearest non-positive에서 뽑는다 (train_model과 같음)
+    precision="bf16"이면 bfloat16 autocast, checkpoints / resume / seed / resample_negatives / graph도 train_model과 같음 (scheduler 상태 포함)
+    """
+    device, edges_index, edges_weights, edges_type = prepare_training(model, edges_index, edges_weights, edges_type, seed)
+
+    optimizer = optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
+    total_steps = num_epochs * len(train_loader)
+    scheduler = LambdaLR(optimizer, warmup_cosine(total_steps, warmup_epochs * len(train_loader)))
+
+    topk = 5
+
+    def train_step(user, pos, neg):
+        user, pos = user.to(device), pos.to(device)
+        batch_size = user.size(0)
+        total_loss = 0
+        correct = 0
+
+        optimizer.zero_grad()
+
+        with autocast(device, precision):
+            x = encode_full(model, edges_index, edges_weights, edges_type, graph)
+        x_head = x.detach().requires_grad_()
+
+        for start in range(0, batch_size, chunk_size):
+            u = user[start:start + chunk_size]
+            p = pos[start:start + chunk_size]
+
+            with autocast(device, precision):
+                pos_output = model.score(x_head, u, p)
+                hard_neg = miner.sample(u, x_head) if miner is not None else select_hard_negatives(model, x_head, u, topk=topk)
+                neg_output = model.score(x_head, u, hard_neg)
+
+            # 청크 손실을 전체 배치 평균이 되도록 가중
+            loss = bpr_loss(pos_output, neg_output) * (u.size(0) / batch_size)
             loss.backward()
-            optimizer.step()
 
-            total_loss += loss.item() * pos.size(0)
-            # Calculate ranking accuracy for BPR
-            correct += (pos_output > neg_output).sum().item()  # Count correct rankings
-            total += pos.size(0)  # Total number of positive samples
+            total_loss += loss.item() * batch_size
+            correct += (pos_output > neg_output).sum().item()
 
-        avg_loss = total_loss / total
-        acc = correct / total
-        print(f"[Epoch {epoch+1}] Loss: {avg_loss:.4f} | Accuracy: {acc:.4f}")
-        
-        # Validation
-        model.eval()
-        val_loss = 0
-        val_correct = 0
-        val_total = 0
-        
-        with torch.no_grad():
-            for user, pos, neg in val_loader:
-                user = user.long()
-                pos = pos.long()
-                neg = neg.long()
-
-                user, pos, neg = user.to(device), pos.to(device), neg.to(device)
-
-                pos_output = model(user, pos, edges_index, edges_type, edges_weights)
-                neg_output = model(user, neg, edges_index, edges_type, edges_weights)
-                loss = bpr_loss(pos_output, neg_output)
-                
-                # loss = criterion(output, label)
-                
-                val_loss += loss.item() * pos.size(0)
-                # Calculate ranking accuracy for BPR
-                val_correct += (pos_output > neg_output).sum().item()  # Count correct rankings
-                val_total += pos.size(0)  # Total number of positive samples
-        
-        avg_val_loss = val_loss / val_total
-        val_acc = val_correct / val_total
-        
-        print(f"[Validation] Loss: {avg_val_loss:.4f} | Accuracy: {val_acc:.4f}")
-        torch.save(model.state_dict(), f"./model/checkpoint/epoch_{epoch}.pth")
-        
-        if avg_val_loss < best_val_loss:
-            best_val_loss = avg_val_loss
-            best_model = model.state_dict()
-            print(f"Best model saved at epoch {epoch+1} with validation loss {best_val_loss:.4f}")
-            
-        # Check Early Stopping
-        early_stopping(avg_val_loss)
-        if early_stopping.early_stop:
-            print("Early stopping triggered.")
-            torch.save(best_model, "./model/checkpoint/best_model.pth")
-            break
+        x.backward(x_head.grad)
+        optimizer.step()
+        scheduler.step()
+        return total_loss, correct, batch_size
+
+    print(f"Training on {device} ({train_loader.batch_size} triples/step, head chunks of {chunk_size}, {precision})")
+    run_epochs(model, train_loader, val_loader, edges_index, edges_weights, edges_type, device, optimizer, train_step, num_epochs, checkpoints, resume,
+               scheduler=scheduler, miner=miner, resample_negatives=resample_negatives, graph=graph,
+               epoch_info=lambda: f" | LR: {scheduler.get_last_lr()[0]:.6f}")
+
+def train_model_sampled(model, train_loader, val_loader, edges_index, edges_weights, edges_type, num_epochs=10, lr=0.0002, weight_decay=1e-5, fanouts=(10, 10, 10), miner=None, precision="fp32", checkpoints=None, resume=False, seed=123, resample_negatives=False, graph=None):
+    """
+    이웃 샘플링 학습: 배치의 술 / positive / negative 노드를 seed로 fanouts만큼 k-hop 부분 그래프를 뽑아
+    그 부분 그래프에서만 RGCN을 돌린다 (스텝 비용이 전체 그래프 크기와 무관)
+    negative는 데이터셋의 negative를 그대로 쓴다 (다른 모드처럼 모델 점수로 고르지 않음, resample_negatives가 없으면 데이터셋 생성 시점에 고정)
+    miner를 주면 refresh_every 스텝마다 전체 그래프 임베딩으로 목록을 갱신해서 거기서 뽑는다
+    검증은 전체 그래프로 한 번 인코딩
+    precision="bf16"이면 bfloat16 autocast, checkpoints / resume / seed / resample_negatives도 train_model과 같음
+    graph(HeteroGraph)를 주면 검증과 miner 갱신의 전체 그래프 인코딩만 관계별 블록으로 (스텝은 edges에서 뽑은 부분 그래프)
+    """
+    # 샘플링은 CPU에서, 부분 그래프만 device로
+    sampler = NeighborSampler(edges_index, edges_type.long(), edges_weights, num_nodes=model.num_nodes, fanouts=fanouts)
+
+    device, edges_index, edges_weights, edges_type = prepare_training(model, edges_index, edges_weights, edges_type, seed)
+
+    optimizer = optim.Adam(model.parameters(), lr=lr, weight_decay=weight_decay)
+
+    subgraph_size = [0, 0]  # epoch 동안 부분 그래프 노드 / edge 수 합
+
+    def train_step(user, pos, neg):
+        if miner is not None:
+            if miner.needs_refresh():
+                miner.refresh(encode_eval(model, edges_index, edges_type, edges_weights, graph))
+            neg = miner.sample(user.to(device)).cpu()
+
+        sub = sampler.sample(torch.cat([user, pos, neg]))
+
+        optimizer.zero_grad()
+
+        # 부분 그래프의 로컬 인덱스로 헤드 통과
+        u, p, n = sub.local(user).to(device), sub.local(pos).to(device), sub.local(neg).to(device)
+        with autocast(device, precision):
+            x = model.encode(sub.edge_index.to(device), sub.edge_type.to(device),
+                             sub.edge_weight.to(device) if sub.edge_weight is not None else None,
+                             n_id=sub.n_id.to(device))
+
+            pos_output = model.score(x, u, p)
+            neg_output = model.score(x, u, n)
+        loss = bpr_loss(pos_output, neg_output)
+
+        loss.backward()
+        optimizer.step()
+
+        subgraph_size[0] += len(sub.n_id)
+        subgraph_size[1] += sub.edge_index.size(1)
+        return loss.item() * pos.size(0), (pos_output > neg_output).sum().item(), pos.size(0)
+
+    def epoch_info():
+        steps = len(train_loader)
+        nodes, edges = subgraph_size
+        subgraph_size[:] = [0, 0]
+        return f" | Subgraph: {nodes / steps:.0f} nodes, {edges / steps:.0f} edges"
+
+    print(f"Training on {device} (neighbor sampling, fanouts {list(fanouts)}, {precision})")
+    run_epochs(model, train_loader, val_loader, edges_index, edges_weights, edges_type, device, optimizer, train_step, num_epochs, checkpoints, resume,
+               miner=miner, resample_negatives=resample_negatives, epoch_info=epoch_info, graph=graph)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train the NeuralCF pairing model')
+    parser.add_argument('--mode', type=str, default='minibatch', choices=['minibatch', 'large-batch', 'sampled'], help='minibatch: one step per 64 triples, large-batch: one graph encode per thousands of triples, sampled: k-hop neighbor-sampled subgraph per batch, scored against the dataset negatives (drawn once at startup unless --resample-negatives or --negatives knn)')
+    parser.add_argument('--epochs', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=64, help='Triples per step in minibatch mode')
+    parser.add_argument('--triples-per-step', type=int, default=4096, help='Triples per step in large-batch mode')
+    parser.add_argument('--chunk-size', type=int, default=1024, help='Head chunk size for gradient accumulation in large-batch mode')
+    parser.add_argument('--lr', type=float, default=None, help='Learning rate (default 0.0002, scaled by sqrt(triples-per-step / 64) in large-batch mode)')
+    parser.add_argument('--warmup-epochs', type=int, default=2, help='Linear warmup epochs in large-batch mode')
+    parser.add_argument('--negatives', type=str, default='candidates', choices=['candidates', 'knn'], help='candidates: top-scored of 10 random candidates (minibatch / large-batch only, sampled mode uses the dataset negatives instead), knn: nearest non-positive ingredients in embedding space (all modes)')
+    parser.add_argument('--resample-negatives', action='store_true', help="Redraw the dataset's random negatives (and the positives paired with hard negatives) at the start of every epoch")
+    parser.add_argument('--miner-refresh', type=int, default=100, help='Optimizer steps between kNN negative index refreshes')
+    parser.add_argument('--miner-neighbors', type=int, default=50, help='Nearest non-positive ingredients kept per liquor')
+    parser.add_argument('--fanouts', type=str, default='10,10,10', help='Incoming edges sampled per node at each hop in sampled mode (-1 = all)')
+    parser.add_argument('--with-compounds', action='store_true', help='Keep ingr-fcomp / ingr-dcomp edges (both directions) as relation 2 (num_relations=3), full-graph encodes use per-relation CSR blocks')
+    parser.add_argument('--keep-last', type=int, default=3, help='Epoch checkpoints to keep (best_model.pth is always kept)')
+    parser.add_argument('--resume', action='store_true', help='Continue from the most recent epoch checkpoint in ./model/checkpoint')
+    parser.add_argument('--seed', type=int, default=123, help='Seed for BPR negative sampling and model initialization (keep it fixed when resuming)')
+    parser.add_argument('--precision', type=str, default='fp32', choices=['fp32', 'bf16'], help='bf16: bfloat16 autocast for the RGCN layers and MLP head (float32 master weights, validation in float32)')
+    args = parser.parse_args()
+
     #set_seed()
 
     print("Loading data...")
-    mapping = map_graph_nodes()
+    graph = load_graph()
+    mapping = graph.nodes_map()
     
     lid_to_idx = mapping['liquor']
     iid_to_idx = mapping['ingredient']
@@ -173,7 +439,16 @@ if __name__ == "__main__":
         'ingr-dcomp': 2
     }
     
-    edges_indexes, edges_weights, edges_type = edges_index(edge_type_map)
+    store = None
+    if args.with_compounds:
+        # compound edge는 역방향(compound -> 재료/술)까지 relation 2로 (model/graph_store.py)
+        # 전체 그래프 인코딩은 관계별 CSR 블록(store)으로, edge 목록은 이웃 샘플링 / 시각화용
+        num_relations = 3
+        store = HeteroGraph(graph, edge_type_map)
+        edges_indexes, edges_weights, edges_type = store.edges(num_relations)
+    else:
+        num_relations = 2
+        edges_indexes, edges_weights, edges_type = graph.edges(edge_type_map, skip_types=COMPOUND_EDGE_TYPES)
     
     print("Loading dataset...")
     positive_pairs = pd.read_csv("./liquor_good_ingredients.csv")
@@ -199,21 +474,40 @@ if __name__ == "__main__":
     train_val_pairs, test_pairs = train_test_split(positive_pairs, test_size=0.2, random_state=42)
     train_pairs, val_pairs = train_test_split(train_val_pairs, test_size=0.2, random_state=42)
     
-    train_dataset = BPRDataset(positive_pairs=train_pairs, hard_negatives=negative_pairs, num_users=155, num_items=6498)
-    val_dataset = BPRDataset(positive_pairs=val_pairs, hard_negatives=negative_pairs, num_users=155, num_items=6498)
-    test_dataset = BPRDataset(positive_pairs=test_pairs, hard_negatives=negative_pairs, num_users=155, num_items=6498)
+    # negative 샘플링 시드를 고정해야 --resume 때 같은 triple로 이어진다 (seed는 모델 초기화, 셔플, 학습 RNG에도 사용)
+    train_dataset = BPRDataset(positive_pairs=train_pairs, hard_negatives=negative_pairs, num_users=155, num_items=6498, seed=args.seed)
+    val_dataset = BPRDataset(positive_pairs=val_pairs, hard_negatives=negative_pairs, num_users=155, num_items=6498, seed=args.seed + 1)
+    test_dataset = BPRDataset(positive_pairs=test_pairs, hard_negatives=negative_pairs, num_users=155, num_items=6498, seed=args.seed + 2)
     
-    train_loader = DataLoader(train_dataset, batch_size=64, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=64, shuffle=False)
-    test_loader = DataLoader(test_dataset, batch_size=64, shuffle=False)
+    train_batch_size = args.triples_per_step if args.mode == 'large-batch' else args.batch_size
+    # 배치마다 텐서를 인덱스 슬라이스로 가져오고, 학습 중에는 다음 배치를 미리 준비
+    # 셔플 순서를 전역 RNG와 분리해 두어야 (prefetch 스레드) --resume이 같은 순서로 이어진다
+    train_loader = BatchLoader(train_dataset, batch_size=train_batch_size, shuffle=True, pin_memory=True, prefetch=2, generator=torch.Generator().manual_seed(args.seed))
+    val_loader = BatchLoader(val_dataset, batch_size=64)
+    test_loader = BatchLoader(test_dataset, batch_size=64)
     
     torch.save(test_dataset, "test_dataset.pt")
 
     print("Creating model...")
-    model = NeuralCF(num_users=155, num_items=6498, emb_size=128)
+    torch.manual_seed(args.seed)
+    model = NeuralCF(num_users=155, num_items=6498, num_relations=num_relations, emb_size=128)
+
+    miner = None
+    if args.negatives == 'knn':
+        miner = HardNegativeMiner.from_dataset(train_dataset, list(iid_to_idx.values()), refresh_every=args.miner_refresh, num_neighbors=args.miner_neighbors)
+
+    checkpoints = CheckpointManager("./model/checkpoint", keep_last=args.keep_last)
 
     print("Training model...")
-    train_model(model=model, train_loader=train_loader, val_loader=val_loader, edges_type=edges_type, edges_index=edges_indexes, edges_weights=edges_weights, num_epochs=200)
+    if args.mode == 'large-batch':
+        # 배치가 커진 만큼 학습률은 제곱근 비율로 키운다
+        lr = args.lr if args.lr is not None else 0.0002 * math.sqrt(args.triples_per_step / 64)
+        train_model_large_batch(model=model, train_loader=train_loader, val_loader=val_loader, edges_type=edges_type, edges_index=edges_indexes, edges_weights=edges_weights, num_epochs=args.epochs, lr=lr, chunk_size=args.chunk_size, warmup_epochs=args.warmup_epochs, miner=miner, precision=args.precision, checkpoints=checkpoints, resume=args.resume, seed=args.seed, resample_negatives=args.resample_negatives, graph=store)
+    elif args.mode == 'sampled':
+        fanouts = [int(f) for f in args.fanouts.split(',')]
+        train_model_sampled(model=model, train_loader=train_loader, val_loader=val_loader, edges_type=edges_type, edges_index=edges_indexes, edges_weights=edges_weights, num_epochs=args.epochs, lr=args.lr if args.lr is not None else 0.0002, fanouts=fanouts, miner=miner, precision=args.precision, checkpoints=checkpoints, resume=args.resume, seed=args.seed, resample_negatives=args.resample_negatives, graph=store)
+    else:
+        train_model(model=model, train_loader=train_loader, val_loader=val_loader, edges_type=edges_type, edges_index=edges_indexes, edges_weights=edges_weights, num_epochs=args.epochs, lr=args.lr if args.lr is not None else 0.0002, miner=miner, precision=args.precision, checkpoints=checkpoints, resume=args.resume, seed=args.seed, resample_negatives=args.resample_negatives, graph=store)
 
     model.load_state_dict(torch.load("./model/checkpoint/best_model.pth"))
     test_visualization(model, test_loader,edges_indexes, edges_weights, edges_type)
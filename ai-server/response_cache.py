@@ -0,0 +1,185 @@
+"""
+API 응답 캐시
+
+인기 있는 술 몇십 개에 요청이 몰리므로 predict 점수와 추천 목록을 캐시한다.
+키 맨 앞에 체크포인트 해시를 넣어서, 체크포인트가 바뀌면 예전 항목은 다시 조회되지 않고
+invalidate()로 한 번에 지운다.
+
+프로세스 안에서는 TTL이 있는 LRU, 선택적으로 sqlite 파일을 두 번째 단계로 둬서
+여러 uvicorn 워커가 같은 캐시를 공유할 수 있다.
+sqlite 단계는 잠금을 기다릴 수 있으므로 비동기 핸들러에서는 get_local/set_local만 루프에서 부르고
+get_shared/set_shared/invalidate는 스레드 풀에서 실행한다.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(*parts):
+    """(checkpoint_hash, 종류, ...) -> 문자열 키"""
+    return "|".join(str(p) for p in parts)
+
+
+class SqliteCache:
+    """
+    여러 프로세스가 공유하는 sqlite 키-값 저장소 (값은 JSON)
+    path  :   db 파일 경로
+    ttl   :   항목 유지 시간(초)
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def _conn(self):
+        # sqlite 연결은 스레드마다 따로
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + self.ttl),
+        )
+
+    def invalidate(self, prefix=None):
+        conn = self._conn()
+        if prefix is None:
+            conn.execute("DELETE FROM cache")
+        else:
+            conn.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+        conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+
+class ResponseCache:
+    """
+    TTL이 있는 LRU 캐시
+    max_entries  :   프로세스 안에 둘 최대 항목 수 (넘으면 가장 오래 안 쓴 항목부터 제거)
+    ttl          :   항목 유지 시간(초)
+    shared       :   SqliteCache 등 공유 저장소 (없으면 None)
+    """
+
+    def __init__(self, max_entries=10000, ttl=300.0, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()  # key -> (만료 시각, 값)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_errors = 0
+
+    def get(self, key):
+        value = self.get_local(key)
+        if value is None and self.shared is not None:
+            value = self.get_shared(key)
+        return value
+
+    def get_local(self, key):
+        """프로세스 안 LRU만 조회 (블로킹 없음)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+            if self.shared is None:
+                self.misses += 1
+        return None
+
+    def get_shared(self, key):
+        """공유 저장소 조회, 있으면 LRU에도 넣는다 (sqlite 잠금을 기다릴 수 있음)"""
+        value = None
+        try:
+            value = self.shared.get(key)
+        except sqlite3.Error:
+            self._count_shared_error()
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self._put(key, value, time.monotonic())
+        return value
+
+    def set(self, key, value):
+        self.set_local(key, value)
+        if self.shared is not None:
+            self.set_shared(key, value)
+
+    def set_local(self, key, value):
+        with self._lock:
+            self._put(key, value, time.monotonic())
+
+    def set_shared(self, key, value):
+        try:
+            self.shared.set(key, value)
+        except sqlite3.Error:
+            self._count_shared_error()
+
+    def _count_shared_error(self):
+        # 여러 추론/캐시 스레드에서 호출되므로 다른 카운터처럼 잠금 안에서
+        with self._lock:
+            self.shared_errors += 1
+
+    def _put(self, key, value, now):
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, version=None):
+        """version(체크포인트 해시)으로 시작하는 항목 제거, None이면 전부"""
+        prefix = None if version is None else make_key(version, "")
+        with self._lock:
+            if prefix is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k.startswith(prefix)]:
+                    del self._entries[key]
+        if self.shared is not None:
+            try:
+                self.shared.invalidate(prefix)
+            except sqlite3.Error:
+                self._count_shared_error()
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "shared_errors": self.shared_errors,
+            "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            "shared": self.shared.path if self.shared is not None else None,
+        }
@@ -0,0 +1,193 @@
+"""
+API 추론 실행기
+
+torch 연산은 이벤트 루프를 막으므로 전용 스레드 풀에서 실행한다.
+동시에 실행되는 추론 수와 대기열 길이를 제한해서, 포화 상태면 바로 503을 돌려주고
+제한 시간을 넘긴 요청은 504로 끊는다. /health 같은 가벼운 엔드포인트는 루프에서 바로 응답한다.
+MicroBatcher는 동시에 들어온 /predict 요청을 모아 한 번의 배치 평가로 처리한다.
+"""
+import asyncio
+import bisect
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+
+class ExecutorSaturated(Exception):
+    """대기열이 가득 차서 요청을 받을 수 없음"""
+
+
+class InferenceExecutor:
+    """
+    max_workers    :   동시에 실행할 추론 수 (스레드 수)
+    max_queue      :   실행 중 + 대기 중인 추론 상한 (넘으면 ExecutorSaturated)
+    timeout        :   요청당 제한 시간(초), None이면 무제한 (넘으면 asyncio.TimeoutError)
+    torch_threads  :   torch intra-op 스레드 수, None이면 CPU 코어를 워커 수로 나눈 값
+    """
+
+    def __init__(self, max_workers=2, max_queue=64, timeout=10.0, torch_threads=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        # 워커마다 torch가 전체 코어를 쓰면 서로 경합하므로 코어를 나눠 쓴다
+        if torch_threads is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // max_workers)
+        self.torch_threads = torch_threads
+        torch.set_num_threads(torch_threads)
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs)를 풀에서 실행하고 결과를 기다린다"""
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(f"Inference queue is full ({self._pending} pending)")
+            self._pending += 1
+
+        # 제한 시간이 지나도 이미 실행 중인 스레드는 끝까지 돌기 때문에
+        # 슬롯은 await가 아니라 실제 작업이 끝날 때 반환한다
+        future = self._pool.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "torch_threads": self.torch_threads,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class Histogram:
+    """
+    고정 버킷 히스토그램 (값 <= 상한인 첫 버킷에 센다, 마지막은 +Inf)
+    buckets  :   오름차순 버킷 상한
+    """
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"{b:g}" for b in self.buckets] + ["+Inf"]
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.count,
+                "sum": self.sum,
+                "mean": self.sum / self.count if self.count else 0.0,
+            }
+
+
+class MicroBatcher:
+    """
+    동시에 들어온 요청을 잠깐 모아 한 번에 계산하는 스케줄러
+
+    첫 요청이 들어오고 max_wait초가 지나거나 max_batch개가 모이면 batch_fn(items)를
+    run(예: InferenceExecutor.run)으로 실행하고 결과를 요청마다 나눠 돌려준다.
+    batch_fn은 items와 같은 길이의 결과 리스트를 반환해야 한다.
+    이벤트 루프 안에서만 호출한다.
+    """
+
+    WAIT_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+    def __init__(self, batch_fn, run, max_batch=64, max_wait=0.002):
+        self.batch_fn = batch_fn
+        self.run = run
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self.batch_sizes = Histogram([2 ** i for i in range(max(1, max_batch - 1).bit_length() + 1)])
+        self.wait_ms = Histogram(self.WAIT_BUCKETS_MS)
+
+        # (item, future, 들어온 시각)
+        self._queue = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((item, future, time.perf_counter()))
+
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._queue = self._queue, []
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for _, _, enqueued in batch:
+            self.wait_ms.observe((now - enqueued) * 1000)
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        try:
+            results = await self.run(self.batch_fn, [item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            # 기다리던 핸들러가 이미 취소된 경우
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batch_size": self.batch_sizes.snapshot(),
+            "wait_ms": self.wait_ms.snapshot(),
+        }
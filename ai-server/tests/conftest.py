@@ -0,0 +1,73 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# model/*.py는 서로 flat import (from dataset import ...)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "model"))
+sys.path.insert(0, ROOT)
+
+EDGE_TYPE_MAP = {
+    'liqr-ingr': 0,
+    'ingr-ingr': 1,
+    'liqr-liqr': 1,
+    'ingr-fcomp': 2,
+    'ingr-dcomp': 2
+}
+
+
+def write_graph_csvs(directory, num_liquors=6, num_ingredients=20, num_compounds=5, num_edges=120, seed=0):
+    """
+    nodes / edges CSV와 같은 형식의 작은 그래프
+    node_id는 행 순서와 다르게 섞고, score는 일부 비워 둔다 (CSV처럼 0.1로 채워지는지)
+    """
+    rng = np.random.default_rng(seed)
+    types = ["liquor"] * num_liquors + ["ingredient"] * num_ingredients + ["compound"] * num_compounds
+    node_ids = rng.permutation(3 * len(types))[:len(types)] + 10
+    nodes = pd.DataFrame({
+        "node_id": node_ids,
+        "name": [f"{t}_{i}" for i, t in enumerate(types)],
+        "id": "",
+        "node_type": types,
+        "is_hub": "no_hub",
+    })
+
+    liquors = node_ids[:num_liquors]
+    ingredients = node_ids[num_liquors:num_liquors + num_ingredients]
+    compounds = node_ids[num_liquors + num_ingredients:]
+    rows = []
+    for _ in range(num_edges):
+        kind = rng.choice(["liqr-ingr", "ingr-ingr", "liqr-liqr", "ingr-fcomp"])
+        if kind == "liqr-ingr":
+            pair = (rng.choice(liquors), rng.choice(ingredients))
+        elif kind == "ingr-ingr":
+            pair = tuple(rng.choice(ingredients, 2, replace=False))
+        elif kind == "liqr-liqr":
+            pair = tuple(rng.choice(liquors, 2, replace=False))
+        else:
+            pair = (rng.choice(ingredients), rng.choice(compounds))
+        if rng.random() < 0.5:
+            pair = pair[::-1]
+        score = np.nan if kind == "ingr-fcomp" or rng.random() < 0.2 else float(rng.random())
+        rows.append((int(pair[0]), int(pair[1]), score, kind))
+    edges = pd.DataFrame(rows, columns=["id_1", "id_2", "score", "edge_type"])
+
+    nodes_csv = os.path.join(directory, "nodes.csv")
+    edges_csv = os.path.join(directory, "edges.csv")
+    nodes.to_csv(nodes_csv, index=False)
+    edges.to_csv(edges_csv, index=False)
+    return nodes_csv, edges_csv
+
+
+@pytest.fixture
+def graph_csvs(tmp_path, monkeypatch):
+    """작은 그래프 CSV, dataset 모듈의 기본 경로도 이 파일로 바꾼다"""
+    import dataset
+
+    nodes_csv, edges_csv = write_graph_csvs(str(tmp_path))
+    monkeypatch.setattr(dataset, "NODES_CSV", nodes_csv)
+    monkeypatch.setattr(dataset, "EDGES_CSV", edges_csv)
+    return nodes_csv, edges_csv
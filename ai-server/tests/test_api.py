@@ -0,0 +1,239 @@
+import asyncio
+import time
+
+import pytest
+import torch
+from fastapi.testclient import TestClient
+
+import api
+from models import NeuralCF
+from serving import InferenceExecutor, MicroBatcher
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def save_checkpoint(path, graph, seed):
+    torch.manual_seed(seed)
+    model = NeuralCF(num_users=6, num_items=20, num_nodes=graph.num_nodes, emb_size=16, hidden_layers=[16, 8])
+    torch.save(model.state_dict(), path)
+
+
+@pytest.fixture
+def serving(graph_csvs, tmp_path, monkeypatch):
+    """작은 그래프와 체크포인트로 startup과 같은 전역 상태 (모델 평가, 점수 행렬 없음)"""
+    graph = api.load_graph(str(tmp_path / "graph.bin"), *graph_csvs)
+    path = str(tmp_path / "best_model.pth")
+    save_checkpoint(path, graph, seed=0)
+
+    base = api.load_graph_state(graph)
+    executor = InferenceExecutor(max_workers=1, max_queue=8, timeout=10, torch_threads=torch.get_num_threads())
+    monkeypatch.setattr(api, "CHECKPOINT_PATH", path)
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(api, "RECOMMEND_TOP_N", 5)
+    monkeypatch.setattr(api, "base_edges", base.edges)
+    monkeypatch.setattr(api, "state", api.load_checkpoint(path, base))
+    monkeypatch.setattr(api, "executor", executor)
+    monkeypatch.setattr(api, "predict_batcher", None)
+    monkeypatch.setattr(api, "response_cache", None)
+    monkeypatch.setattr(api, "delta_log", None)
+    yield graph, path
+    executor.shutdown()
+
+
+def some_pair(current):
+    return next(iter(current.lid_to_idx)), next(iter(current.iid_to_idx))
+
+
+def test_graph_delta_keeps_in_flight_snapshot(serving):
+    before = api.state
+    liquor, ingredient = some_pair(before)
+    score = api.score_pair(before, liquor, ingredient)
+
+    request = api.GraphDeltaRequest(
+        nodes=[{"node_id": 900001, "node_type": "ingredient"}],
+        edges=[{"id_1": liquor, "id_2": 900001, "edge_type": "liqr-ingr", "score": 0.9}],
+    )
+    updated, result = api.apply_graph_delta(before, request)
+    api.install_graph_delta(updated, result)
+    assert api.state is updated
+    assert 900001 in updated.iid_to_idx and 900001 not in before.iid_to_idx
+    assert updated.edges[0].size(1) == before.edges[0].size(1) + 1
+
+    # 교체 전에 잡은 스냅샷은 이전 모델 / edge 그대로
+    assert api.score_pair(before, liquor, ingredient) == score
+    # 마이크로 배치에 두 스냅샷의 요청이 섞여도 각자 자기 state로 평가
+    scores = api.score_pair_batch([(before, liquor, ingredient), (updated, liquor, 900001), (before, liquor, ingredient)])
+    assert scores[0] == scores[2] == pytest.approx(score)
+    assert scores[1] == pytest.approx(api.score_pair(updated, liquor, 900001))
+
+
+def test_reload_swaps_whole_state(serving):
+    graph, path = serving
+    client = TestClient(api.app)
+    before = api.state
+    liquor, ingredient = some_pair(before)
+
+    assert client.post("/admin/reload", headers=ADMIN).json()["reloaded"] is False
+    assert api.state is before
+
+    save_checkpoint(path, graph, seed=1)
+    body = client.post("/admin/reload", headers=ADMIN).json()
+    assert body["reloaded"] is True
+    assert body["checkpoint"] == api.state.version == api.checkpoint_hash(path)
+    assert api.state.model is not before.model and api.state.lid_to_idx is before.lid_to_idx
+
+    response = client.post("/predict", json={"liquor_id": liquor, "ingredient_id": ingredient})
+    assert response.status_code == 200
+    assert response.json()["score"] == pytest.approx(api.score_pair(api.state, liquor, ingredient))
+    assert response.json()["score"] != pytest.approx(api.score_pair(before, liquor, ingredient))
+
+
+def test_delta_log_skips_bad_records(serving, tmp_path, monkeypatch):
+    from graph_delta_log import GraphDeltaLog
+
+    log = GraphDeltaLog(str(tmp_path / "deltas.jsonl"), "base")
+    monkeypatch.setattr(api, "delta_log", log)
+    monkeypatch.setattr(api, "delta_log_position", 0)
+    liquor, _ = some_pair(api.state)
+    with log.locked():
+        log.append({"nodes": [], "edges": [{"id_1": liquor, "id_2": 123456, "edge_type": "liqr-ingr"}]})
+        log.append({"nodes": [{"node_id": 900001, "node_type": "ingredient"}], "edges": []})
+    with open(log.path, "a") as f:
+        f.write("{not json\n")
+    with log.locked():
+        log.append({"nodes": [], "edges": [{"id_1": liquor, "id_2": 900001, "edge_type": "liqr-ingr", "score": 0.5}]})
+
+    # 없는 노드를 가리키는 기록과 깨진 줄은 건너뛰고 나머지는 순서대로 적용
+    assert asyncio.run(api.sync_graph_deltas()) == 2
+    assert api.delta_log_position == 4
+    assert len(api.state.deltas) == 2 and 900001 in api.state.iid_to_idx
+    assert asyncio.run(api.sync_graph_deltas()) == 0
+
+    # 검증에 실패한 delta는 로그에 남지 않는다
+    client = TestClient(api.app)
+    size = log.size()
+    bad = {"edges": [{"id_1": liquor, "id_2": 900001, "edge_type": "liqr-ingr", "score": "NaN"}]}
+    assert client.post("/admin/graph/delta", headers=ADMIN, json=bad).status_code == 400
+    assert log.size() == size and api.delta_log_position == 4
+    good = {"edges": [{"id_1": liquor, "id_2": 900001, "edge_type": "liqr-ingr", "score": 0.7}]}
+    assert client.post("/admin/graph/delta", headers=ADMIN, json=good).status_code == 200
+    assert len(log.read()) == 5 and api.delta_log_position == 5 and len(api.state.deltas) == 3
+
+
+def test_compound_checkpoint_uses_relation_blocks(serving, tmp_path, monkeypatch):
+    graph, _ = serving
+    from model.graph_store import HeteroGraph
+
+    torch.manual_seed(2)
+    model = NeuralCF(num_users=6, num_items=20, num_nodes=graph.num_nodes, num_relations=3, emb_size=16, hidden_layers=[16, 8])
+    path = str(tmp_path / "compounds.pth")
+    torch.save(model.state_dict(), path)
+    store = HeteroGraph(graph, api.EDGE_TYPE_MAP)
+    monkeypatch.setattr(api, "graph_store", store)
+
+    loaded = api.load_checkpoint(path, api.state)
+    liquor, ingredient = some_pair(loaded)
+    model.eval()
+    with torch.no_grad():
+        x = model.encode_graph(store)
+        expected = model.score(x, torch.tensor([loaded.lid_to_idx[liquor]]), torch.tensor([loaded.iid_to_idx[ingredient]])).item()
+    assert api.score_pair(loaded, liquor, ingredient) == pytest.approx(expected, abs=1e-6)
+
+    # IncrementalEncoder는 compound edge를 모르므로 delta는 거부
+    request = api.GraphDeltaRequest(nodes=[{"node_id": 900001, "node_type": "ingredient"}], edges=[])
+    with pytest.raises(ValueError, match="compound"):
+        api.apply_graph_delta(loaded, request)
+
+
+def test_predict_batch_reports_missing_ids_per_pair(serving):
+    client = TestClient(api.app)
+    current = api.state
+    liquors, ingredients = list(current.lid_to_idx)[:2], list(current.iid_to_idx)[:3]
+    pairs = [
+        {"liquor_id": liquors[0], "ingredient_id": ingredients[0]},
+        {"liquor_id": 999999, "ingredient_id": ingredients[1]},
+        {"liquor_id": liquors[1], "ingredient_id": -1},
+        # 술 id를 재료 자리에 (다른 종류의 노드)
+        {"liquor_id": liquors[1], "ingredient_id": liquors[0]},
+        {"liquor_id": liquors[1], "ingredient_id": ingredients[2]},
+        {"liquor_id": liquors[0], "ingredient_id": ingredients[0]},
+    ]
+
+    response = client.post("/predict/batch", json={"pairs": pairs})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(r["liquor_id"], r["ingredient_id"]) for r in results] == [(p["liquor_id"], p["ingredient_id"]) for p in pairs]
+
+    # 없는 id는 그 쌍만 error, 나머지는 /predict와 같은 점수
+    assert results[1]["score"] is None and results[1]["error"] == "Liquor ID 999999 not found"
+    assert results[2]["score"] is None and results[2]["error"] == "Ingredient ID -1 not found"
+    assert results[3]["score"] is None and results[3]["error"] == f"Ingredient ID {liquors[0]} not found"
+    for i in (0, 4, 5):
+        expected = api.score_pair(current, pairs[i]["liquor_id"], pairs[i]["ingredient_id"])
+        assert results[i]["error"] is None and results[i]["score"] == pytest.approx(expected, abs=1e-6)
+    assert results[0]["score"] == results[5]["score"]
+
+    assert client.post("/predict/batch", json={"pairs": []}).json() == {"results": []}
+
+
+def test_predict_batch_rejects_too_many_pairs(serving, monkeypatch):
+    client = TestClient(api.app)
+    monkeypatch.setattr(api, "MAX_BATCH_PAIRS", 3)
+    liquor, ingredient = some_pair(api.state)
+    pair = {"liquor_id": liquor, "ingredient_id": ingredient}
+
+    assert client.post("/predict/batch", json={"pairs": [pair] * 3}).status_code == 200
+    response = client.post("/predict/batch", json={"pairs": [pair] * 4})
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Too many pairs (4 > 3)"
+
+
+def test_saturated_executor_returns_503(serving, monkeypatch):
+    client = TestClient(api.app)
+    executor = InferenceExecutor(max_workers=1, max_queue=0, timeout=10, torch_threads=torch.get_num_threads())
+    monkeypatch.setattr(api, "executor", executor)
+    liquor, ingredient = some_pair(api.state)
+
+    assert client.post("/predict", json={"liquor_id": liquor, "ingredient_id": ingredient}).status_code == 503
+    pairs = {"pairs": [{"liquor_id": liquor, "ingredient_id": ingredient}]}
+    assert client.post("/predict/batch", json=pairs).status_code == 503
+    # /health는 추론 스레드 풀을 거치지 않는다
+    health = client.get("/health")
+    assert health.status_code == 200 and health.json()["inference"]["rejected"] == 2
+    executor.shutdown()
+
+
+def test_slow_inference_returns_504(serving, monkeypatch):
+    client = TestClient(api.app)
+    executor = InferenceExecutor(max_workers=1, max_queue=8, timeout=0.05, torch_threads=torch.get_num_threads())
+    monkeypatch.setattr(api, "executor", executor)
+    score_pair = api.score_pair
+    monkeypatch.setattr(api, "score_pair", lambda *args: time.sleep(0.5) or score_pair(*args))
+    liquor, ingredient = some_pair(api.state)
+
+    response = client.post("/predict", json={"liquor_id": liquor, "ingredient_id": ingredient})
+    assert response.status_code == 504
+    assert response.json()["detail"] == "Inference timed out after 0.05s"
+    assert executor.stats()["timed_out"] == 1
+    executor.shutdown()
+
+
+def test_concurrent_predicts_share_one_batch(serving, monkeypatch):
+    current = api.state
+    pairs = [(liquor, ingredient) for liquor in list(current.lid_to_idx)[:3] for ingredient in list(current.iid_to_idx)[:4]]
+    batches = []
+
+    def score_pair_batch(items):
+        batches.append(len(items))
+        return api.score_pair_batch(items)
+
+    monkeypatch.setattr(api, "predict_batcher", MicroBatcher(score_pair_batch, api.executor.run, max_batch=64, max_wait=0.05))
+
+    async def predict_all():
+        requests = [api.PairingRequest(liquor_id=l, ingredient_id=i) for l, i in pairs]
+        return await asyncio.gather(*(api.predict_pairing(r) for r in requests))
+
+    responses = asyncio.run(predict_all())
+    assert batches == [len(pairs)]
+    for (liquor, ingredient), response in zip(pairs, responses):
+        assert response.score == pytest.approx(api.score_pair(current, liquor, ingredient), abs=1e-6)
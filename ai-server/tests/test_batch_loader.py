@@ -0,0 +1,41 @@
+import pytest
+import torch
+
+from dataset import BatchLoader
+
+
+class TensorDataset:
+    def __init__(self, n=100, fail_at=None):
+        self.n = n
+        self.fail_at = fail_at
+
+    def __len__(self):
+        return self.n
+
+    def tensors(self):
+        users = torch.arange(self.n)
+        if self.fail_at is None:
+            return users, users * 2, users * 3
+        # fail_at 이후 인덱스는 두 번째 텐서에 없다 -> 그 인덱스가 든 배치를 만들 때 실패
+        return users, (users * 2)[:self.fail_at], users * 3
+
+
+def test_prefetch_matches_synchronous_batches():
+    dataset = TensorDataset()
+    plain = list(BatchLoader(dataset, batch_size=16, shuffle=True, generator=torch.Generator().manual_seed(0)))
+    prefetched = list(BatchLoader(dataset, batch_size=16, shuffle=True, prefetch=2, generator=torch.Generator().manual_seed(0)))
+    assert len(plain) == len(prefetched) == 7
+    for a, b in zip(plain, prefetched):
+        assert all(torch.equal(x, y) for x, y in zip(a, b))
+
+
+@pytest.mark.parametrize("prefetch", [0, 2])
+def test_data_errors_are_raised_not_truncated(prefetch):
+    loader = BatchLoader(TensorDataset(fail_at=90), batch_size=16, shuffle=True, prefetch=prefetch,
+                         generator=torch.Generator().manual_seed(0))
+    seen = []
+    with pytest.raises(IndexError):
+        for batch in loader:
+            seen.append(batch)
+    # 실패한 배치 전까지만 받고 에폭이 정상 종료된 것처럼 끝나지 않는다
+    assert len(seen) < len(loader)
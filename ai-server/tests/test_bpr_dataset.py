@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import torch
+
+from dataset import BatchLoader, BPRDataset
+
+
+def make_pairs(num_users=8, num_items=12, density=0.6, seed=0):
+    """술마다 재료의 density 비율이 positive인 (liquor_id, ingredient_id) 쌍, negative 후보가 적도록 빽빽하게"""
+    rng = np.random.default_rng(seed)
+    mask = rng.random((num_users, num_items)) < density
+    mask[np.arange(num_users), rng.integers(0, num_items, num_users)] = True
+    users, items = np.nonzero(mask)
+    return pd.DataFrame({"liquor_id": users, "ingredient_id": items}), mask
+
+
+def test_random_negatives_never_hit_positives():
+    pairs, mask = make_pairs()
+    hard = pd.DataFrame({"liquor_id": [0, 1, 1], "ingredient_id": [5, 6, 7]})
+    dataset = BPRDataset(pairs, hard, num_users=8, num_items=12, negative_ratio=5, seed=0)
+
+    num_random = len(pairs) * 5
+    for _ in range(5):
+        users, pos, neg = (t.numpy() for t in dataset.tensors())
+        assert mask[users, pos].all()
+        assert not mask[users[:num_random], neg[:num_random]].any()
+        assert ((neg >= 0) & (neg < 12)).all()
+        dataset.resample_negatives()
+
+
+def test_hard_negatives_are_paired_with_own_positive():
+    pairs, mask = make_pairs()
+    # 2번 술은 positive 없음 -> 제외, NaN 행도 제외
+    pairs = pairs[pairs["liquor_id"] != 2]
+    hard = pd.DataFrame({"liquor_id": [0, 2, 3, np.nan], "ingredient_id": [1, 1, 4, 5]})
+    dataset = BPRDataset(pairs, hard, num_users=8, num_items=12, negative_ratio=2, seed=1)
+
+    users, pos, neg = (t.numpy() for t in dataset.tensors())
+    hard_users, hard_pos, hard_neg = users[len(pairs) * 2:], pos[len(pairs) * 2:], neg[len(pairs) * 2:]
+    assert hard_users.tolist() == [0, 3]
+    assert hard_neg.tolist() == [1, 4]
+    assert mask[hard_users, hard_pos].all()
+
+
+def test_seeded_datasets_are_reproducible():
+    pairs, _ = make_pairs()
+    a = BPRDataset(pairs, num_users=8, num_items=12, seed=7)
+    b = BPRDataset(pairs, num_users=8, num_items=12, seed=7)
+    assert all(torch.equal(x, y) for x, y in zip(a.tensors(), b.tensors()))
+
+
+
+def test_resampled_epochs_change_and_skip_positives():
+    """train 루프처럼 epoch마다 resample_negatives() 후 BatchLoader로 다 읽으면 epoch마다 다른 negative"""
+    pairs, mask = make_pairs(num_users=8, num_items=40, density=0.3)
+    dataset = BPRDataset(pairs, num_users=8, num_items=40, negative_ratio=5, seed=0)
+    loader = BatchLoader(dataset, batch_size=16, shuffle=True, prefetch=2, generator=torch.Generator().manual_seed(0))
+
+    epochs = []
+    for _ in range(3):
+        dataset.resample_negatives()
+        users, pos, neg = (torch.cat(t).numpy() for t in zip(*loader))
+        assert not mask[users, neg].any()
+        # 셔플 순서와 무관하게 비교하도록 (user, pos) 기준 정렬
+        order = np.lexsort((neg, pos, users))
+        epochs.append(np.stack([users[order], pos[order], neg[order]]))
+
+    assert all(e.shape == epochs[0].shape for e in epochs)
+    assert not np.array_equal(epochs[0], epochs[1]) and not np.array_equal(epochs[1], epochs[2])
+
+
+def test_state_dict_restores_sampling_rng():
+    pairs, _ = make_pairs()
+    a = BPRDataset(pairs, num_users=8, num_items=12, seed=3)
+    a.resample_negatives()
+    state = a.state_dict()
+    a.resample_negatives()
+
+    # 새로 만든 데이터셋(resume)에 상태를 덮어쓰면 다음 resample이 같은 triple
+    b = BPRDataset(pairs, num_users=8, num_items=12, seed=3)
+    b.load_state_dict(state)
+    b.resample_negatives()
+    assert all(torch.equal(x, y) for x, y in zip(a.tensors(), b.tensors()))
@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from checkpointing import CheckpointManager, atomic_save
+from conftest import EDGE_TYPE_MAP, write_graph_csvs
+from dataset import BatchLoader, BPRDataset, load_graph
+from models import NeuralCF
+from negatives import HardNegativeMiner
+from train import train_model, train_model_sampled
+
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory):
+    # select_hard_negatives가 후보를 0~6497에서 뽑으므로 노드가 그보다 많아야 한다
+    directory = str(tmp_path_factory.mktemp("graph"))
+    graph = load_graph(os.path.join(directory, "graph.bin"), *write_graph_csvs(directory, num_ingredients=6600, num_edges=2000))
+    nodes = graph.nodes_map()
+    liquors, ingredients = list(nodes["liquor"].values()), list(nodes["ingredient"].values())
+    rng = np.random.default_rng(0)
+    pairs = pd.DataFrame({"liquor_id": rng.choice(liquors, 60), "ingredient_id": rng.choice(ingredients, 60)})
+    return graph, liquors, ingredients, pairs
+
+
+def run(graph, directory, num_epochs, resume=False, seed=7, train=train_model, miner_refresh=None, **kwargs):
+    """매번 새 모델 / 데이터셋 / 로더를 같은 시드로 만들어 train 실행 (중단 후 재시작과 같은 조건)"""
+    graph, liquors, ingredients, pairs = graph
+    edge_index, edge_weight, edge_type = graph.edges(EDGE_TYPE_MAP)
+    train_dataset = BPRDataset(pairs, num_users=len(liquors), num_items=graph.num_nodes, seed=0)
+    val_dataset = BPRDataset(pairs, num_users=len(liquors), num_items=graph.num_nodes, seed=1)
+    train_loader = BatchLoader(train_dataset, batch_size=32, shuffle=True, generator=torch.Generator().manual_seed(0))
+
+    torch.manual_seed(0)
+    model = NeuralCF(num_users=len(liquors), num_items=len(ingredients), num_relations=2, emb_size=16,
+                     hidden_layers=[16, 8], num_nodes=graph.num_nodes)
+    if miner_refresh is not None:
+        kwargs["miner"] = HardNegativeMiner.from_dataset(train_dataset, ingredients, refresh_every=miner_refresh, num_neighbors=5)
+    checkpoints = CheckpointManager(directory, keep_last=2)
+    train(model, train_loader, BatchLoader(val_dataset, batch_size=64), edge_index, edge_weight, edge_type,
+          num_epochs=num_epochs, checkpoints=checkpoints, resume=resume, seed=seed, **kwargs)
+    checkpoints.close()
+    return model
+
+
+def test_resume_matches_uninterrupted_run(graph, tmp_path):
+    full = run(graph, str(tmp_path / "full"), num_epochs=3)
+
+    # 1 epoch만 학습하고 "중단" -> 새 프로세스처럼 처음부터 만들어서 이어서 학습
+    run(graph, str(tmp_path / "resumed"), num_epochs=1)
+    resumed = run(graph, str(tmp_path / "resumed"), num_epochs=3, resume=True)
+
+    for name, value in full.state_dict().items():
+        torch.testing.assert_close(resumed.state_dict()[name], value, rtol=0, atol=1e-6, msg=name)
+
+    full_best = torch.load(tmp_path / "full" / "best_model.pth")
+    resumed_best = torch.load(tmp_path / "resumed" / "best_model.pth")
+    for name, value in full_best.items():
+        torch.testing.assert_close(resumed_best[name], value, rtol=0, atol=1e-6, msg=name)
+
+    # keep_last=2: 최근 두 epoch만 남고 임시 파일은 없다
+    for name in ("full", "resumed"):
+        assert sorted(os.listdir(tmp_path / name)) == ["best_model.pth", "epoch_1.pth", "epoch_2.pth"]
+
+
+def test_resume_with_resampled_negatives(graph, tmp_path, monkeypatch):
+    """sampled 모드는 데이터셋 negative를 그대로 쓰므로 epoch마다 새로 뽑은 negative와 그 RNG 상태가 결과에 반영된다"""
+    calls = []
+    resample = BPRDataset.resample_negatives
+    monkeypatch.setattr(BPRDataset, "resample_negatives", lambda self: calls.append(self) or resample(self))
+    options = dict(train=train_model_sampled, fanouts=(5, 5, 5), resample_negatives=True)
+
+    full = run(graph, str(tmp_path / "full"), num_epochs=3, **options)
+    # 생성 시 1번 + epoch마다 1번 (학습 데이터셋만)
+    assert len(calls) == 2 + 3
+
+    run(graph, str(tmp_path / "resumed"), num_epochs=1, **options)
+    resumed = run(graph, str(tmp_path / "resumed"), num_epochs=3, resume=True, **options)
+    for name, value in full.state_dict().items():
+        torch.testing.assert_close(resumed.state_dict()[name], value, rtol=0, atol=1e-6, msg=name)
+
+
+def test_resume_keeps_miner_schedule(graph, tmp_path):
+    """epoch(10스텝) 경계와 갱신 주기(3스텝)가 어긋나도 resume 후 같은 스텝에 같은 이웃 목록으로 갱신"""
+    full = run(graph, str(tmp_path / "full"), num_epochs=3, miner_refresh=3)
+
+    run(graph, str(tmp_path / "resumed"), num_epochs=1, miner_refresh=3)
+    state = torch.load(tmp_path / "resumed" / "epoch_0.pth", weights_only=False)["miner"]
+    assert state["steps"] == 10 and state["refreshes"] == 4 and state["neighbors"].shape == (6, 5)
+
+    resumed = run(graph, str(tmp_path / "resumed"), num_epochs=3, resume=True, miner_refresh=3)
+    for name, value in full.state_dict().items():
+        torch.testing.assert_close(resumed.state_dict()[name], value, rtol=0, atol=1e-6, msg=name)
+
+
+def test_seed_argument_drives_training_rng(graph, tmp_path):
+    """seed 인자가 학습 중 RNG(hard negative 후보, dropout)에 실제로 쓰이는지 (초기화 / 셔플은 같게)"""
+    a = run(graph, str(tmp_path / "a"), num_epochs=1, seed=7)
+    b = run(graph, str(tmp_path / "b"), num_epochs=1, seed=8)
+    assert any(not torch.equal(a.state_dict()[name], value) for name, value in b.state_dict().items())
+
+
+def test_atomic_save_leaves_no_temp_files(tmp_path):
+    path = str(tmp_path / "state.pth")
+    atomic_save({"x": torch.arange(3)}, path)
+    atomic_save({"x": torch.arange(4)}, path)
+    assert torch.load(path)["x"].tolist() == [0, 1, 2, 3]
+
+    # 저장이 실패하면 이전 파일은 그대로, 임시 파일은 지워진다
+    with pytest.raises(Exception):
+        atomic_save({"x": lambda: None}, path)
+    assert torch.load(path)["x"].tolist() == [0, 1, 2, 3]
+    assert os.listdir(tmp_path) == ["state.pth"]
@@ -0,0 +1,94 @@
+import pytest
+import torch
+
+from models import NeuralCF
+
+
+@pytest.fixture
+def model():
+    torch.manual_seed(0)
+    model = NeuralCF(num_users=5, num_items=40, num_relations=2, emb_size=16, hidden_layers=[16, 8], num_nodes=50).eval()
+    calls = []
+    encode = model.encode
+    model.encode = lambda *args, **kwargs: calls.append(1) or encode(*args, **kwargs)
+    model.encode_calls = calls
+    return model
+
+
+@pytest.fixture
+def edges():
+    generator = torch.Generator().manual_seed(0)
+    edge_index = torch.randint(0, 50, (2, 300), generator=generator)
+    edge_type = torch.randint(0, 2, (300,), generator=generator)
+    edge_weight = torch.rand(300, generator=generator)
+    return edge_index, edge_type, edge_weight
+
+
+def scores(model, edges):
+    users, items = torch.arange(5).repeat(4), torch.arange(5, 25)
+    return model(users, items, *edges)
+
+
+def test_cache_reused_only_in_inference(model, edges):
+    with torch.no_grad():
+        first = scores(model, edges)
+        torch.testing.assert_close(scores(model, edges), first, rtol=0, atol=0)
+    assert len(model.encode_calls) == 1
+
+    # 학습 중이거나 그래디언트가 필요하면 캐시 없이 매번 인코딩
+    scores(model, edges)
+    model.train()
+    with torch.no_grad():
+        scores(model, edges)
+    assert len(model.encode_calls) == 3
+
+
+def test_cache_invalidated_by_parameter_update(model, edges):
+    with torch.no_grad():
+        before = scores(model, edges)
+
+    # optimizer.step()은 파라미터를 in-place로 수정
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.5)
+    model.train()
+    scores(model, edges).sum().backward()
+    optimizer.step()
+    model.eval()
+    with torch.no_grad():
+        after_step = scores(model, edges)
+        model.encode_calls.clear()
+        x = model.encode(*edges)
+    assert not torch.allclose(after_step, before)
+    torch.testing.assert_close(after_step, model.score(x, torch.arange(5).repeat(4), torch.arange(5, 25)))
+
+    # 다른 체크포인트를 load_state_dict으로 덮어써도
+    torch.manual_seed(1)
+    other = NeuralCF(num_users=5, num_items=40, num_relations=2, emb_size=16, hidden_layers=[16, 8], num_nodes=50).eval()
+    model.load_state_dict(other.state_dict())
+    with torch.no_grad():
+        torch.testing.assert_close(scores(model, edges), scores(other, edges), rtol=0, atol=0)
+    assert len(model.encode_calls) == 2
+
+
+def test_cache_invalidated_by_graph_change(model, edges):
+    edge_index, edge_type, edge_weight = edges
+    with torch.no_grad():
+        before = scores(model, edges)
+        # 새 edge 텐서
+        changed = scores(model, (edge_index, edge_type, edge_weight * 2))
+        scores(model, edges)
+        # 캐시된 텐서를 그대로 in-place 수정
+        edge_weight.mul_(2)
+        in_place = scores(model, edges)
+    assert len(model.encode_calls) == 4
+    assert not torch.allclose(changed, before)
+    torch.testing.assert_close(in_place, changed, rtol=0, atol=0)
+
+
+def test_move_and_clear_drop_cache(model, edges):
+    with torch.no_grad():
+        scores(model, edges)
+        model.to(torch.float32)
+        scores(model, edges)
+        model.clear_embedding_cache()
+        scores(model, edges)
+    assert len(model.encode_calls) == 3
@@ -0,0 +1,57 @@
+import pytest
+import torch
+
+from export import build_scripted, check_scripted, load_scripted, save_scripted, source_checkpoint
+from models import NeuralCF
+from score_matrix import checkpoint_hash
+
+MAPPING = {
+    "liquor": {100 + i: i for i in range(4)},
+    "ingredient": {500 + i: 4 + i for i in range(20)},
+}
+
+
+def train_checkpoint(path, seed):
+    torch.manual_seed(seed)
+    model = NeuralCF(num_users=4, num_items=20, num_relations=2, emb_size=16, hidden_layers=[16, 8], num_nodes=24).eval()
+    torch.save(model.state_dict(), path)
+    return model
+
+
+def export(model, path, checkpoint):
+    generator = torch.Generator().manual_seed(0)
+    edges = (torch.randint(0, 24, (2, 100), generator=generator), torch.randint(0, 2, (100,), generator=generator), None)
+    with torch.no_grad():
+        x = model.encode(*edges)
+    save_scripted(build_scripted(model, x, MAPPING), path, checkpoint_hash=checkpoint_hash(checkpoint))
+    return load_scripted(path)
+
+
+def test_stale_scripted_export_is_rejected(tmp_path):
+    checkpoint = str(tmp_path / "best_model.pth")
+    path = str(tmp_path / "best_model.script.pt")
+    assert source_checkpoint(path) == checkpoint
+
+    scripted = export(train_checkpoint(checkpoint, seed=0), path, checkpoint)
+    check_scripted(path, scripted)
+
+    # export 이후 체크포인트를 다시 학습하면 stale
+    train_checkpoint(checkpoint, seed=1)
+    with pytest.raises(ValueError, match="is stale"):
+        check_scripted(path, load_scripted(path))
+
+    # 다시 export하면 통과
+    check_scripted(path, export(NeuralCF.from_state_dict(torch.load(checkpoint)).eval(), path, checkpoint))
+
+
+def test_check_scripted_with_explicit_or_missing_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / "run1.pth")
+    path = str(tmp_path / "serving.script.pt")
+    scripted = export(train_checkpoint(checkpoint, seed=0), path, checkpoint)
+
+    # 기본 경로(serving.pth)가 없으면 확인하지 않는다
+    check_scripted(path, scripted)
+    check_scripted(path, scripted, checkpoint_path=checkpoint)
+    train_checkpoint(checkpoint, seed=1)
+    with pytest.raises(ValueError, match="is stale"):
+        check_scripted(path, scripted, checkpoint_path=checkpoint)
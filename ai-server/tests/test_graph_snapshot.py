@@ -0,0 +1,74 @@
+import os
+
+import torch
+
+from conftest import EDGE_TYPE_MAP
+from dataset import (compile_graph_snapshot, edges_index, load_graph, load_graph_snapshot,
+                     map_graph_nodes)
+
+
+def test_snapshot_matches_csv_loaders(graph_csvs, tmp_path):
+    path = str(tmp_path / "graph.bin")
+    compile_graph_snapshot(path, *graph_csvs)
+    snapshot = load_graph_snapshot(path)
+    assert snapshot is not None
+
+    edge_index, edge_weights, edge_type = edges_index(EDGE_TYPE_MAP)
+    snap_index, snap_weights, snap_type = snapshot.edges(EDGE_TYPE_MAP)
+    assert torch.equal(edge_index, snap_index)
+    assert torch.equal(edge_weights, snap_weights)
+    assert torch.equal(edge_type, snap_type)
+    assert snapshot.nodes_map() == map_graph_nodes()
+
+
+def test_snapshot_is_rebuilt_when_source_changes(graph_csvs, tmp_path):
+    path = str(tmp_path / "graph.bin")
+    compile_graph_snapshot(path, *graph_csvs)
+
+    nodes_csv, edges_csv = graph_csvs
+    with open(edges_csv, "a") as f:
+        f.write("\n")
+    assert load_graph_snapshot(path) is None
+
+
+def test_truncated_or_corrupt_snapshot_is_rebuilt(graph_csvs, tmp_path):
+    path = str(tmp_path / "graph.bin")
+    compile_graph_snapshot(path, *graph_csvs)
+    with open(path, "rb") as f:
+        data = f.read()
+    expected = load_graph(path, *graph_csvs).edges(EDGE_TYPE_MAP)
+
+    for broken in (data[:10], data[:40], data[:len(data) // 2], data[:-100], data[:20] + b"\xff" * 64 + data[84:]):
+        with open(path, "wb") as f:
+            f.write(broken)
+        assert load_graph_snapshot(path) is None
+
+        rebuilt = load_graph(path, *graph_csvs).edges(EDGE_TYPE_MAP)
+        assert all(torch.equal(a, b) for a, b in zip(expected, rebuilt))
+        assert os.path.getsize(path) == len(data)
+
+
+def test_compile_leaves_no_temp_files(graph_csvs, tmp_path):
+    path = str(tmp_path / "graph.bin")
+    compile_graph_snapshot(path, *graph_csvs)
+    compile_graph_snapshot(path, *graph_csvs)
+    assert sorted(os.listdir(tmp_path)) == ["edges.csv", "graph.bin", "nodes.csv"]
+
+
+def test_sources_are_checked_from_any_cwd(graph_csvs, tmp_path, monkeypatch):
+    # 상대 경로로 컴파일한 뒤 다른 디렉토리에서 연다 (chdir하는 워커처럼)
+    monkeypatch.chdir(tmp_path)
+    compile_graph_snapshot("graph.bin", "nodes.csv", "edges.csv")
+    path = str(tmp_path / "graph.bin")
+    monkeypatch.chdir(tmp_path.parent)
+    assert load_graph_snapshot(path) is not None
+
+    nodes_csv, edges_csv = graph_csvs
+    with open(edges_csv, "a") as f:
+        f.write("\n")
+    assert load_graph_snapshot(path) is None
+
+    compile_graph_snapshot(path, *graph_csvs)
+    assert load_graph_snapshot(path) is not None
+    os.remove(nodes_csv)
+    assert load_graph_snapshot(path) is None
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from checkpointing import CheckpointManager
+from conftest import EDGE_TYPE_MAP, write_graph_csvs
+from dataset import BatchLoader, BPRDataset, load_graph
+from graph_store import HeteroGraph, cache_node_embeddings
+from models import NeuralCF
+from negatives import HardNegativeMiner
+from train import train_model
+
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("graph"))
+    return load_graph(os.path.join(directory, "graph.bin"), *write_graph_csvs(directory, num_ingredients=40, num_edges=300))
+
+
+def make_model(graph, num_relations, seed=0):
+    torch.manual_seed(seed)
+    model = NeuralCF(num_users=6, num_items=40, num_relations=num_relations, emb_size=16, hidden_layers=[16, 8], num_nodes=graph.num_nodes)
+    return model.eval()
+
+
+def test_encode_graph_matches_edge_list(graph):
+    store = HeteroGraph(graph, EDGE_TYPE_MAP)
+    model = make_model(graph, num_relations=3)
+    with torch.no_grad():
+        blocks = model.encode_graph(store)
+        edge_index, edge_weight, edge_type = store.edges(3)
+        full = model.encode(edge_index, edge_type, edge_weight)
+    torch.testing.assert_close(blocks, full[:len(blocks)], rtol=0, atol=2e-6)
+
+
+def test_cache_node_embeddings_adds_compound_relation(graph):
+    """서빙 edge(compound 제외)로 호출해도 3관계 모델은 compound 블록까지 인코딩한 임베딩으로 점수를 낸다"""
+    store = HeteroGraph(graph, EDGE_TYPE_MAP)
+    edge_index, edge_weight, edge_type = graph.edges(EDGE_TYPE_MAP)
+    edges = (edge_index, edge_type, edge_weight)
+    nodes = graph.nodes_map()
+    users = torch.tensor(list(nodes["liquor"].values())).repeat_interleave(4)
+    items = torch.tensor(list(nodes["ingredient"].values())[:4]).repeat(6)
+
+    model = make_model(graph, num_relations=3)
+    with torch.no_grad():
+        expected = model.score(model.encode_graph(store), users, items)
+        without_compounds = model.score(model.encode(*edges), users, items)
+        cache_node_embeddings(model, edges, store)
+        torch.testing.assert_close(model(users, items, *edges), expected)
+    assert not torch.allclose(expected, without_compounds)
+
+    # 2관계 모델은 edges 그대로 (store 불필요)
+    model = make_model(graph, num_relations=2)
+    with torch.no_grad():
+        x = cache_node_embeddings(model, edges)
+        torch.testing.assert_close(x, model.encode(*edges))
+
+    with pytest.raises(ValueError):
+        cache_node_embeddings(make_model(graph, num_relations=3), edges)
+
+
+def test_train_with_store_encodes_relation_blocks(graph, tmp_path):
+    store = HeteroGraph(graph, EDGE_TYPE_MAP)
+    nodes = graph.nodes_map()
+    liquors, ingredients = list(nodes["liquor"].values()), list(nodes["ingredient"].values())
+    rng = np.random.default_rng(0)
+    pairs = pd.DataFrame({"liquor_id": rng.choice(liquors, 30), "ingredient_id": rng.choice(ingredients, 30)})
+    dataset = BPRDataset(pairs, num_users=len(liquors), num_items=graph.num_nodes, seed=0)
+    loader = BatchLoader(dataset, batch_size=32)
+    miner = HardNegativeMiner.from_dataset(dataset, ingredients, refresh_every=2, num_neighbors=5)
+
+    model = make_model(graph, num_relations=3)
+    calls = {"encode_graph": 0, "encode": 0}
+    encode_graph, encode = model.encode_graph, model.encode
+    model.encode_graph = lambda g: calls.__setitem__("encode_graph", calls["encode_graph"] + 1) or encode_graph(g)
+    model.encode = lambda *args, **kwargs: calls.__setitem__("encode", calls["encode"] + 1) or encode(*args, **kwargs)
+
+    edge_index, edge_weight, edge_type = store.edges(3)
+    train_model(model, loader, BatchLoader(dataset, batch_size=64), edge_index, edge_weight, edge_type, num_epochs=1,
+                miner=miner, checkpoints=CheckpointManager(str(tmp_path), async_write=False), graph=store)
+
+    # 스텝마다 한 번 + 검증 한 번, edge 목록 인코딩은 없음
+    assert calls == {"encode_graph": len(loader) + 1, "encode": 0}
@@ -0,0 +1,76 @@
+import pytest
+import torch
+
+from conftest import EDGE_TYPE_MAP
+from dataset import load_graph
+from graph_delta_log import GraphDeltaLog
+from incremental import IncrementalEncoder
+from models import NeuralCF
+
+
+def build(tmp_path, graph_csvs, propagation):
+    graph = load_graph(str(tmp_path / "graph.bin"), *graph_csvs)
+    edge_index, edge_weight, edge_type = graph.edges(EDGE_TYPE_MAP)
+    torch.manual_seed(0)
+    model = NeuralCF(num_users=6, num_items=20, num_nodes=graph.num_nodes, emb_size=16,
+                     hidden_layers=[16, 8], propagation=propagation)
+    return model.eval(), edge_index, edge_type, edge_weight
+
+
+@pytest.mark.parametrize("propagation", ["message", "sparse"])
+def test_incremental_update_matches_full_encode(graph_csvs, tmp_path, propagation):
+    model, edge_index, edge_type, edge_weight = build(tmp_path, graph_csvs, propagation)
+    encoder = IncrementalEncoder(model, edge_index, edge_type, edge_weight)
+    num_old = model.num_nodes
+
+    # 새 노드 2개 (하나는 기존 노드와, 하나는 새 노드끼리만 연결) + 기존 노드 사이 edge
+    new_edges = torch.tensor([[0, num_old, num_old + 1, 3], [num_old, 5, num_old, 7]])
+    result = encoder.apply(2, new_edges, torch.tensor([0, 1, 1, 1]), torch.tensor([0.5, 0.1, 0.9, 0.3]))
+    assert result.new_nodes.tolist() == [num_old, num_old + 1]
+
+    # 두 번째 delta는 edge만
+    encoder.apply(0, torch.tensor([[2], [num_old + 1]]), torch.tensor([0]), torch.tensor([0.7]))
+
+    with torch.no_grad():
+        full = model.encode(encoder.edge_index, encoder.edge_type, encoder.edge_weight)
+    assert encoder.embeddings.shape == full.shape == (num_old + 2, 16)
+    torch.testing.assert_close(encoder.embeddings, full, rtol=0, atol=1e-6)
+    # model(...)이 갱신된 임베딩을 쓰는지
+    torch.testing.assert_close(model.node_embeddings(encoder.edge_index, encoder.edge_type, encoder.edge_weight), full, rtol=0, atol=1e-6)
+
+
+def test_incremental_update_rejects_bad_edges(graph_csvs, tmp_path):
+    model, edge_index, edge_type, edge_weight = build(tmp_path, graph_csvs, "message")
+    encoder = IncrementalEncoder(model, edge_index, edge_type, edge_weight)
+
+    with pytest.raises(ValueError):
+        encoder.apply(0, torch.tensor([[0], [model.num_nodes]]), torch.tensor([0]))
+    with pytest.raises(ValueError):
+        encoder.apply(0, torch.tensor([[0], [1]]), torch.tensor([model.num_relations]))
+
+
+def test_delta_log_round_trip(tmp_path):
+    path = str(tmp_path / "deltas.jsonl")
+    log = GraphDeltaLog(path, "base-a")
+    assert log.read() == [] and log.size() == 0
+
+    first = {"nodes": [{"node_id": 1, "node_type": "ingredient", "name": None}], "edges": []}
+    second = {"nodes": [], "edges": [{"id_1": 1, "id_2": 2, "edge_type": "ingr-ingr", "score": None}]}
+    with log.locked():
+        log.append(first)
+        log.append(second)
+    assert log.read() == [first, second]
+    assert log.read(1) == [second]
+
+    # 쓰는 도중인 마지막 줄은 무시
+    with open(path, "a") as f:
+        f.write('{"nodes": [')
+    assert log.read() == [first, second]
+
+    # 기준 그래프가 바뀌면 예전 로그는 적용하지 않고, 새로 쓰면 새 로그로 시작
+    other = GraphDeltaLog(path, "base-b")
+    assert other.read() == []
+    with other.locked():
+        other.append(second)
+    assert other.read() == [second]
+    assert log.read() == []
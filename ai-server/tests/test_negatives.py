@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from checkpointing import CheckpointManager
+from conftest import EDGE_TYPE_MAP, write_graph_csvs
+from dataset import BatchLoader, BPRDataset, load_graph
+from models import NeuralCF
+from negatives import HardNegativeMiner
+from train import train_model_large_batch, train_model_sampled
+
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("graph"))
+    graph = load_graph(os.path.join(directory, "graph.bin"), *write_graph_csvs(directory, num_ingredients=40, num_edges=300))
+    nodes = graph.nodes_map()
+    liquors, ingredients = list(nodes["liquor"].values()), list(nodes["ingredient"].values())
+    rng = np.random.default_rng(0)
+    pairs = pd.DataFrame({"liquor_id": rng.choice(liquors, 60), "ingredient_id": rng.choice(ingredients, 60)})
+    return graph, liquors, ingredients, pairs
+
+
+def setup(graph, tmp_path, refresh_every, batch_size):
+    graph, liquors, ingredients, pairs = graph
+    dataset = BPRDataset(pairs, num_users=len(liquors), num_items=graph.num_nodes, seed=0)
+    loader = BatchLoader(dataset, batch_size=batch_size, shuffle=True, generator=torch.Generator().manual_seed(0))
+    torch.manual_seed(0)
+    model = NeuralCF(num_users=len(liquors), num_items=len(ingredients), num_relations=2, emb_size=16,
+                     hidden_layers=[16, 8], num_nodes=graph.num_nodes)
+    miner = HardNegativeMiner.from_dataset(dataset, ingredients, refresh_every=refresh_every, num_neighbors=5)
+    checkpoints = CheckpointManager(str(tmp_path), async_write=False)
+    return graph.edges(EDGE_TYPE_MAP), model, loader, miner, checkpoints
+
+
+def test_refresh_once_per_refresh_every_steps(graph):
+    _, liquors, ingredients, pairs = graph
+    miner = HardNegativeMiner(ingredients, pairs["liquor_id"], pairs["ingredient_id"], refresh_every=3, num_neighbors=5)
+    x = torch.randn(graph[0].num_nodes, 8)
+    user = torch.as_tensor(liquors[:4])
+
+    for _ in range(7):
+        # 대배치 모드처럼 한 스텝에 청크마다 여러 번 sample
+        for _ in range(4):
+            neg = miner.sample(user, x)
+        miner.step()
+    assert miner.steps == 7
+    assert miner.refreshes == 3  # 0, 3, 6번째 스텝
+    assert np.isin(neg.numpy(), ingredients).all()
+
+
+def test_large_batch_counts_optimizer_steps(graph, tmp_path):
+    (edge_index, edge_weight, edge_type), model, loader, miner, checkpoints = setup(graph, tmp_path, refresh_every=2, batch_size=40)
+    train_model_large_batch(model, loader, BatchLoader(loader.dataset, batch_size=64), edge_index, edge_weight, edge_type,
+                            num_epochs=2, chunk_size=8, warmup_epochs=1, miner=miner, checkpoints=checkpoints)
+
+    # 청크(스텝당 5개)가 아니라 optimizer 스텝 기준
+    steps = 2 * len(loader)
+    assert miner.steps == steps
+    assert miner.refreshes == (steps + 1) // 2
+
+
+def test_sampled_refresh_uses_eval_mode(graph, tmp_path):
+    (edge_index, edge_weight, edge_type), model, loader, miner, checkpoints = setup(graph, tmp_path, refresh_every=2, batch_size=16)
+    seen = []
+    encode, sample = model.encode, miner.sample
+
+    def spy_encode(*args, n_id=None):
+        # 부분 그래프(n_id)가 아닌 전체 그래프 인코딩은 miner 갱신과 검증뿐
+        if n_id is None:
+            seen.append(("full", model.training, torch.is_grad_enabled()))
+        return encode(*args, n_id=n_id)
+
+    def spy_sample(user, x=None):
+        seen.append(("sample", model.training, torch.is_grad_enabled()))
+        return sample(user, x)
+
+    model.encode, miner.sample = spy_encode, spy_sample
+    train_model_sampled(model, loader, BatchLoader(loader.dataset, batch_size=64), edge_index, edge_weight, edge_type,
+                        num_epochs=1, fanouts=(5, 5, 5), miner=miner, checkpoints=checkpoints)
+
+    full = [s for s in seen if s[0] == "full"]
+    samples = [s for s in seen if s[0] == "sample"]
+    assert miner.refreshes == (len(loader) + 1) // 2 and len(full) == miner.refreshes + 1
+    assert len(samples) == len(loader)
+    # 갱신은 dropout 없이 그래디언트 없이, 학습 스텝은 다시 train 모드로
+    assert all(not training and not grad for _, training, grad in full)
+    assert all(training and grad for _, training, grad in samples)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import torch
+
+from models import NeuralCF
+from quantize import QuantizedNeuralCF, ranking_report, score_all
+
+
+def test_ranking_report_known_rankings():
+    rng = np.random.default_rng(0)
+    reference = rng.standard_normal((3, 40)).astype(np.float32)
+
+    same = ranking_report(reference, reference.copy(), k=5)
+    assert same["liquors"] == 3
+    assert same["top5_overlap_mean"] == same["top5_overlap_min"] == 1.0
+    assert same["kendall_tau_mean"] == pytest.approx(1.0) and same["max_abs_score_diff"] == 0.0
+
+    # 단조 변환은 순위가 같고, 부호를 뒤집으면 순위가 정반대
+    assert ranking_report(reference, 2 * reference + 1, k=5)["kendall_tau_min"] == pytest.approx(1.0)
+    assert ranking_report(reference, -reference, k=5)["kendall_tau_mean"] == pytest.approx(-1.0)
+
+    # 첫 번째 술만 top-5 중 2개를 6, 7위와 맞바꾼다
+    candidate = reference.copy()
+    order = np.argsort(-reference[0])
+    candidate[0, order[[3, 4, 5, 6]]] = reference[0, order[[5, 6, 3, 4]]]
+    report = ranking_report(reference, candidate, k=5)
+    assert report["top5_overlap_min"] == pytest.approx(3 / 5)
+    assert report["top5_overlap_mean"] == pytest.approx((3 / 5 + 2) / 3)
+    assert 0 < report["kendall_tau_min"] < 1
+
+
+@pytest.mark.parametrize("embedding_dtype", ["int8", "float16"])
+def test_quantized_export_keeps_rankings(embedding_dtype):
+    torch.manual_seed(0)
+    generator = torch.Generator().manual_seed(0)
+    edges = (torch.randint(0, 60, (2, 400), generator=generator), torch.randint(0, 2, (400,), generator=generator),
+             torch.rand(400, generator=generator))
+    model = NeuralCF(num_users=6, num_items=50, num_relations=2, emb_size=16, hidden_layers=[16, 8], num_nodes=60).eval()
+    with torch.no_grad():
+        x = model.encode(*edges)
+
+    quantized = QuantizedNeuralCF.from_model(model, x, embedding_dtype=embedding_dtype)
+    liquors, ingredients = list(range(6)), list(range(6, 60))
+    reference = score_all(model, liquors, ingredients, edges)
+    scores = score_all(quantized, liquors, ingredients)
+
+    report = ranking_report(reference, scores)
+    assert report["liquors"] == 6
+    assert report["top10_overlap_mean"] >= 0.9 and report["kendall_tau_min"] > 0.9
+    assert report["max_abs_score_diff"] < 0.05
+
+    # export -> 다시 로드해도 같은 점수
+    restored = QuantizedNeuralCF.from_export(quantized.export(validation=report))
+    assert restored.embedding_dtype == embedding_dtype
+    np.testing.assert_array_equal(score_all(restored, liquors, ingredients), scores)
@@ -0,0 +1,52 @@
+import sqlite3
+import threading
+
+from response_cache import ResponseCache, SqliteCache, make_key
+
+
+class BrokenStore:
+    """잠금 시간 초과처럼 항상 실패하는 공유 저장소"""
+    path = "broken"
+
+    def get(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+    set = invalidate = get
+
+
+def test_shared_tier_and_version_invalidation(tmp_path):
+    shared = SqliteCache(str(tmp_path / "cache.db"), ttl=60)
+    first = ResponseCache(max_entries=10, ttl=60, shared=shared)
+    second = ResponseCache(max_entries=10, ttl=60, shared=shared)
+
+    first.set(make_key("v1", "predict", 1, 2), 0.5)
+    first.set(make_key("v2", "predict", 1, 2), 0.7)
+    # 다른 워커는 공유 단계에서 찾고 자기 LRU에도 넣는다
+    assert second.get(make_key("v1", "predict", 1, 2)) == 0.5
+    assert second.get_local(make_key("v1", "predict", 1, 2)) == 0.5
+    assert second.stats()["shared_hits"] == 1
+
+    second.invalidate("v1")
+    assert second.get(make_key("v1", "predict", 1, 2)) is None
+    assert first.get_shared(make_key("v1", "predict", 1, 2)) is None
+    assert second.get(make_key("v2", "predict", 1, 2)) == 0.7
+
+
+def test_shared_errors_are_counted_across_threads():
+    cache = ResponseCache(max_entries=10, ttl=60, shared=BrokenStore())
+
+    def work():
+        for i in range(200):
+            cache.set_shared(i, i)
+            cache.get_shared(i)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cache.invalidate("v1")
+
+    stats = cache.stats()
+    assert stats["shared_errors"] == 8 * 200 * 2 + 1
+    assert stats["misses"] == 8 * 200
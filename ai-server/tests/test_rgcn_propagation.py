@@ -0,0 +1,76 @@
+import pytest
+import torch
+
+from models import WeightedRGCNConv, build_relation_adjacency
+
+
+class BaselineRGCNConv(WeightedRGCNConv):
+    """관계별 mask / gather / scatter 루프로 message를 계산하던 원래 구현 (비교 기준)"""
+
+    def forward(self, x, edge_index, edge_type, edge_weight=None):
+        if edge_weight is None:
+            edge_weight = torch.ones(edge_index.size(1), device=edge_index.device)
+        return self.propagate(edge_index, x=x, edge_type=edge_type, edge_weight=edge_weight)
+
+    def message(self, x_j, edge_type, edge_weight):
+        out = torch.zeros(x_j.size(0), self.out_channels, device=x_j.device)
+        for r in range(self.num_relations):
+            mask = edge_type == r
+            if mask.sum() > 0:
+                out[mask] = edge_weight[mask].unsqueeze(-1) * self.rel_lins[r](x_j[mask])
+        return out
+
+
+def random_graph(num_nodes=300, num_edges=2000, num_relations=3, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    edge_index = torch.randint(0, num_nodes, (2, num_edges), generator=generator)
+    edge_type = torch.randint(0, num_relations, (num_edges,), generator=generator)
+    edge_weight = torch.rand(num_edges, generator=generator)
+    x = torch.randn(num_nodes, 32, generator=generator)
+    return x, edge_index, edge_type, edge_weight
+
+
+def make_convs(num_relations=3, **kwargs):
+    torch.manual_seed(0)
+    baseline = BaselineRGCNConv(32, 16, num_relations)
+    conv = WeightedRGCNConv(32, 16, num_relations, **kwargs)
+    conv.load_state_dict(baseline.state_dict())
+    return baseline, conv
+
+
+@pytest.mark.parametrize("weighted", [True, False])
+def test_message_path_matches_baseline(weighted):
+    x, edge_index, edge_type, edge_weight = random_graph()
+    edge_weight = edge_weight if weighted else None
+    baseline, conv = make_convs()
+
+    x_base = x.clone().requires_grad_()
+    x_new = x.clone().requires_grad_()
+    expected = baseline(x_base, edge_index, edge_type, edge_weight)
+    out = conv(x_new, edge_index, edge_type, edge_weight)
+    torch.testing.assert_close(out, expected, rtol=0, atol=0)
+
+    # 그래디언트는 합산 순서(노드 단위 vs edge 단위)만 다르므로 float32 반올림 범위에서 같다
+    expected.square().sum().backward()
+    out.square().sum().backward()
+    torch.testing.assert_close(x_new.grad, x_base.grad, rtol=1e-5, atol=1e-5)
+    for lin, base_lin in zip(conv.rel_lins, baseline.rel_lins):
+        scale = base_lin.weight.grad.abs().max()
+        torch.testing.assert_close(lin.weight.grad, base_lin.weight.grad, rtol=1e-5, atol=1e-6 * scale)
+
+
+def test_sparse_path_matches_baseline():
+    x, edge_index, edge_type, edge_weight = random_graph()
+    # 관계 하나는 edge가 없어도 (adj None) 같은 결과
+    edge_type[edge_type == 2] = 1
+    baseline, conv = make_convs(propagation="sparse")
+
+    with torch.no_grad():
+        expected = baseline(x, edge_index, edge_type, edge_weight)
+        out = conv(x, edge_index, edge_type, edge_weight)
+        # 레이어끼리 공유하는 미리 만든 인접행렬로도 같다
+        adj = build_relation_adjacency(edge_index, edge_type, edge_weight, x.size(0), 3)
+        shared = conv(x, edge_index, edge_type, edge_weight, adj=adj)
+    assert adj[2] is None
+    torch.testing.assert_close(out, expected, rtol=0, atol=2e-6)
+    torch.testing.assert_close(shared, out, rtol=0, atol=0)
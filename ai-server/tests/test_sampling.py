@@ -0,0 +1,39 @@
+import pytest
+import torch
+
+from sampling import NeighborSampler
+
+
+@pytest.fixture
+def sampler():
+    generator = torch.Generator().manual_seed(0)
+    edge_index = torch.randint(0, 50, (2, 400), generator=generator)
+    edge_type = torch.randint(0, 2, (400,), generator=generator)
+    edge_weight = torch.rand(400, generator=generator)
+    return NeighborSampler(edge_index, edge_type, edge_weight, num_nodes=60, fanouts=(3, 3), generator=generator), edge_index
+
+
+def test_consecutive_samples_reuse_clean_buffers(sampler):
+    sampler, edge_index = sampler
+    all_edges = {tuple(e) for e in edge_index.t().tolist()}
+
+    subgraphs = [sampler.sample(torch.randint(0, 60, (5,))) for _ in range(20)]
+    # 스텝마다 버퍼를 새로 만들지 않고, 끝나면 원래대로 되돌린다
+    assert not sampler._visited.any() and (sampler._local_of == -1).all()
+
+    for sub in subgraphs:
+        assert len(sub.n_id.unique()) == len(sub.n_id)
+        src, dst = sub.n_id[sub.edge_index]
+        assert set(zip(src.tolist(), dst.tolist())) <= all_edges
+        # 이후 sample 호출과 무관하게 각 부분 그래프의 local()은 그대로
+        assert sub.local(sub.n_id).tolist() == list(range(len(sub.n_id)))
+        outside = torch.tensor([n for n in range(60) if n not in set(sub.n_id.tolist())][:3])
+        assert (sub.local(outside) == -1).all()
+
+
+def test_failed_sample_resets_buffers(sampler):
+    sampler, _ = sampler
+    with pytest.raises(IndexError):
+        sampler.sample(torch.tensor([1, 2, 60]))
+    assert not sampler._visited.any() and (sampler._local_of == -1).all()
+    assert len(sampler.sample(torch.tensor([1, 2])).n_id) >= 2
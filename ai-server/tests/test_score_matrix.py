@@ -0,0 +1,51 @@
+import os
+import shutil
+
+import numpy as np
+
+from score_matrix import load_score_matrix, matrix_paths, save_score_matrix
+
+
+def save(checkpoint, seed):
+    scores = np.random.default_rng(seed).random((3, 4), dtype=np.float32)
+    save_score_matrix(checkpoint, scores, [10, 11, 12], [20, 21, 22, 23], graph_hash="g")
+    return scores
+
+
+def test_round_trip_leaves_no_temp_files(tmp_path):
+    checkpoint = str(tmp_path / "best_model.pth")
+    with open(checkpoint, "wb") as f:
+        f.write(b"weights")
+    scores = save(checkpoint, seed=0)
+
+    matrix = load_score_matrix(checkpoint, graph_hash="g")
+    np.testing.assert_array_equal(matrix.rows([10, 11, 12]), scores)
+    assert matrix.score(11, 22) == scores[1, 2]
+    assert sorted(os.listdir(tmp_path)) == ["best_model.pth", "best_model.scores.bin", "best_model.scores.json"]
+    assert load_score_matrix(checkpoint, graph_hash="other") is None
+
+
+def test_mismatched_bin_and_meta_are_rejected(tmp_path):
+    checkpoint = str(tmp_path / "best_model.pth")
+    with open(checkpoint, "wb") as f:
+        f.write(b"weights")
+    bin_path, meta_path = matrix_paths(checkpoint)
+
+    save(checkpoint, seed=0)
+    shutil.copy(meta_path, tmp_path / "old.json")
+    shutil.copy(bin_path, tmp_path / "old.bin")
+    scores = save(checkpoint, seed=1)
+
+    # 다른 저장의 메타데이터 / bin이 섞인 상태 (bin과 메타데이터 교체 사이에 읽은 경우)
+    shutil.copy(tmp_path / "old.json", meta_path)
+    assert load_score_matrix(checkpoint) is None
+    shutil.copy(tmp_path / "old.bin", bin_path)
+    assert load_score_matrix(checkpoint) is not None
+
+    save(checkpoint, seed=1)
+    with open(bin_path, "r+b") as f:
+        f.truncate(os.path.getsize(bin_path) - 4)
+    assert load_score_matrix(checkpoint) is None
+
+    save(checkpoint, seed=1)
+    np.testing.assert_array_equal(load_score_matrix(checkpoint).rows([10, 11, 12]), scores)
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+
+import pytest
+import torch
+
+from serving import ExecutorSaturated, InferenceExecutor, MicroBatcher
+
+
+def make_executor(**kwargs):
+    return InferenceExecutor(torch_threads=torch.get_num_threads(), **kwargs)
+
+
+def test_executor_rejects_when_queue_full():
+    executor = make_executor(max_workers=1, max_queue=2, timeout=5)
+    release = threading.Event()
+
+    async def scenario():
+        # 실행 중 1개 + 대기 1개로 대기열이 가득 찬다
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert executor.pending == 2
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(lambda: 1)
+
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        return await executor.run(lambda: 1)
+
+    try:
+        assert asyncio.run(scenario()) == 1
+        assert executor.pending == 0
+        assert executor.stats()["rejected"] == 1 and executor.stats()["timed_out"] == 0
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_executor_timeout_keeps_slot_until_work_finishes():
+    executor = make_executor(max_workers=1, max_queue=1, timeout=0.05)
+    release, finished = threading.Event(), threading.Event()
+
+    def slow():
+        release.wait(5)
+        finished.set()
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run(slow)
+        # 제한 시간이 지나도 스레드는 아직 실행 중이므로 슬롯을 돌려주지 않는다
+        assert executor.pending == 1
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(lambda: 1)
+
+    try:
+        asyncio.run(scenario())
+        release.set()
+        assert finished.wait(5)
+        # 워커가 하나이므로 다음 작업이 끝났으면 앞 작업의 완료 콜백(슬롯 반환)도 실행됐다
+        executor._pool.submit(lambda: None).result(5)
+        assert executor.pending == 0
+        assert executor.stats()["timed_out"] == 1 and executor.stats()["rejected"] == 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def make_batcher(calls, max_batch, max_wait, fail=False):
+    def batch_fn(items):
+        calls.append(list(items))
+        if fail:
+            raise ValueError("bad batch")
+        return [item * 10 for item in items]
+
+    async def run(fn, *args):
+        return fn(*args)
+
+    return MicroBatcher(batch_fn, run, max_batch=max_batch, max_wait=max_wait)
+
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    calls = []
+    batcher = make_batcher(calls, max_batch=64, max_wait=0.05)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+    # 동시에 들어온 요청은 한 번의 batch_fn으로, 결과는 요청마다 제자리에
+    assert asyncio.run(scenario()) == [i * 10 for i in range(10)]
+    assert calls == [list(range(10))]
+    stats = batcher.stats()
+    assert stats["batch_size"]["count"] == 1 and stats["batch_size"]["sum"] == 10
+    assert stats["wait_ms"]["count"] == 10
+
+
+def test_micro_batcher_flushes_full_batches_without_waiting():
+    calls = []
+    batcher = make_batcher(calls, max_batch=4, max_wait=60)
+
+    async def scenario():
+        full = await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(8))), 5)
+        # max_batch를 못 채운 나머지는 max_wait까지 기다린다
+        pending = asyncio.ensure_future(batcher.submit(8))
+        await asyncio.sleep(0.05)
+        assert not pending.done()
+        batcher._flush()
+        return full, await pending
+
+    full, last = asyncio.run(scenario())
+    assert full == [i * 10 for i in range(8)] and last == 80
+    assert calls == [[0, 1, 2, 3], [4, 5, 6, 7], [8]]
+
+
+def test_micro_batcher_propagates_errors_to_every_request():
+    calls = []
+    batcher = make_batcher(calls, max_batch=64, max_wait=0.01, fail=True)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(isinstance(r, ValueError) for r in results)
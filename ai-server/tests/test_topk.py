@@ -0,0 +1,86 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from topk import TopKRecommender, top_k
+
+NUM_LIQUORS, NUM_INGREDIENTS = 4, 50
+
+
+@pytest.fixture
+def setup():
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((NUM_LIQUORS, NUM_INGREDIENTS)).astype(np.float32)
+    lid_to_idx = {100 + i: i for i in range(NUM_LIQUORS)}
+    ingredient_ids = rng.permutation(1000)[:NUM_INGREDIENTS] + 5000
+    # 각 술의 상위 재료 일부를 나쁜 조합으로 (top-N 안에서 필터가 걸리도록)
+    bad_pairs = {lid: set(ingredient_ids[np.argsort(-matrix[i])[:6:2]].tolist()) for lid, i in lid_to_idx.items()}
+    hubs = set(ingredient_ids[::3].tolist())
+
+    calls = []
+
+    def score_fn(liquor_indices):
+        calls.append(list(liquor_indices))
+        return matrix[list(liquor_indices)]
+
+    recommender = TopKRecommender(score_fn, lid_to_idx, ingredient_ids, bad_pairs=bad_pairs, hub_ingredients=hubs, top_n=10)
+    return recommender, matrix, ingredient_ids, bad_pairs, hubs, calls
+
+
+def brute_force(matrix, ingredient_ids, row, limit, excluded=(), hubs=None):
+    order = np.argsort(-matrix[row], kind="stable")
+    picked = [(int(ingredient_ids[p]), float(matrix[row, p])) for p in order
+              if ingredient_ids[p] not in excluded and (hubs is None or ingredient_ids[p] in hubs)]
+    return picked[:limit]
+
+
+def test_top_k_matches_sort():
+    scores = np.random.default_rng(1).standard_normal(200)
+    assert top_k(scores, 7).tolist() == np.argsort(-scores)[:7].tolist()
+    assert len(top_k(scores, 500)) == 200
+    assert len(top_k(scores, 0)) == 0
+
+
+@pytest.mark.parametrize("exclude_bad,hub_only,use_exclude_ids", itertools.product([False, True], repeat=3))
+@pytest.mark.parametrize("limit", [3, 10, 25])
+def test_filters_match_brute_force(setup, exclude_bad, hub_only, use_exclude_ids, limit):
+    recommender, matrix, ingredient_ids, bad_pairs, hubs, _ = setup
+    recommender.precompute()
+    for lid, row in recommender.lid_to_idx.items():
+        exclude_ids = set(ingredient_ids[np.argsort(-matrix[row])[1:4]].tolist()) if use_exclude_ids else set()
+        excluded = exclude_ids | (bad_pairs[lid] if exclude_bad else set())
+        expected = brute_force(matrix, ingredient_ids, row, limit, excluded, hubs if hub_only else None)
+
+        result = recommender.recommend(lid, limit=limit, exclude_bad=exclude_bad, hub_only=hub_only, exclude_ids=exclude_ids)
+        assert [iid for iid, _ in result] == [iid for iid, _ in expected]
+        np.testing.assert_allclose([s for _, s in result], [s for _, s in expected])
+
+
+def test_precomputed_list_served_without_scoring(setup):
+    recommender, matrix, ingredient_ids, bad_pairs, hubs, calls = setup
+    # 처음 요청한 술만 계산해 두고, 이후 top-N 안에서 채워지면 다시 점수를 내지 않는다
+    recommender.recommend(100, limit=5)
+    recommender.recommend(100, limit=5, exclude_bad=True)
+    assert calls == [[0]]
+
+    # 허브 필터로 top-10 안에서 limit개를 못 채우면 전체 점수에서 다시 선택
+    hubs_in_top = sum(iid in hubs for iid in ingredient_ids[np.argsort(-matrix[0])[:10]].tolist())
+    recommender.recommend(100, limit=hubs_in_top, hub_only=True)
+    assert calls == [[0]]
+    result = recommender.recommend(100, limit=hubs_in_top + 1, hub_only=True)
+    assert calls == [[0], [0]]
+    assert all(iid in hubs for iid, _ in result) and len(result) == hubs_in_top + 1
+
+    # top_n보다 큰 limit도 전체 점수에서
+    assert len(recommender.recommend(100, limit=NUM_INGREDIENTS + 5)) == NUM_INGREDIENTS
+
+    recommender.clear()
+    recommender.recommend(100, limit=5)
+    assert calls[-1] == [0] and len(calls) == 4
+
+
+def test_unknown_liquor(setup):
+    recommender = setup[0]
+    with pytest.raises(KeyError):
+        recommender.recommend(999)
@@ -6,6 +6,7 @@
 const path = require('path');
 const { spawn } = require('child_process');
 const fs = require('fs');
+const readline = require('readline');
 const OpenAI = require('openai');
 const Liquor = require('../models/Liquor');
 const Ingredient = require('../models/Ingredient');
@@ -17,6 +18,133 @@ const openai = new OpenAI({
 
 // Path to the AI model directory
 const MODEL_PATH = path.resolve(__dirname, '../../../ai-server/model');
+const AI_SERVER_PATH = path.resolve(__dirname, '../../../ai-server');
+
+// Warm Python workers (worker.py) kept alive across requests; 0 disables the pool
+const WORKER_POOL_SIZE = parseInt(process.env.AI_WORKER_POOL_SIZE || '2', 10);
+const WORKER_REQUEST_TIMEOUT = parseInt(process.env.AI_WORKER_TIMEOUT || process.env.API_TIMEOUT || '30000', 10);
+
+/**
+ * A long-lived `predict.py --worker` process speaking newline-delimited JSON
+ * Graph, mappings and model are loaded once when the process starts
+ */
+class PythonWorker {
+  constructor() {
+    this.pending = new Map();
+    this.nextId = 1;
+    this.alive = true;
+
+    this.ready = new Promise((resolve, reject) => {
+      this.resolveReady = resolve;
+      this.rejectReady = reject;
+    });
+    this.ready.catch(() => {});
+
+    this.process = spawn('python', [path.join(__dirname, 'predict.py'), '--worker'], { cwd: AI_SERVER_PATH });
+
+    readline.createInterface({ input: this.process.stdout }).on('line', (line) => this.handleLine(line));
+    this.process.stderr.on('data', (data) => {
+      console.error(`Python worker: ${data}`);
+    });
+    this.process.on('exit', (code) => this.handleExit(`code ${code}`));
+    this.process.on('error', (error) => this.handleExit(error.message));
+  }
+
+  handleLine(line) {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (error) {
+      console.log(`Python worker stdout: ${line}`);
+      return;
+    }
+
+    if (message.ready) {
+      console.log('Python worker ready');
+      this.resolveReady();
+      return;
+    }
+
+    const entry = this.pending.get(message.id);
+    if (!entry) return;
+
+    this.pending.delete(message.id);
+    clearTimeout(entry.timer);
+    if (message.error) {
+      entry.reject(new Error(message.error));
+    } else {
+      entry.resolve(message.result);
+    }
+  }
+
+  handleExit(reason) {
+    if (!this.alive) return;
+    this.alive = false;
+
+    const error = new Error(`Python worker exited (${reason})`);
+    this.rejectReady(error);
+    for (const entry of this.pending.values()) {
+      clearTimeout(entry.timer);
+      entry.reject(error);
+    }
+    this.pending.clear();
+  }
+
+  async request(payload) {
+    await this.ready;
+
+    return new Promise((resolve, reject) => {
+      const id = this.nextId++;
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`Python worker request timed out after ${WORKER_REQUEST_TIMEOUT}ms`));
+      }, WORKER_REQUEST_TIMEOUT);
+
+      this.pending.set(id, { resolve, reject, timer });
+      this.process.stdin.write(`${JSON.stringify({ id, ...payload })}\n`);
+    });
+  }
+
+  stop() {
+    this.alive = false;
+    this.process.kill();
+  }
+}
+
+/**
+ * Small pool of warm Python workers; dead workers are replaced on the next request
+ */
+class PythonWorkerPool {
+  constructor(size) {
+    this.size = size;
+    this.workers = [];
+  }
+
+  get enabled() {
+    return this.size > 0;
+  }
+
+  acquire() {
+    this.workers = this.workers.filter((worker) => worker.alive);
+    while (this.workers.length < this.size) {
+      this.workers.push(new PythonWorker());
+    }
+    // 대기 중인 요청이 가장 적은 워커 선택
+    return this.workers.reduce((best, worker) => (worker.pending.size < best.pending.size ? worker : best));
+  }
+
+  request(payload) {
+    return this.acquire().request(payload);
+  }
+
+  shutdown() {
+    this.workers.forEach((worker) => worker.stop());
+    this.workers = [];
+  }
+}
+
+const workerPool = new PythonWorkerPool(WORKER_POOL_SIZE);
+process.on('exit', () => workerPool.shutdown());
 
 /**
  * Get pairing score prediction for a liquor and ingredient
@@ -29,6 +157,19 @@ async function getPairingScore(liquorId, ingredientId) {
     // 로그 추가
     console.log(`Running AI model for liquorId=${liquorId}, ingredientId=${ingredientId}`);
     
+    if (workerPool.enabled) {
+      try {
+        const score = await workerPool.request({ op: 'predict', liquor_id: liquorId, ingredient_id: ingredientId });
+        
+        // 유효한 범위로 제한 (0-1)
+        const normalizedScore = Math.max(0, Math.min(1, score));
+        console.log(`Normalized score: ${normalizedScore}`);
+        return normalizedScore;
+      } catch (error) {
+        console.error(`AI worker prediction failed, falling back to one-shot script: ${error.message}`);
+      }
+    }
+    
     return new Promise((resolve, reject) => {
       const pythonProcess = spawn('python', [
         path.join(MODEL_PATH, 'predict.py'),
@@ -124,6 +265,14 @@ async function getRecommendations(liquorId, limit = 10) {
     // 로그 추가
     console.log(`Running recommendation model for liquorId=${liquorId}, limit=${limit}`);
     
+    if (workerPool.enabled) {
+      try {
+        return await workerPool.request({ op: 'recommend', liquor_id: liquorId, limit });
+      } catch (error) {
+        console.error(`AI worker recommendation failed, falling back to one-shot script: ${error.message}`);
+      }
+    }
+    
     return new Promise((resolve, reject) => {
       const pythonProcess = spawn('python', [
         path.join(MODEL_PATH, 'recommend.py'),
@@ -438,5 +587,6 @@ function getMockRecommendations(limit) {
 module.exports = {
   getPairingScore,
   getRecommendations,
-  getExplanation
+  getExplanation,
+  shutdownWorkers: () => workerPool.shutdown()
 };
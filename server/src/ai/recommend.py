@@ -10,23 +10,34 @@ import argparse
 import torch
 import json
 import pickle
-import numpy as np
 
 # Add parent directory to path to import modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../ai-server')))
 
-from model.models import NeuralCF
-from model.dataset import map_graph_nodes, edges_index
+from model.dataset import load_graph
+from model.export import load_scripted, is_scripted_export, check_scripted
+from model.graph_store import HeteroGraph, cache_node_embeddings
+from model.topk import top_k
 
 def main():
     parser = argparse.ArgumentParser(description='Get ingredient recommendations for a liquor')
-    parser.add_argument('--liquor_id', type=int, required=True, help='ID of the liquor')
+    parser.add_argument('--liquor_id', type=int, help='ID of the liquor')
     parser.add_argument('--limit', type=int, default=10, help='Maximum number of recommendations')
+    parser.add_argument('--worker', action='store_true', help='Keep the model loaded and serve JSON lines from stdin (see worker.py)')
     args = parser.parse_args()
 
+    if args.worker:
+        from worker import serve
+        serve()
+        return
+
+    if args.liquor_id is None:
+        parser.error("--liquor_id is required unless --worker is given")
+
     try:
         # Load node mappings
-        mapping = map_graph_nodes()
+        graph = load_graph()
+        mapping = graph.nodes_map()
         lid_to_idx = mapping['liquor']
         iid_to_idx = mapping['ingredient']
         
@@ -51,10 +62,11 @@ def main():
             'ingr-dcomp': 2
         }
         
-        edges_indexes, edges_weights, edge_type = edges_index(edge_type_map)
+        edges_indexes, edges_weights, edge_type = graph.edges(edge_type_map)
         
         # Load model
         model_paths = [
+            "../../../ai-server/model/checkpoint/best_model.script.pt",  # model/export.py 아티팩트 (torch_geometric 불필요)
             "../../../ai-server/model/checkpoint/best_model.pth",  # 원래 경로
             "./checkpoint/best_model.pt",  # 에러 메시지에 있던 경로
             "../../../ai-server/model/best_model.pth",  # 대안 경로 1
@@ -66,25 +78,35 @@ def main():
         for model_path in model_paths:
             try:
                 print(f"Attempting to load model from: {model_path}")
-                # 모델 구조 수정: hidden_layers 크기 변경
-                model = NeuralCF(num_users=155, num_items=6498, emb_size=128, hidden_layers=[128, 64, 32, 16])
-                
-                # 체크포인트 로드 시 strict=False 옵션 사용하여 크기가 다른 경우도 로드 허용
-                checkpoint = torch.load(model_path, map_location=torch.device('cpu'))
-                model.load_state_dict(checkpoint, strict=False)
+                if is_scripted_export(model_path):
+                    model = load_scripted(model_path)
+                    # 재학습 뒤 다시 export하지 않았으면 다음 경로(체크포인트)로
+                    check_scripted(model_path, model)
+                else:
+                    from model.models import NeuralCF
+
+                    # hidden_layers 등 구조는 체크포인트 shape에서 읽어 strict 로드 (구조가 다르면 실패)
+                    checkpoint = torch.load(model_path, map_location=torch.device('cpu'))
+                    model = NeuralCF.from_state_dict(checkpoint)
                 
                 model.eval()
                 model_loaded = True
                 print(f"Successfully loaded model from: {model_path}")
                 break
-            except Exception as e:
+            except FileNotFoundError:
                 print(f"Checkpoint file not found: {model_path}")
                 continue
+            except Exception as e:
+                print(f"Failed to load checkpoint {model_path}: {str(e)}")
+                continue
                 
         if not model_loaded:
             print("Error: Could not load model from any path")
             sys.exit(1)
 
+        # --with-compounds 체크포인트는 compound 관계를 관계별 CSR 블록으로 인코딩 (이후 호출은 캐시 사용)
+        cache_node_embeddings(model, (edges_indexes, edge_type, edges_weights), HeteroGraph(graph, edge_type_map))
+
         # Get all possible ingredient indices
         ingredient_indices = list(idx_to_iid.keys())
         
@@ -104,7 +126,7 @@ def main():
             
             # Convert to numpy and find top N ingredients
             scores_np = scores.numpy()
-            top_indices = np.argsort(scores_np)[-args.limit:][::-1]
+            top_indices = top_k(scores_np, args.limit)
             
             # Build response
             recommendations = []
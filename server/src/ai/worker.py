@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Long-lived inference worker for the NeuralCF model
+Loads graph, mappings and model once, then serves newline-delimited JSON requests over stdin/stdout
+
+Request  : {"id": 1, "op": "predict", "liquor_id": 39, "ingredient_id": 1982}
+           {"id": 2, "op": "recommend", "liquor_id": 39, "limit": 10, "exclude_bad": true, "hub_only": false, "exclude_ids": []}
+Response : {"id": 1, "result": 0.87}
+           {"id": 2, "error": "Liquor ID 1 not found"}
+
+The first line written is {"ready": true} once the model is warm.
+stdout is reserved for the protocol, so every log line goes to stderr.
+"""
+
+import sys
+import os
+import json
+import contextlib
+import torch
+
+AI_SERVER_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../ai-server'))
+
+# Add parent directory to path to import modules
+sys.path.append(AI_SERVER_PATH)
+
+from model.dataset import load_graph
+from model.export import load_scripted, is_scripted_export, check_scripted
+from model.graph_store import HeteroGraph, cache_node_embeddings
+from model.topk import TopKRecommender, make_model_scorer, load_bad_pairs, load_hub_ingredients
+
+EDGE_TYPE_MAP = {
+    'liqr-ingr': 0,
+    'ingr-ingr': 1,
+    'liqr-liqr': 1,
+    'ingr-fcomp': 2,
+    'ingr-dcomp': 2
+}
+
+MODEL_PATHS = [
+    os.path.join(AI_SERVER_PATH, "model/checkpoint/best_model.script.pt"),  # model/export.py 아티팩트 (torch_geometric 불필요)
+    os.path.join(AI_SERVER_PATH, "model/checkpoint/best_model.pth"),
+]
+
+REQUIRED_FIELDS = {
+    "predict": ("liquor_id", "ingredient_id"),
+    "recommend": ("liquor_id",),
+}
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+class Runtime:
+    """Graph, mappings and model loaded once per worker"""
+
+    def __init__(self):
+        # dataset 경로(./dataset/...)가 ai-server 기준이므로 작업 디렉토리를 맞춘다
+        os.chdir(AI_SERVER_PATH)
+
+        log("Loading graph snapshot...")
+        graph = load_graph()
+        mapping = graph.nodes_map()
+        self.lid_to_idx = mapping['liquor']
+        self.iid_to_idx = mapping['ingredient']
+        self.idx_to_iid = {v: k for k, v in self.iid_to_idx.items()}
+        ingredient_indices = list(self.idx_to_iid.keys())
+
+        log("Loading edge indices...")
+        self.edges_indexes, self.edges_weights, self.edge_type = graph.edges(EDGE_TYPE_MAP)
+
+        self.model = self.load_model()
+
+        # 그래프 임베딩은 워커당 한 번만 계산
+        log("Caching node embeddings...")
+        # --with-compounds 체크포인트는 compound 관계를 관계별 CSR 블록으로 인코딩
+        cache_node_embeddings(self.model, (self.edges_indexes, self.edge_type, self.edges_weights), HeteroGraph(graph, EDGE_TYPE_MAP))
+
+        # 술별 top-N은 처음 요청될 때 계산해 저장
+        self.recommender = TopKRecommender(
+            make_model_scorer(self.model, ingredient_indices, self.edges_indexes, self.edge_type, self.edges_weights),
+            self.lid_to_idx,
+            [self.idx_to_iid[idx] for idx in ingredient_indices],
+            bad_pairs=load_bad_pairs(),
+            hub_ingredients=load_hub_ingredients(),
+        )
+
+    def load_model(self):
+        existing = [path for path in MODEL_PATHS if os.path.exists(path)]
+        if not existing:
+            raise RuntimeError(f"No model checkpoint found, expected one of: {', '.join(MODEL_PATHS)}")
+
+        for model_path in existing:
+            try:
+                log(f"Attempting to load model from: {model_path}")
+                if is_scripted_export(model_path):
+                    model = load_scripted(model_path)
+                    # 재학습 뒤 다시 export하지 않았으면 다음 경로(체크포인트)로
+                    check_scripted(model_path, model)
+                else:
+                    from model.models import NeuralCF
+
+                    checkpoint = torch.load(model_path, map_location=torch.device('cpu'))
+
+                    # hidden_layers 등 구조는 체크포인트 shape에서 읽어 strict 로드
+                    model = NeuralCF.from_state_dict(checkpoint)
+
+                model.eval()
+                log(f"Successfully loaded model from: {model_path}")
+                return model
+            except Exception as e:
+                log(f"Failed to load checkpoint {model_path}: {str(e)}")
+                continue
+
+        raise RuntimeError(f"Could not load model from any of: {', '.join(existing)}")
+
+    def predict(self, liquor_id, ingredient_id):
+        if liquor_id not in self.lid_to_idx:
+            raise KeyError(f"Liquor ID {liquor_id} not found")
+        if ingredient_id not in self.iid_to_idx:
+            raise KeyError(f"Ingredient ID {ingredient_id} not found")
+
+        with torch.no_grad():
+            output = self.model(
+                torch.tensor([self.lid_to_idx[liquor_id]]),
+                torch.tensor([self.iid_to_idx[ingredient_id]]),
+                self.edges_indexes,
+                self.edge_type,
+                self.edges_weights
+            )
+        return float(output.item())
+
+    def recommend(self, liquor_id, limit=10, exclude_bad=False, hub_only=False, exclude_ids=()):
+        top = self.recommender.recommend(
+            liquor_id, limit, exclude_bad=exclude_bad, hub_only=hub_only, exclude_ids=exclude_ids
+        )
+        return [{"ingredient_id": int(iid), "score": float(score)} for iid, score in top]
+
+    def handle(self, request):
+        op = request.get("op")
+        missing = [f for f in REQUIRED_FIELDS.get(op, ()) if f not in request]
+        if missing:
+            raise ValueError(f"Missing field(s) for {op}: {', '.join(missing)}")
+
+        if op == "predict":
+            return self.predict(int(request["liquor_id"]), int(request["ingredient_id"]))
+        if op == "recommend":
+            return self.recommend(
+                int(request["liquor_id"]),
+                int(request.get("limit", 10)),
+                exclude_bad=bool(request.get("exclude_bad", False)),
+                hub_only=bool(request.get("hub_only", False)),
+                exclude_ids=[int(i) for i in request.get("exclude_ids", [])],
+            )
+        if op == "ping":
+            return "pong"
+        raise ValueError(f"Unknown op: {op}")
+
+
+def write(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def serve(stdin=sys.stdin):
+    # 로딩 중 print 출력이 프로토콜 채널(stdout)에 섞이지 않도록 stderr로 돌린다
+    with contextlib.redirect_stdout(sys.stderr):
+        runtime = Runtime()
+    write({"ready": True})
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            write({"id": request_id, "result": runtime.handle(request)})
+        except KeyError as e:
+            write({"id": request_id, "error": str(e.args[0]) if e.args else str(e)})
+        except Exception as e:
+            log(f"Error handling request: {str(e)}")
+            write({"id": request_id, "error": str(e)})
+
+
+if __name__ == "__main__":
+    serve()